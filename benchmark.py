@@ -0,0 +1,508 @@
+"""
+Benchmarks for the data transformation pipeline in run.py.
+
+The benchmarks run on a synthetic Full Disclosure corpus laid out the same way
+as the directories "python run.py -a" expects, so they don't need any PERCEIVE
+data and can be run offline. The corpus only depends on its size and seed, so
+results saved with --output on one commit can be compared with --compare on
+another.
+
+Example:
+    python benchmark.py --docs 100000 --output before.json
+    python benchmark.py --docs 100000 --compare before.json
+"""
+import numpy as np
+import pandas as pd
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import concurrent.futures
+from collections import OrderedDict
+
+import run
+
+
+MONTH_LIST = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def make_corpus(path_root, n_docs, year=2012, n_topics=10, n_terms=1000, doc_extension='.reply.body.txt', seed=0, years=1):
+    """
+    Generate a synthetic Full Disclosure corpus of one or several years.
+
+    Args:
+        path_root     -- directory the corpus is written into
+        n_docs        -- total number of documents, spread evenly over the months
+        year          -- first year of the corpus
+        n_topics      -- number of topics of every month
+        n_terms       -- number of terms in the Topic_Term_Matrix of every month
+        doc_extension -- extension of the document files
+        seed          -- seed of the random number generator
+        years         -- number of years of the corpus
+
+    Returns:
+        a dictionary with the paths of the document ("path_doc"), metadata
+        ("path_meta"), Document_Topic_Matrix ("path_dtm") and Topic_Term_Matrix
+        ("path_ttm") directories, and of the topicflow similarity file
+        ("path_topic_tf")
+
+    Outcome:
+        path_doc/yyyy_Mon/yyyy_Mon_i<doc_extension>, path_meta/yyyy_Mon/yyyy_Mon.csv,
+        path_dtm/Mon.csv and path_ttm/Mon.csv for every month (yyyy_Mon.csv
+        for a corpus of several years), and topic_flow.csv
+    """
+    rng = np.random.RandomState(seed)
+    path_doc = os.path.join(path_root, 'doc')
+    path_meta = os.path.join(path_root, 'meta')
+    path_dtm = os.path.join(path_root, 'dtm')
+    path_ttm = os.path.join(path_root, 'ttm')
+    path_topic_tf = os.path.join(path_root, 'topic_flow.csv')
+    os.makedirs(path_dtm, exist_ok=True)
+    os.makedirs(path_ttm, exist_ok=True)
+    topics = [str(x + 1) for x in range(n_topics)]
+    terms = ['term' + str(x) for x in range(n_terms)]
+    words = ['exploit', 'overflow', 'advisory', 'patch', 'vulnerability', 'kernel', 'xss', 'csrf',
+             'injection', 'remote', 'root', 'password', 'disclosure', 'vendor', 'cve', 'http://']
+
+    months = [(year + year_ix, month_ix, month) for year_ix in range(years) for month_ix, month in enumerate(MONTH_LIST)]
+    labels = []
+    for bin_ix, (bin_year, month_ix, month) in enumerate(months):
+        folder = str(bin_year) + '_' + month
+        # the matrixes of a single-year corpus are named after the month
+        label = month if years == 1 else folder
+        labels.append(label)
+        os.makedirs(os.path.join(path_doc, folder), exist_ok=True)
+        os.makedirs(os.path.join(path_meta, folder), exist_ok=True)
+        n_month = n_docs // len(months) + (1 if bin_ix < n_docs % len(months) else 0)
+
+        ids = [folder + '_' + str(i) for i in range(n_month)]
+        dates = pd.Timestamp(bin_year, month_ix + 1, 1) + pd.to_timedelta(rng.randint(0, 28 * 24 * 60, n_month), unit='m')
+        pd.DataFrame({'id': ids,
+                      'author': ['author' + str(x) for x in rng.randint(0, 1000, n_month)],
+                      'date': dates.strftime('%Y-%m-%d %H:%M:%S')}) \
+          .to_csv(os.path.join(path_meta, folder, folder + '.csv'), index=False)
+
+        for doc_id in ids:
+            body = ' '.join(rng.choice(words, rng.randint(20, 200)))
+            with open(os.path.join(path_doc, folder, doc_id + doc_extension), 'w', encoding='latin1') as file:
+                file.write('"' + body + '"\n')
+
+        # topic models, LDA writes document names without the extension
+        pd.DataFrame(rng.dirichlet(np.ones(n_topics) * 0.1, n_month), index=ids, columns=topics) \
+          .to_csv(os.path.join(path_dtm, label + '.csv'))
+        pd.DataFrame(rng.dirichlet(np.ones(n_terms) * 0.1, n_topics), index=topics, columns=terms) \
+          .to_csv(os.path.join(path_ttm, label + '.csv'))
+
+    # topic flows, every row links topics of consecutive months, the way the
+    # R package writes them
+    flows = OrderedDict()
+    for label in labels:
+        flows[label] = rng.randint(1, n_topics + 1, 2 * n_topics)
+    for label, label_next in zip(labels, labels[1:]):
+        flows[label + '_' + label_next + '_similarity'] = np.round(rng.rand(2 * n_topics), 6)
+    pd.DataFrame(flows).to_csv(path_topic_tf, index=False)
+
+    return {'path_doc': path_doc, 'path_meta': path_meta, 'path_dtm': path_dtm, 'path_ttm': path_ttm,
+            'path_topic_tf': path_topic_tf}
+
+
+def use_paths(path_tf, paths):
+    """
+    Point the module level paths of run.py at a corpus, the same way
+    "python run.py -a" does.
+
+    Args:
+        path_tf -- directory the project data is written into
+        paths   -- a dictionary of corpus paths returned by make_corpus
+    """
+    run.path_tf = path_tf
+    for name, path in paths.items():
+        setattr(run, name, path)
+    os.makedirs(os.path.join(path_tf, 'data'), exist_ok=True)
+
+
+def make_pool(workers):
+    """
+    Create the process pool run.py uses for a number of workers, None for a
+    serial run.
+    """
+    return concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
+
+
+def bench_transform_doc(paths, path_tf, doc_extension='.reply.body.txt', repeat=1, workers=1, threads=1):
+    """
+    Time transform_doc on a corpus.
+
+    Returns:
+        a tuple of (best wall time in seconds, the dictionary returned by
+        transform_doc)
+    """
+    use_paths(path_tf, paths)
+    pool = make_pool(workers)
+    best = None
+    try:
+        for _ in range(repeat):
+            time_start = time.perf_counter()
+            tweet_id_txt = run.transform_doc('Benchmark', paths['path_doc'], paths['path_meta'], doc_extension, pool,
+                                             threads=threads)
+            elapsed = time.perf_counter() - time_start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return best, tweet_id_txt
+
+
+def bench_transform_bins(paths, path_tf, tweet_id_txt, repeat=1, workers=1):
+    """
+    Time transform_bins on a corpus, after transform_doc.
+
+    Returns:
+        a tuple of (best wall time in seconds, the topic weights returned by
+        transform_bins)
+    """
+    use_paths(path_tf, paths)
+    pool = make_pool(workers)
+    best = None
+    try:
+        for _ in range(repeat):
+            time_start = time.perf_counter()
+            topic_weights = run.transform_bins('Benchmark', paths['path_doc'], paths['path_meta'], paths['path_dtm'],
+                                               paths['path_ttm'], None, tweet_id_txt, pool=pool)
+            elapsed = time.perf_counter() - time_start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return best, topic_weights
+
+
+def bench_transform_search(paths, path_tf, repeat=1):
+    """
+    Time transform_search on a corpus, after transform_bins.
+
+    Returns:
+        the best wall time in seconds
+    """
+    use_paths(path_tf, paths)
+    best = None
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        run.transform_search('Benchmark')
+        elapsed = time.perf_counter() - time_start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_transform_sqlite(paths, path_tf, repeat=1):
+    """
+    Time transform_sqlite on a corpus, after transform_search.
+
+    Returns:
+        the best wall time in seconds
+    """
+    use_paths(path_tf, paths)
+    best = None
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        run.transform_sqlite('Benchmark')
+        elapsed = time.perf_counter() - time_start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_api(path_tf, repeat=1):
+    """
+    Time the requests of the JSON API that the viewer makes for every bin, a
+    page of 500 documents, the documents of a topic and the topics of a
+    document, after transform_sqlite.
+
+    Returns:
+        the best wall time in seconds of all the requests, and their number
+    """
+    path_db = os.path.join(path_tf, 'data', 'Benchmark', 'project.db')
+    requests = []
+    for entry in run.api_response(path_db, ['bins'], {'limit': [str(run.API_MAX_PAGE)]})[1]['items']:
+        if entry['first_id'] is None:
+            continue
+        requests += [(['docs'], {'offset': [str(entry['first_id'] - 1)], 'limit': ['500']}),
+                     (['topics', str(entry['bin_id']) + '_0', 'docs'], {}),
+                     (['docs', str(entry['first_id']), 'topics'], {})]
+    best = None
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        for route, params in requests:
+            run.api_response(path_db, route, params)
+        elapsed = time.perf_counter() - time_start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(requests)
+
+
+def bench_transform_topicSimilarity(paths, path_tf, topic_weights, similarity=None, repeat=1):
+    """
+    Time transform_topicSimilarity on a corpus, after transform_bins.
+
+    Args:
+        similarity -- None to read the similarities from topic_flow.csv, or
+                      the options of the similarities to compute, see
+                      run.transform_topicSimilarity
+
+    Returns:
+        the best wall time in seconds
+    """
+    use_paths(path_tf, paths)
+    best = None
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        run.transform_topicSimilarity('Benchmark', paths['path_topic_tf'], topic_weights, similarity)
+        elapsed = time.perf_counter() - time_start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_outputs(path_tf, repeat=1):
+    """
+    Measure the data files of the benchmark project that the viewer loads.
+
+    Returns:
+        a dictionary mapping every file (every shard folder as a whole) to
+        its size in bytes and the best time json.loads takes to parse the
+        data in it, in seconds
+    """
+    path_project = os.path.join(path_tf, 'data', 'Benchmark')
+    results = OrderedDict()
+    for name in ('Doc.js', 'Bins.js', 'Index.js', 'TopicSimilarity.js', 'docs', 'ranks', 'search'):
+        path = os.path.join(path_project, name)
+        if os.path.isdir(path):
+            paths = [os.path.join(path, x) for x in sorted(os.listdir(path)) if x.endswith('.json')]
+        elif os.path.isfile(path):
+            paths = [path]
+        else:
+            continue
+        texts = []
+        for path_file in paths:
+            with open(path_file, 'r', encoding='utf-8') as file:
+                text = file.read()
+            # the object between "var <name> = " and ";\nread<Name>JSON(<name>);"
+            if path_file.endswith('.js'):
+                text = text[text.index('{', text.index('var ')):text.rindex(';\nread')]
+            texts.append(text)
+        best = None
+        for _ in range(repeat):
+            time_start = time.perf_counter()
+            for text in texts:
+                json.loads(text)
+            elapsed = time.perf_counter() - time_start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {'bytes': sum(os.path.getsize(x) for x in paths), 'parse_seconds': best}
+    return results
+
+
+def git_commit():
+    """
+    Returns:
+        the commit run.py is checked out at, None outside of a git checkout
+    """
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous, results):
+    """
+    Print the timings and sizes of a run next to the ones of a previous run,
+    as saved by --output.
+    """
+    print('\n{:<40} {:>12} {:>12} {:>8}'.format('compared with ' + str(previous.get('commit')), 'before', 'now', 'ratio'))
+    for key in results['stages']:
+        if key in previous.get('stages', {}):
+            before, now = previous['stages'][key]['seconds'], results['stages'][key]['seconds']
+            print('{:<44} {:>11.3f}s {:>11.3f}s {:>8.2f}'.format(key, before, now, now / before if before else float('nan')))
+    for key in results['outputs']:
+        if key in previous.get('outputs', {}):
+            for measure, unit in (('bytes', 'MB'), ('parse_seconds', 's')):
+                before, now = previous['outputs'][key][measure], results['outputs'][key][measure]
+                scale = 2**20 if unit == 'MB' else 1
+                print('{:<44} {:>10.3f}{:<2} {:>10.3f}{:<2} {:>8.2f}'.format(key + ' ' + measure.split('_')[0], before / scale, unit,
+                                                                          now / scale, unit, now / before if before else float('nan')))
+
+
+class BufferedJSObjectWriter(run.JSObjectWriter):
+    """
+    Drop-in replacement of run.JSObjectWriter that collects every entry in a
+    dictionary and serializes it with a single json.dumps when closed, the way
+    Doc.js and Bins.js used to be written. Used as the baseline of the memory
+    benchmark.
+    """
+
+    def __enter__(self):
+        self.data = {}
+        return self
+
+    def write(self, key, value):
+        self.data[str(key)] = value
+
+    def write_json(self, key, value_json):
+        self.data[str(key)] = json.loads(value_json)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            js = self.prefix + json.dumps(self.data) + self.posfix
+            with open(self.path_file, 'w') as file:
+                file.write(js)
+        return False
+
+
+def bench_memory(paths, path_tf, doc_extension='.reply.body.txt'):
+    """
+    Measure the peak memory allocated by transform_doc and transform_bins when
+    Doc.js and Bins.js are streamed to disk, and when they are buffered and
+    serialized at once.
+
+    Returns:
+        a dictionary mapping "<stage> (<path>)" to a tuple of (peak memory in
+        bytes, size of the written file in bytes)
+    """
+    use_paths(path_tf, paths)
+    results = {}
+    writer = run.JSObjectWriter
+    try:
+        for path_name, writer_class in (('streamed', writer), ('buffered', BufferedJSObjectWriter)):
+            run.JSObjectWriter = writer_class
+
+            tracemalloc.start()
+            tweet_id_txt = run.transform_doc('Benchmark', paths['path_doc'], paths['path_meta'], doc_extension)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            size = os.path.getsize(os.path.join(path_tf, 'data', 'Benchmark', 'Doc.js'))
+            results['transform_doc (' + path_name + ')'] = (peak, size)
+
+            tracemalloc.start()
+            run.transform_bins('Benchmark', paths['path_doc'], paths['path_meta'], paths['path_dtm'],
+                               paths['path_ttm'], None, tweet_id_txt)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            size = os.path.getsize(os.path.join(path_tf, 'data', 'Benchmark', 'Bins.js'))
+            results['transform_bins (' + path_name + ')'] = (peak, size)
+    finally:
+        run.JSObjectWriter = writer
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='benchmark.py',
+                                     description='Benchmark the TopicFlow data transformation pipeline on a synthetic Full Disclosure corpus.')
+    parser.add_argument('--docs', type=int, default=100000,
+                        help='Number of documents in the synthetic corpus (default: 100000).')
+    parser.add_argument('--years', type=int, default=1,
+                        help='Number of years of the synthetic corpus, with one bin per month (default: 1).')
+    parser.add_argument('--topics', type=int, default=10,
+                        help='Number of topics of every month (default: 10).')
+    parser.add_argument('--terms', type=int, default=1000,
+                        help='Number of terms in the Topic_Term_Matrix of every month (default: 1000).')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the synthetic corpus (default: 0).')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Number of times each stage is run, the best time is reported (default: 1).')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes, as in "python run.py --workers" (default: 1).')
+    parser.add_argument('--io-threads', type=int, default=8,
+                        help='Number of threads reading documents, as in "python run.py --io-threads" (default: 8).')
+    parser.add_argument('--memory', action='store_true',
+                        help='Also compare the peak memory of streaming Doc.js and Bins.js to disk with buffering them.')
+    parser.add_argument('--dir', type=str, default=None,
+                        help='Directory to generate the corpus in. A temporary directory is used and removed afterwards if not given. A corpus of the same size and seed already in the directory is reused.')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Save the results as JSON to this file.')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Compare the results with the ones saved by --output, e.g. on another commit.')
+    args = parser.parse_args()
+
+    path_root = args.dir or tempfile.mkdtemp(prefix='topicflow_bench_')
+    params = OrderedDict([('docs', args.docs), ('years', args.years), ('topics', args.topics), ('terms', args.terms),
+                          ('seed', args.seed), ('repeat', args.repeat), ('workers', args.workers),
+                          ('io_threads', args.io_threads)])
+    try:
+        # the corpus of a previous run in --dir is reused if it has the same size
+        path_corpus = os.path.join(path_root, 'corpus_{docs}_{years}_{topics}_{terms}_{seed}'.format(**params))
+        path_paths = os.path.join(path_corpus, 'paths.json')
+        if os.path.isfile(path_paths):
+            with open(path_paths, 'r') as file:
+                paths = json.load(file)
+            print('Using the synthetic corpus in', path_corpus)
+        else:
+            print('Generating a synthetic corpus of', args.docs, 'documents in', path_corpus)
+            time_start = time.perf_counter()
+            paths = make_corpus(path_corpus, args.docs, n_topics=args.topics, n_terms=args.terms, seed=args.seed,
+                                years=args.years)
+            with open(path_paths, 'w') as file:
+                json.dump(paths, file)
+            print('Corpus generated in', round(time.perf_counter() - time_start, 2), 'seconds.')
+
+        path_tf = os.path.join(path_root, 'topicflow')
+        shutil.rmtree(os.path.join(path_tf, 'data', 'Benchmark'), ignore_errors=True)
+        stages = OrderedDict()
+        seconds, tweet_id_txt = bench_transform_doc(paths, path_tf, repeat=args.repeat, workers=args.workers,
+                                                    threads=args.io_threads)
+        n_docs = sum(len(bin_ids['id']) for bin_ids in tweet_id_txt.values())
+        stages['transform_doc'] = {'seconds': seconds, 'documents': n_docs}
+        seconds, topic_weights = bench_transform_bins(paths, path_tf, tweet_id_txt, repeat=args.repeat, workers=args.workers)
+        stages['transform_bins'] = {'seconds': seconds, 'bins': len(tweet_id_txt)}
+        stages['transform_search'] = {'seconds': bench_transform_search(paths, path_tf, repeat=args.repeat)}
+        stages['transform_sqlite'] = {'seconds': bench_transform_sqlite(paths, path_tf, repeat=args.repeat)}
+        seconds, n_requests = bench_api(path_tf, repeat=args.repeat)
+        stages['api_requests'] = {'seconds': seconds, 'requests': n_requests}
+        for measure in ['file'] + list(run.SIMILARITY_MEASURES):
+            similarity = None if measure == 'file' else {'measure': measure, 'top_links': 3, 'min_similarity': 0}
+            seconds = bench_transform_topicSimilarity(paths, path_tf, topic_weights, similarity, repeat=args.repeat)
+            stages['transform_topicSimilarity (' + measure + ')'] = {'seconds': seconds}
+        # the outputs of the default similarity file
+        bench_transform_topicSimilarity(paths, path_tf, topic_weights)
+        outputs = measure_outputs(path_tf, repeat=args.repeat)
+
+        print('\n{:<40} {:>8.2f} seconds ({:.0f} documents/second)'.format('transform_doc:', stages['transform_doc']['seconds'],
+                                                                          n_docs / stages['transform_doc']['seconds']))
+        for key, result in list(stages.items())[1:]:
+            print('{:<44} {:>8.2f} seconds'.format(key + ':', result['seconds']))
+        print()
+        for name, result in outputs.items():
+            print('{:<44} {:>8.2f} MB, parsed in {:.3f} seconds'.format(name + ':', result['bytes'] / 2**20, result['parse_seconds']))
+
+        results = OrderedDict([('commit', git_commit()),
+                               ('date', time.strftime('%Y-%m-%dT%H:%M:%S')),
+                               ('machine', OrderedDict([('python', platform.python_version()), ('numpy', np.__version__),
+                                                        ('pandas', pd.__version__), ('platform', platform.platform()),
+                                                        ('cpu_count', os.cpu_count())])),
+                               ('params', params),
+                               ('stages', stages),
+                               ('outputs', outputs)])
+
+        if args.memory:
+            print('\nMeasuring peak memory...')
+            memory = bench_memory(paths, path_tf)
+            print()
+            for stage, (peak, size) in memory.items():
+                print('{:<28} peak {:>8.1f} MB, output {:>8.1f} MB'.format(stage + ':', peak / 2**20, size / 2**20))
+            results['memory'] = OrderedDict((stage, {'peak_bytes': peak, 'bytes': size}) for stage, (peak, size) in memory.items())
+
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+            print('\nResults saved to', args.output)
+        if args.compare:
+            with open(args.compare, 'r') as file:
+                previous = json.load(file)
+            if previous.get('params') != params:
+                print('\nWarning: the results to compare with were measured with', previous.get('params'))
+            compare_results(previous, results)
+    finally:
+        if args.dir is None:
+            shutil.rmtree(path_root)
@@ -1,13 +1,527 @@
 import numpy as np
 import pandas as pd
+import re
 import json
 import os
 import sys
+import io
+import gzip
 import time
+import shutil
+import signal
+import zipfile
+import tarfile
+import platform
+import datetime
+import contextlib
+import hashlib
+import sqlite3
+import collections
 import argparse
+import threading
+import traceback
+import functools
+import email.utils
 import http.server
-import socketserver
+import urllib.parse
+import urllib.request
+import concurrent.futures
 from collections import OrderedDict
+try:
+    import brotli
+except ImportError:  # optional, only .gz variants are written without it
+    brotli = None
+try:
+    import resource
+except ImportError:  # not on Windows, the profile has no peak memory
+    resource = None
+
+
+MONTH_LIST = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# directory of the cache of parsed input files, see read_cached. None
+# disables the cache, it's set by "python run.py" unless --no-cache is given
+path_cache = None
+# changes when the layout of the cached files changes
+CACHE_VERSION = 2
+# the Profiler of the run, None unless --profile is given
+profiler = None
+
+
+class Profiler(object):
+    """
+    Record the wall time, CPU time and memory of the stages of a run, and
+    the counts the stages report, for the report written by --profile.
+
+    The memory of a stage is the resident memory of the process when the
+    stage ends and how much it grew during the stage. The peak resident
+    memory is the one of the whole process so far: it only tells the stage
+    that first reached it.
+
+    Example:
+        with profiler.stage('transform_doc'):
+            ...
+            report(documents=10)
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.current = None
+        self.started = datetime.datetime.now().astimezone()
+        self.time_start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = OrderedDict()
+        record['name'] = name
+        record['counts'] = OrderedDict()
+        self.current = record
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        rss_start = rss_mb()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 4)
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 4)
+            record['rss_mb'] = rss_mb()
+            record['rss_growth_mb'] = round(record['rss_mb'] - rss_start, 1) if rss_start is not None else None
+            record['process_peak_rss_mb'] = peak_rss_mb()
+            self.stages.append(record)
+            self.current = None
+
+    def write(self, path_file, **info):
+        """
+        Write the report as JSON: the info given, the machine, the stages and
+        the totals of the run.
+        """
+        profile = OrderedDict()
+        profile.update(info)
+        profile['started'] = self.started.isoformat(timespec='seconds')
+        profile['machine'] = OrderedDict([('python', platform.python_version()),
+                                          ('numpy', np.__version__),
+                                          ('pandas', pd.__version__),
+                                          ('platform', platform.platform()),
+                                          ('cpu_count', os.cpu_count())])
+        profile['stages'] = self.stages
+        profile['wall_seconds'] = round(time.perf_counter() - self.time_start, 4)
+        profile['cpu_seconds'] = round(sum(stage['cpu_seconds'] for stage in self.stages), 4)
+        profile['peak_rss_mb'] = peak_rss_mb()
+        with open(path_file, 'w', encoding='utf-8') as file:
+            json.dump(profile, file, indent=2)
+
+
+def rss_mb():
+    """
+    Returns:
+        the resident memory of this process in MB, None if it can't be
+        measured (on Linux only)
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+
+
+def peak_rss_mb():
+    """
+    Returns:
+        the peak resident memory of this process so far in MB, None if it
+        can't be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def profiled(name):
+    """
+    Returns:
+        a context manager that records a stage of the run if profiling
+    """
+    return profiler.stage(name) if profiler is not None else contextlib.nullcontext()
+
+
+def report(**counts):
+    """
+    Add counts to the stage of the run that is being profiled, if any.
+    """
+    if profiler is not None and profiler.current is not None:
+        profiler.current['counts'].update(counts)
+
+
+def bin_sort_key(name):
+    """
+    Sort key that puts bin names such as "2012_Jan", "2012_01" or "2012_W05"
+    in chronological order.
+    """
+    key = []
+    for part in name.split('_'):
+        if part in MONTH_LIST:
+            key.append((0, MONTH_LIST.index(part) + 1))
+        elif part.isdigit():
+            key.append((0, int(part)))
+        else:
+            key.append((1, part))
+    return key
+
+
+def match_bin(name, candidates, path):
+    """
+    Find the file or folder of a bin among the entries of a directory.
+
+    An entry named after the bin ("2012_Jan", "2012_Jan.csv") is preferred.
+    Otherwise an entry named after the last part of the bin name ("Jan.csv",
+    "2012.metadata_Jan") is used, which is the layout of single-year projects.
+
+    Args:
+        name       -- name of the bin, e.g. "2012_Jan"
+        candidates -- a list of entries of the directory
+        path       -- path of the directory, used in error messages
+
+    Returns:
+        the matching entry
+    """
+    stems = {x: os.path.splitext(x)[0] if x.endswith('.csv') else x for x in candidates}
+    exact = [x for x in candidates if stems[x] == name]
+    if exact:
+        return exact[0]
+    suffix = name.split('_')[-1]
+    partial = [x for x in candidates if stems[x] == suffix or stems[x].endswith('_' + suffix)]
+    if len(partial) == 1:
+        return partial[0]
+    if len(partial) == 0:
+        raise FileNotFoundError('No entry for bin "' + name + '" in ' + path)
+    raise ValueError('Bin "' + name + '" matches more than one entry in ' + path + ': ' + ', '.join(sorted(partial)))
+
+
+# extensions of the archives the documents and metadata can be read from
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+class Archive(object):
+    """
+    The files of a .zip or .tar archive, compressed or not, e.g. a year of
+    documents or metadata, read without being extracted to disk first.
+
+    The members of the archive are addressed as if the archive was a
+    directory, e.g. "2012.parsed.tar.gz/2012_Jan" is the folder "2012_Jan" of
+    the archive, see find_archive. A single folder that holds every member,
+    e.g. "2012.parsed/", is left out. Only the list of the members is kept
+    in memory, the files of a folder are read when they're needed, e.g. the
+    documents of one bin, see read_files.
+
+    The archive is kept open between two reads, until it's closed. A
+    compressed .tar archive is one stream, which can only be read from start
+    to end, so reading its folders in the order they're stored decompresses
+    it once.
+
+    Usage:
+        archive = open_archive(path_file)
+        archive.listdir('2012_Jan')
+        archive.read_files('2012_Jan', ['2012_Jan_0.reply.body.txt'])
+    """
+
+    def __init__(self, path_file):
+        """
+        Args:
+            path_file -- path of the archive
+        """
+        self.path_file = path_file
+        self.is_zip = zipfile.is_zipfile(path_file)
+        # a compressed .tar archive is read sequentially
+        self.sequential = not self.is_zip and not path_file.lower().endswith('.tar')
+        stat = os.stat(path_file)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        self.folders = None  # folder -> {name: None for a folder, or (size, mtime in nanoseconds)}
+        self.files = None    # path of a file -> its member, a zipfile.ZipInfo or tarfile.TarInfo
+        self.handle = None   # the open zipfile.ZipFile or tarfile.TarFile
+        self.lock = threading.Lock()
+        self.load()
+
+    def members(self):
+        """
+        List the members of the archive in the order they are stored.
+
+        Returns:
+            an iterator over (path, is folder, size, mtime in nanoseconds,
+            member) tuples
+        """
+        if self.is_zip:
+            # the directory of a zip archive is read when it's opened
+            for info in self.open().infolist():
+                mtime_ns = int(datetime.datetime(*info.date_time).timestamp()) * 10**9
+                yield info.filename, info.is_dir(), info.file_size, mtime_ns, info
+        else:
+            # listing a compressed archive decompresses it from start to end
+            with tarfile.open(self.path_file, 'r:*') as archive:
+                for member in archive:
+                    if member.isdir() or member.isfile():
+                        yield member.name, member.isdir(), member.size, int(member.mtime) * 10**9, member
+
+    def load(self):
+        """
+        List the folders and files of the archive, see members.
+        """
+        folders = {'': OrderedDict()}
+        files = {}
+        for name, is_folder, size, mtime_ns, member in self.members():
+            parts = [x for x in name.split('/') if x not in ('', '.')]
+            # skip the folders zip tools of macOS add
+            if not parts or parts[0] == '__MACOSX':
+                continue
+            for depth in range(len(parts)):
+                folder = '/'.join(parts[:depth])
+                if depth < len(parts) - 1 or is_folder:
+                    folders.setdefault(folder, OrderedDict()).setdefault(parts[depth], None)
+                    folders.setdefault('/'.join(parts[:depth + 1]), OrderedDict())
+                else:
+                    folders.setdefault(folder, OrderedDict())[parts[depth]] = (size, mtime_ns)
+            if not is_folder:
+                files['/'.join(parts)] = member
+
+        # leave out the folders that hold every member
+        root = ''
+        while len(folders[root]) == 1 and all(entry is None for entry in folders[root].values()):
+            child = (root + '/' if root else '') + next(iter(folders[root]))
+            if any(entry is not None for entry in folders[child].values()):
+                break
+            root = child
+        strip = lambda path: path[len(root) + 1:] if root else path
+        self.folders = {strip(folder): entries for folder, entries in folders.items()
+                        if folder == root or folder.startswith(root + '/') or not root}
+        self.files = {strip(path): member for path, member in files.items() if path.startswith(root + '/') or not root}
+
+    def open(self):
+        """
+        Returns:
+            the open archive, a zipfile.ZipFile or tarfile.TarFile
+        """
+        if self.handle is None:
+            self.handle = zipfile.ZipFile(self.path_file) if self.is_zip else tarfile.open(self.path_file, 'r:*')
+        return self.handle
+
+    def close(self):
+        """
+        Close the archive, it's opened again if needed.
+        """
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def entries(self, folder):
+        if folder not in self.folders:
+            raise FileNotFoundError('No folder "' + folder + '" in ' + self.path_file)
+        return self.folders[folder]
+
+    def listdir(self, folder):
+        """
+        Returns:
+            a list of (name, is folder) tuples of the entries of a folder of
+            the archive, '' for its root, in the order they are stored
+        """
+        return [(name, entry is None) for name, entry in self.entries(folder).items()]
+
+    def scan(self, folder, extension=''):
+        """
+        Returns:
+            a list of (name, size, modification time in nanoseconds) tuples
+            of the files of a folder of the archive, see scan_folder
+        """
+        return [(name, entry[0], entry[1]) for name, entry in self.entries(folder).items()
+                if entry is not None and name.endswith(extension)]
+
+    def read_files(self, folder, names):
+        """
+        Read files of a folder of the archive, in the order they are stored.
+
+        Args:
+            folder -- the folder, '' for the root of the archive
+            names  -- the names of the files
+
+        Returns:
+            a dictionary that maps the name of every file found to its content
+        """
+        paths = {name: folder + '/' + name if folder else name for name in names}
+        members = [(name, self.files[paths[name]]) for name in names if paths[name] in self.files]
+        contents = {}
+        with self.lock:
+            archive = self.open()
+            if self.is_zip:
+                members.sort(key=lambda x: x[1].header_offset)
+                for name, info in members:
+                    contents[name] = archive.read(info)
+            else:
+                # a member stored before the position of a compressed stream
+                # starts it over
+                members.sort(key=lambda x: x[1].offset)
+                for name, member in members:
+                    contents[name] = archive.extractfile(member).read()
+        return contents
+
+    def read(self, folder, name):
+        """
+        Returns:
+            the content of a file of the archive
+        """
+        contents = self.read_files(folder, [name])
+        if name not in contents:
+            raise FileNotFoundError('No file "' + (folder + '/' + name if folder else name) + '" in ' + self.path_file)
+        return contents[name]
+
+
+# the archives listed by open_archive, by path, the most recently used last.
+# Only the lists of their members are kept, see Archive
+archives = OrderedDict()
+# the number of archives kept listed, two per project
+ARCHIVE_CACHE = 4
+
+
+def is_archive(path):
+    """
+    Returns:
+        True if path is an archive the documents and metadata can be read
+        from, see Archive
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def open_archive(path_file):
+    """
+    List an archive once, see Archive. The archive is listed again if it
+    changed since.
+
+    Args:
+        path_file -- path of the archive
+
+    Returns:
+        the Archive, the one listed before if the archive didn't change
+    """
+    path_file = os.path.normpath(path_file)
+    stat = os.stat(path_file)
+    archive = archives.pop(path_file, None)
+    if archive is None or archive.signature != (stat.st_size, stat.st_mtime_ns):
+        if archive is not None:
+            archive.close()
+        archive = Archive(path_file)
+    archives[path_file] = archive
+    while len(archives) > ARCHIVE_CACHE:
+        archives.popitem(last=False)[1].close()
+    return archive
+
+
+def close_archives():
+    """
+    Forget the archives listed so far, e.g. once a project is built.
+    """
+    while archives:
+        archives.popitem()[1].close()
+
+
+def find_archive(path):
+    """
+    Find the archive a path is in, e.g. "2012.parsed.tar.gz/2012_Jan". An
+    archive that wasn't listed yet, e.g. in a worker process, is listed.
+
+    Returns:
+        a tuple of the Archive and the folder of the path in the archive, or
+        of None and None if the path isn't in an archive
+    """
+    path = os.path.normpath(path)
+    for path_file in archives:
+        if path == path_file or path.startswith(path_file + os.sep):
+            return open_archive(path_file), path[len(path_file) + 1:].replace(os.sep, '/')
+    # only a path that isn't on disk can be in an archive
+    if not is_archive(path) and os.path.exists(path):
+        return None, None
+    head = path
+    while not is_archive(head):
+        if os.path.dirname(head) == head:
+            return None, None
+        head = os.path.dirname(head)
+    return open_archive(head), path[len(head) + 1:].replace(os.sep, '/')
+
+
+def list_entries(path):
+    """
+    List a directory, or a folder of an archive, see find_archive.
+
+    Returns:
+        a list of (name, is folder) tuples
+    """
+    archive, folder = find_archive(path)
+    if archive is not None:
+        return archive.listdir(folder)
+    with os.scandir(path) as entries:
+        return [(entry.name, entry.is_dir()) for entry in entries]
+
+
+def find_bins(path_doc, path_meta=None, path_dtm=None, path_ttm=None, skipped=None):
+    """
+    Find the bins (time slices) of a project. Every sub-folder of the
+    documents directory is one bin, and bins are ordered by time, so a
+    project can span several years or use bins other than months.
+
+    A bin whose metadata has no date that can be parsed can't be placed in
+    time, and is left out when the metadata directory is given.
+
+    The documents and metadata directories can be archives instead, see
+    Archive.
+
+    Args:
+        path_doc  -- path of documents directory or archive
+        path_meta -- path of documents metadata directory or archive, optional
+        path_dtm  -- path of Document_Topic_Matrix directory, optional
+        path_ttm  -- path of Topic_Term_Matrix directory, optional
+        skipped   -- a list the names of the bins left out are appended to,
+                     optional
+
+    Returns:
+        a list of dictionaries, one per bin in time order, with the name of
+        the bin ("name"), the paths of its document folder ("doc"), metadata
+        folder ("meta"), Document_Topic_Matrix ("dtm") and Topic_Term_Matrix
+        ("ttm"), and the name of the bin in the topicflow similarity file
+        ("label"). Paths of directories that weren't given are None.
+    """
+    # skip anything that isn't a folder, for example a file like .DS_store can
+    # do huge damage to our pipeline
+    names = [x for x, is_folder in list_entries(path_doc) if is_folder and not x.startswith('.')]
+    names.sort(key=bin_sort_key)
+
+    listings = {}
+    for key, path in (('meta', path_meta), ('dtm', path_dtm), ('ttm', path_ttm)):
+        if path is not None:
+            entries = [(x, is_folder) for x, is_folder in list_entries(path) if not x.startswith('.')]
+            if key == 'meta':
+                entries = [x for x, is_folder in entries if is_folder]
+            else:
+                entries = [x for x, is_folder in entries if x.endswith('.csv')]
+            listings[key] = (path, entries)
+
+    bins = []
+    for name in names:
+        bin_paths = {'name': name, 'doc': os.path.join(path_doc, name),
+                     'meta': None, 'dtm': None, 'ttm': None, 'label': None}
+        for key, (path, entries) in listings.items():
+            bin_paths[key] = os.path.join(path, match_bin(name, entries, path))
+        if bin_paths['dtm'] is not None:
+            bin_paths['label'] = os.path.splitext(os.path.basename(bin_paths['dtm']))[0]
+        if bin_paths['meta'] is not None and not parse_dates(read_meta(bin_paths['meta'])['date']).notna().any():
+            if skipped is not None:
+                skipped.append(name)
+            continue
+        bins.append(bin_paths)
+
+    # two bins sharing one file means the files aren't named after the bins
+    for key in listings:
+        matched = [x[key] for x in bins]
+        if len(set(matched)) != len(matched):
+            raise ValueError('Several bins share the same ' + key + ' entry in ' + listings[key][0] +
+                             ', name the entries after the bins, e.g. "' + names[0] + '"')
+    return bins
 
 
 def read_data(df_list=False, df_topic_doc=False, df_topic_word=False, df_topic_tf=False):
@@ -20,318 +534,1967 @@ def read_data(df_list=False, df_topic_doc=False, df_topic_word=False, df_topic_t
 
     Args:
         df_list       -- if set to True, returns a list containing the metadata of
-                         Full Disclosure emails of every month in a year
+                         Full Disclosure emails of every bin
         df_topic_doc  -- if set to True, returns a list containing the Topic-Document
-                         matrixes of every month in a year
+                         matrixes of every bin
         df_topic_word -- if set to True, returns a list containing the Topic-Word
-                         (or Topic-Term) matrixes of every month in a year
+                         (or Topic-Term) matrixes of every bin
         df_topic_tf   -- if set to True, returns a pandas.DataFrame object showing
                          the similarity scores of some topics between every two
-                         months
+                         bins
 
     Returns:
         Depending on which one argument is set to True, the function returns either
-        a list of 12 pandas.DataFrame objects representing the relevent information
-        of 12 months in a year, or one pandas.DataFrame object representing the
-        similarity scores of a year.
+        a list of pandas.DataFrame objects representing the relevent information
+        of every bin (see find_bins), or one pandas.DataFrame object representing
+        the similarity scores of all bins.
     """
-    month_list = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    month_index_list = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-
     if df_list == True:
-        df_list = []
-        for month_index in month_index_list:
-            for folder in os.listdir(path_meta):
-                if folder.endswith('_' + month_index):
-                    path_folder = os.path.join(path_meta, folder)
-                    file_csv = [x for x in os.listdir(path_folder) if x.endswith('.csv')][0]
-                    path_csv = os.path.join(path_folder, file_csv)
-                    df_list.append(pd.read_csv(path_csv))
-        return df_list
+        return [read_meta(bin_paths['meta']) for bin_paths in find_bins(path_doc, path_meta=path_meta)]
 
     # Load a list of data frames, where each element is a table of dtm folder
     if df_topic_doc == True:
-        df_topic_doc = []
-        for month in month_list:
-            filename = month + ".csv"
-            path_file = os.path.join(path_dtm, filename) 
-            df_topic_doc.append(
-                pd.read_csv(path_file,
-                            index_col= 0)
-            )
-
-       # Adds .txt to the row.names of each dtm 
-        df_topic_doc_modified = []
-        for month_ix in range(len(month_list)):
-            df_tmp = df_topic_doc[month_ix].copy()
-            if not df_tmp.index.tolist()[0].endswith('.txt'):
-                df_tmp.index = [x + '.txt' for x in df_tmp.index.tolist()]
-            df_topic_doc_modified.append(df_tmp)
-            del df_tmp
-        return df_topic_doc_modified
+        return [read_topic_doc(bin_paths['dtm']) for bin_paths in find_bins(path_doc, path_dtm=path_dtm)]
 
     if df_topic_word == True:
-        df_topic_word = []
-        for month in month_list:
-            filename = month + ".csv"
-            path_file = os.path.join(path_ttm, filename) 
-            df_topic_word.append(
-                pd.read_csv(path_file,
-                            index_col= 0)
-            )
-        return df_topic_word
+        return [read_topic_word(bin_paths['ttm']) for bin_paths in find_bins(path_doc, path_ttm=path_ttm)]
 
     if df_topic_tf == True:
         df_topic_tf = pd.read_csv(path_topic_tf)
         return df_topic_tf
 
 
-def transform_doc(project_name, path_doc, path_meta, doc_extension):
+def read_cached(path_file, read, kind):
+    """
+    Read a parsed input file from the cache, or parse it and add it to the
+    cache. The metadata and matrixes are stored as NumPy arrays in an .npz
+    file per input file, see frame_to_arrays, which loads much faster than
+    parsing the .csv file again. An entry is used as long as the size and
+    modification time of the input file are the ones it was parsed with.
+
+    Args:
+        path_file -- path of the input file
+        read      -- function that parses the input file into a
+                     pandas.DataFrame object
+        kind      -- name of the way read parses the file, files parsed in
+                     different ways are cached apart
+
+    Returns:
+        the pandas.DataFrame object returned by read
+    """
+    if path_cache is None:
+        return read(path_file)
+    path_file = os.path.abspath(path_file)
+    stat = os.stat(path_file)
+    source = np.array([str(CACHE_VERSION), kind, path_file, str(stat.st_size), str(stat.st_mtime_ns)])
+    key = hashlib.sha1((kind + '\0' + path_file).encode('utf-8')).hexdigest()
+    path_entry = os.path.join(path_cache, key + '.npz')
+    try:
+        with np.load(path_entry, allow_pickle=False) as arrays:
+            if np.array_equal(arrays['source'], source):
+                return arrays_to_frame(arrays)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        # no entry yet, or an unreadable one that is written again
+        pass
+
+    df = read(path_file)
+    arrays = frame_to_arrays(df)
+    if arrays is not None:
+        arrays['source'] = source
+        path_tmp = path_entry + '.' + str(os.getpid()) + '.tmp'
+        try:
+            os.makedirs(path_cache, exist_ok=True)
+            with open(path_tmp, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(path_tmp, path_entry)
+        except OSError:
+            # the cache is only an optimization, e.g. in a read-only directory
+            if os.path.isfile(path_tmp):
+                os.remove(path_tmp)
+    return df
+
+
+def column_to_arrays(values):
+    """
+    Returns:
+        a tuple of a NumPy array of numbers or strings holding the values of
+        a column and the mask of its missing strings (None if there are
+        none), or None if the column holds other objects
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return values, None
+    if values.dtype.kind != 'O':
+        return None
+    null = pd.isna(values)
+    if not all(isinstance(x, str) for x in values[~null]):
+        return None
+    return np.where(null, '', values).astype(str), null if null.any() else None
+
+
+def arrays_to_column(values, null):
+    """
+    Returns:
+        the values of a column laid out by column_to_arrays
+    """
+    if values.dtype.kind != 'U':
+        return values
+    values = values.astype(object)
+    if null is not None:
+        values[null] = np.nan
+    return values
+
+
+def frame_to_arrays(df):
+    """
+    Lay out a pandas.DataFrame object as a dictionary of NumPy arrays that
+    np.savez writes without pickling: the index, the column names, and the
+    values, as one 2-D array if every column holds floats (a matrix) or as
+    one array per column otherwise (the metadata). Floats are stored as
+    float64, so a cached file gives the same numbers as a parsed one.
+
+    Returns:
+        the dictionary, or None if the DataFrame holds other objects than
+        numbers and strings
+    """
+    arrays = {}
+    if not all(isinstance(x, str) for x in df.columns):
+        return None
+    arrays['columns'] = np.array(df.columns.tolist(), dtype=str)
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1:
+        arrays['rows'] = np.array(len(df))
+    else:
+        index = column_to_arrays(df.index.values)
+        if index is None:
+            return None
+        arrays['index'] = index[0]
+        if index[1] is not None:
+            arrays['index_null'] = index[1]
+    if df.index.name is not None:
+        arrays['index_name'] = np.array(str(df.index.name))
+
+    if len(df.columns) > 0 and all(dtype == np.float64 for dtype in df.dtypes):
+        arrays['values'] = df.values
+        return arrays
+    for i in range(len(df.columns)):
+        column = column_to_arrays(df.iloc[:, i].values)
+        if column is None:
+            return None
+        arrays['c' + str(i)] = column[0]
+        if column[1] is not None:
+            arrays['c' + str(i) + '_null'] = column[1]
+    return arrays
+
+
+def arrays_to_frame(arrays):
+    """
+    Returns:
+        the pandas.DataFrame object laid out by frame_to_arrays
+    """
+    if 'rows' in arrays:
+        index = pd.RangeIndex(int(arrays['rows']))
+    else:
+        index = pd.Index(arrays_to_column(arrays['index'], arrays['index_null'] if 'index_null' in arrays else None))
+    if 'index_name' in arrays:
+        index.name = str(arrays['index_name'])
+    columns = arrays['columns'].tolist()
+
+    if 'values' in arrays:
+        return pd.DataFrame(arrays_to_column(arrays['values'], None), index=index, columns=columns)
+    df = pd.DataFrame({i: arrays_to_column(arrays['c' + str(i)], arrays['c' + str(i) + '_null'] if 'c' + str(i) + '_null' in arrays else None)
+                       for i in range(len(columns))}, index=index)
+    df.columns = pd.Index(columns)
+    return df
+
+
+def read_meta(path_folder):
+    """
+    Read the metadata of the documents of one bin.
+
+    Args:
+        path_folder -- path of the metadata folder of the bin, which can be
+                       in an archive, see find_archive
+
+    Returns:
+        a pandas.DataFrame object of the first .csv file in the folder
+    """
+    archive, folder = find_archive(path_folder)
+    if archive is not None:
+        file_csv = [x for x, is_folder in archive.listdir(folder) if x.endswith('.csv') and not is_folder][0]
+        return pd.read_csv(io.BytesIO(archive.read(folder, file_csv)))
+    file_csv = [x for x in os.listdir(path_folder) if x.endswith('.csv')][0]
+    path_csv = os.path.join(path_folder, file_csv)
+    return read_cached(path_csv, pd.read_csv, 'meta')
+
+
+def read_topic_doc(path_file):
+    """
+    Read the Document_Topic_Matrix of one bin.
+
+    Args:
+        path_file -- path of the Document_Topic_Matrix .csv file
+
+    Returns:
+        a pandas.DataFrame object with one row per document, indexed by
+        .txt file name, and one column per topic
+    """
+    df_topic_doc = read_cached(path_file, read_matrix, 'matrix')
+
+    # Adds .txt to the row.names of the dtm
+    if len(df_topic_doc) > 0 and not df_topic_doc.index.tolist()[0].endswith('.txt'):
+        df_topic_doc.index = [x + '.txt' for x in df_topic_doc.index.tolist()]
+    return df_topic_doc
+
+
+def read_topic_word(path_file):
+    """
+    Read the Topic_Term_Matrix of one bin.
+
+    Args:
+        path_file -- path of the Topic_Term_Matrix .csv file
+
+    Returns:
+        a pandas.DataFrame object with one row per topic and one column per
+        term
+    """
+    return read_cached(path_file, read_matrix, 'matrix')
+
+
+def read_matrix(path_file):
+    """
+    Parse a Document_Topic_Matrix or Topic_Term_Matrix .csv file, indexed by
+    its first column.
+    """
+    return pd.read_csv(path_file, index_col= 0)
+
+
+def count_topics(path_file):
+    """
+    Count the topics of a Topic_Term_Matrix without parsing the whole file,
+    unless it's cached.
+
+    Args:
+        path_file -- path of a Topic_Term_Matrix .csv file
+
+    Returns:
+        the number of topics (rows) in the matrix
+    """
+    if path_cache is not None:
+        return len(read_topic_word(path_file))
+    return len(pd.read_csv(path_file, usecols=[0]))
+
+
+def parse_dates(dates):
+    """
+    Parse a column of document dates in one vectorized pass.
+
+    Dates that don't match the format pandas infers for the column (or a
+    column mixing UTC offsets) are parsed one by one, so every date that
+    pd.to_datetime can read on its own is kept. Dates with a UTC offset keep
+    the time they were written at, as TopicFlow shows them.
+
+    Args:
+        dates -- a pandas.Series of date strings
+
+    Returns:
+        a pandas.Series of datetime64 values, NaT for the dates that can't be
+        parsed
+    """
+    dates = pd.Series(dates).reset_index(drop=True)
+    try:
+        parsed = pd.to_datetime(dates, errors='coerce')
+    except (ValueError, TypeError):
+        parsed = None
+    if parsed is None or not pd.api.types.is_datetime64_any_dtype(parsed):
+        parsed = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[ns]')
+    elif parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+
+    # fall back to parsing the remaining dates individually
+    for ix in dates.index[parsed.isna() & dates.notna()]:
+        try:
+            x = pd.to_datetime(dates[ix])
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if not pd.isnull(x):
+            parsed[ix] = x.tz_localize(None) if x.tzinfo is not None else x
+    return parsed
+
+
+def format_dates(dates):
+    """
+    Parse a column of document dates and format them as "m/d/yyyy h:m", the
+    timestamp format TopicFlow reads, see parse_dates.
+
+    Args:
+        dates -- a pandas.Series of date strings, or of parsed dates
+
+    Returns:
+        a pandas.Series of formatted dates, with None for the dates that
+        can't be parsed
+    """
+    parsed = parse_dates(dates)
+    formatted = pd.Series(None, index=parsed.index, dtype=object)
+    valid = parsed.notna()
+    if valid.any():
+        parsed_valid = parsed[valid].dt
+        formatted[valid] = (parsed_valid.month.astype(str) + '/' + parsed_valid.day.astype(str) + '/' +
+                            parsed_valid.year.astype(str) + ' ' + parsed_valid.hour.astype(str) + ':' +
+                            parsed_valid.minute.astype(str))
+    return formatted
+
+
+def index_metadata(df_list):
+    """
+    Build an id-keyed index of the document metadata of every month, so the
+    author and date of a document can be found in constant time.
+
+    Args:
+        df_list -- a list of pandas.DataFrame objects containing the metadata
+                   of every month, as returned by read_data(df_list=True)
+
+    Returns:
+        a list of dictionaries, one per month, that map a document id
+        (e.g. '2005_Jan_0') to a tuple of (author, formatted date). Documents
+        whose date can't be parsed are left out, and a blank author is ''.
+    """
+    meta_index = []
+    for df_meta in df_list:
+        # the first entry wins if an id is listed more than once
+        df_meta = df_meta.drop_duplicates(subset='id', keep='first')
+        dates = format_dates(df_meta['date'])
+        # pandas reads blank cells as NaN, which isn't valid JSON
+        authors = df_meta['author'].astype(object).where(df_meta['author'].notna(), '')
+        meta_index.append({doc_id: (author, date)
+                           for doc_id, author, date in zip(df_meta['id'], authors, dates)
+                           if isinstance(date, str)})  # not None, or NaN with some pandas versions
+    return meta_index
+
+
+class JSObjectWriter(object):
+    """
+    Write a JavaScript data file that TopicFlow can read, e.g.
+
+        function populate_bins_<project>(){
+        var bin_data = {"0": {...}, "1": {...}};
+        readBinJSON(bin_data);
+        }
+
+    one entry of the JSON object at a time. Every entry is written to the
+    file as soon as it is produced, so the data of a whole project never
+    has to be held in memory. The file is identical to the one json.dumps
+    would produce for a dictionary of the same entries.
+
+    The file is written under a temporary name and replaces the previous
+    version when closed, so the previous version can be read while the new
+    one is written (see read_entries) and is kept if writing fails.
+
+    Usage:
+        with JSObjectWriter(path_file, prefix, posfix) as writer:
+            writer.write(key, value)
+    """
+
+    def __init__(self, path_file, prefix, posfix):
+        """
+        Args:
+            path_file -- path of the .js file
+            prefix    -- JavaScript written before the JSON object
+            posfix    -- JavaScript written after the JSON object
+        """
+        self.path_file = path_file
+        self.prefix = prefix
+        self.posfix = posfix
+        self.file = None
+        self.count = 0
+        self.offset = 0  # characters written after the opening brace
+
+    def __enter__(self):
+        self.file = open(self.path_file + '.tmp', 'w', encoding='utf-8')
+        self.file.write(self.prefix + '{')
+        return self
+
+    def write(self, key, value):
+        """
+        Write one entry of the JSON object.
+
+        Args:
+            key   -- key of the entry, converted to a string
+            value -- a JSON serializable value
+        """
+        # serialize before writing, so a value that can't be serialized
+        # doesn't leave half an entry in the file
+        self.write_json(key, json.dumps(value))
+
+    def write_json(self, key, value_json):
+        """
+        Write one entry of the JSON object whose value is already serialized,
+        e.g. by a worker process.
+
+        Args:
+            key        -- key of the entry, converted to a string
+            value_json -- the value serialized by json.dumps
+        """
+        self.write_entries(json.dumps(str(key)) + ': ' + value_json, 1)
+
+    def write_entries(self, entries_json, count):
+        """
+        Write entries of the JSON object that are already serialized and
+        joined by ", ", e.g. copied from the previous version of the file by
+        read_entries.
+
+        Args:
+            entries_json -- the serialized entries
+            count        -- number of entries in entries_json
+        """
+        if count == 0:
+            return
+        if self.count > 0:
+            entries_json = ', ' + entries_json
+        self.file.write(entries_json)
+        self.offset += len(entries_json)
+        self.count += count
+
+    def position(self):
+        """
+        Returns:
+            the offset in the JSON object at which the next entry starts, see
+            read_entries
+        """
+        return self.offset + (2 if self.count > 0 else 0)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.file.write('}' + self.posfix)
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.path_file + '.tmp', self.path_file)
+        else:
+            os.remove(self.path_file + '.tmp')
+        return False
+
+
+def read_entries(path_file, prefix, span):
+    """
+    Read consecutive entries of the JSON object of a file written by
+    JSObjectWriter, without reading the rest of the file.
+
+    json.dumps escapes every character that isn't ASCII, so offsets in the
+    JSON object are the same in characters and in bytes.
+
+    Args:
+        path_file -- path of the .js file
+        prefix    -- JavaScript written before the JSON object
+        span      -- [start, end] offsets of the entries in the JSON object,
+                     from JSObjectWriter.position and JSObjectWriter.offset
+
+    Returns:
+        the entries serialized and joined by ", ", see
+        JSObjectWriter.write_entries
+    """
+    with open(path_file, 'rb') as file:
+        file.seek(len((prefix + '{').encode('utf-8')) + span[0])
+        return file.read(span[1] - span[0]).decode('ascii')
+
+
+def scan_folder(path_folder, extension=''):
+    """
+    List the files of a folder with their sizes and modification times, in
+    one scan of the folder.
+
+    Args:
+        path_folder -- path of the folder, which can be in an archive, see
+                       find_archive
+        extension   -- only files with this extension are listed
+
+    Returns:
+        a list of (name, size, modification time in nanoseconds) tuples, in
+        the order the folder lists them
+    """
+    archive, folder = find_archive(path_folder)
+    if archive is not None:
+        return archive.scan(folder, extension)
+    files = []
+    with os.scandir(path_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(extension):
+                stat = entry.stat()
+                files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+def folder_signature(path_folder, extension='', files=None):
+    """
+    Fingerprint of the files of a folder, from their names, sizes and
+    modification times. It changes whenever a file is added, removed or
+    modified.
+
+    Args:
+        path_folder -- path of the folder
+        extension   -- only files with this extension are considered
+        files       -- the files of the folder returned by scan_folder, the
+                       folder is scanned if not given
+
+    Returns:
+        a SHA-1 hex digest
+    """
+    if files is None:
+        files = scan_folder(path_folder, extension)
+    digest = hashlib.sha1()
+    for name, size, mtime_ns in sorted(files):
+        digest.update((name + '\t' + str(size) + '\t' + str(mtime_ns) + '\n').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def file_signature(path_file, cache):
+    """
+    Fingerprint of the content of a file.
+
+    The file is only hashed again when its size or modification time differs
+    from the ones in the cache, so a file that was rewritten with the same
+    content doesn't count as changed.
+
+    Args:
+        path_file -- path of the file
+        cache     -- a dictionary that maps paths to their size, modification
+                     time and hash, updated in place
+
+    Returns:
+        a SHA-1 hex digest
+    """
+    stat = os.stat(path_file)
+    entry = cache.get(path_file)
+    if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+        digest = hashlib.sha1()
+        with open(path_file, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': digest.hexdigest()}
+        cache[path_file] = entry
+    return entry['sha1']
+
+
+def new_manifest(project_name, path_doc, path_meta, doc_extension, path_dtm, path_ttm, path_topic_tf, top_words=10, compact=None, similarity=None, top_docs=100, dedup=False, sqlite=False, levels=False):
+    """
+    Create the manifest of a new project. The manifest records the arguments
+    the project was added with and, once Doc.js and Bins.js are written, the
+    fingerprints of the input files of every bin and where the bin is in the
+    two files, so "python run.py -u" only has to transform the bins whose
+    input files changed.
+
+    Returns:
+        the manifest, a JSON serializable dictionary
+    """
+    return {'project': project_name,
+            'args': {'path_doc': os.path.abspath(path_doc),
+                     'path_meta': os.path.abspath(path_meta),
+                     'doc_extension': doc_extension,
+                     'path_dtm': os.path.abspath(path_dtm),
+                     'path_ttm': os.path.abspath(path_ttm),
+                     'path_topic_tf': os.path.abspath(path_topic_tf) if path_topic_tf is not None else None,
+                     'top_words': top_words,
+                     'compact': compact,
+                     'similarity': similarity,
+                     'top_docs': top_docs,
+                     'dedup': dedup,
+                     'sqlite': sqlite,
+                     'levels': levels},
+            'files': {},
+            'doc': [],
+            'bins': []}
+
+
+def read_manifest(project_name):
+    """
+    Read the manifest of a project, see new_manifest.
+
+    Returns:
+        the manifest, or None if the project has none
+    """
+    path_file = os.path.join(path_tf, 'data', project_name, 'manifest.json')
+    if not os.path.isfile(path_file):
+        return None
+    with open(path_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_manifest(project_name, manifest):
+    """
+    Write the manifest of a project, see new_manifest.
+
+    Outcome:
+        "manifest.json"
+    """
+    path_file = os.path.join(path_tf, 'data', project_name, 'manifest.json')
+    with open(path_file + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+    os.replace(path_file + '.tmp', path_file)
+
+
+def shard_path(project_name, folder, bin_ix):
+    """
+    Path of the shard of one bin, a JSON file holding the bin's documents
+    (folder "docs") or ranked documents and topics (folder "ranks") that the
+    viewer loads when the bin is selected.
+    """
+    return os.path.join(path_tf, 'data', project_name, folder, str(bin_ix) + '.json')
+
+
+def remove_stale_shards(project_name, folder, n_bins):
+    """
+    Remove the shards of bins that no longer exist, e.g. after an update
+    removed a bin, and make sure the shard folder exists.
+    """
+    path_folder = os.path.join(path_tf, 'data', project_name, folder)
+    os.makedirs(path_folder, exist_ok=True)
+    for name in os.listdir(path_folder):
+        stem = name.split('.')[0]  # also matches the compressed variants
+        if not stem.isdigit() or int(stem) >= n_bins:
+            os.remove(os.path.join(path_folder, name))
+
+
+def map_bins(pool, func, *iterables, window=None):
+    """
+    Apply a function to every bin, in a process pool if one is given.
+
+    Results come back in the order of the bins whichever worker finishes
+    first, so the output of a parallel run is identical to a serial one.
+    At most "window" bins are submitted to the pool ahead of the one being
+    consumed, so the results waiting for their turn don't pile up in memory
+    when they're written slower than they're computed.
+
+    Args:
+        pool      -- a concurrent.futures.ProcessPoolExecutor, or None to run
+                     in this process
+        func      -- a module level function, called with one item of each
+                     iterable
+        iterables -- one iterable per argument of func
+        window    -- number of bins submitted to the pool at most, twice the
+                     number of its workers by default
+
+    Returns:
+        an iterator over the results, in order
+    """
+    if pool is None:
+        return map(func, *iterables)
+    if window is None:
+        window = 2 * getattr(pool, '_max_workers', os.cpu_count() or 1)
+    return map_window(pool, func, zip(*iterables), max(window, 1))
+
+
+def map_window(pool, func, args, window):
+    """
+    Generator of map_bins: submit the bins to the pool through a window of
+    pending futures, and yield their results in order.
+    """
+    pending = collections.deque()
+    try:
+        for item in args:
+            pending.append(pool.submit(func, *item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # the bins left when the results stop being consumed
+        for future in pending:
+            future.cancel()
+
+
+def clean_text(data):
+    """
+    Decode the bytes of a document and remove the characters that break the
+    text of a tweet: double quotes, "http://", backslashes and line breaks.
+
+    Characters are deleted from the undecoded bytes with bytes.translate,
+    which is faster than a chain of str.replace calls on the decoded text.
+    Double quotes are deleted before "http://" and backslashes and line
+    breaks after it, so the text is the same as with the chain.
+
+    Args:
+        data -- bytes of the document, in latin1
+
+    Returns:
+        the cleaned text
+    """
+    # "\r" too, a document read as text has its "\r\n" and "\r" turned into "\n"
+    return data.translate(None, b'"').replace(b'http://', b'').translate(None, b'\\\r\n').decode('latin1')
+
+
+# the blank lines that end a block of text, see split_blocks
+BLOCK_BREAK = re.compile(rb'\n(?:[ \t]*\r?\n)+')
+
+
+def split_blocks(data):
+    """
+    Split the bytes of a document into blocks of text: paragraphs, quoted
+    sections, signatures, each with the blank lines after it.
+
+    Blocks end right after a line break, which clean_text deletes after
+    "http://", so the cleaned blocks joined are the cleaned document.
+
+    Args:
+        data -- bytes of the document
+
+    Returns:
+        a list of the cleaned blocks of the document, see clean_text
+    """
+    ends = [match.end() for match in BLOCK_BREAK.finditer(data)]
+    return [clean_text(data[start:end]) for start, end in zip([0] + ends, ends + [len(data)]) if end > start]
+
+
+def read_texts(path_folder, names, blocks=False):
+    """
+    Read and clean documents one after the other, see clean_text.
+
+    Args:
+        path_folder -- path of the folder of the documents
+        names       -- file names of the documents
+        blocks      -- return the blocks of text of every document, see
+                       split_blocks, instead of its text
+
+    Returns:
+        a list with the text of every document, or None for a document that
+        can't be read
+    """
+    archive, folder = find_archive(path_folder)
+    # the files of a folder of an archive are read at once
+    contents = archive.read_files(folder, names) if archive is not None else None
+    texts = []
+    for name in names:
+        try:
+            if archive is not None:
+                if name not in contents:
+                    raise FileNotFoundError(name)
+                data = contents.pop(name)
+            else:
+                with open(os.path.join(path_folder, name), 'rb') as textfile:
+                    data = textfile.read()
+            texts.append(split_blocks(data) if blocks else clean_text(data))
+        except OSError:
+            texts.append(None)
+    return texts
+
+
+def read_bin_docs(bin_paths, doc_extension, txt_list=None, threads=1, blocks=False):
+    """
+    Read and clean the documents of one bin that have an entry in the bin's
+    metadata.
+
+    Files are read by several threads when threads is more than 1, which
+    hides the latency of network file systems, each thread reading an even
+    share of the files.
+
+    Args:
+        bin_paths     -- a bin returned by find_bins
+        doc_extension -- extension of the document files
+        txt_list      -- names of the document files of the bin, in the order
+                         the folder lists them, the folder is listed if not
+                         given
+        threads       -- number of threads reading files
+        blocks        -- read the blocks of text of every document instead
+                         of its text, see split_blocks
+
+    Returns:
+        a tuple of a list of (.txt file name, author, date, text) tuples, in
+        the order the files are listed in the bin's folder, and a dictionary
+        that maps the reason documents were skipped ("no_metadata",
+        "unparseable_date" or "unreadable") to their file names
+    """
+    # index the metadata by document id once, instead of scanning the bin's
+    # table for every .txt file
+    df_meta = read_meta(bin_paths['meta'])
+    meta_index = index_metadata([df_meta])[0]
+    skipped = OrderedDict()
+
+    path_folder = bin_paths['doc']
+    # read .txt files with the user-specified extension
+    if txt_list is None:
+        txt_list = [x[0] for x in scan_folder(path_folder, doc_extension)]
+    # only read the .txt files that match their metadata entries,
+    # '2005_Jan_0.reply.body.txt' is the document '2005_Jan_0'
+    unmatched = [txt for txt in txt_list if txt.split('.')[0] not in meta_index]
+    if unmatched:
+        # index_metadata leaves out the documents whose date can't be parsed
+        listed = set(df_meta['id'])
+        for txt in unmatched:
+            reason = 'unparseable_date' if txt.split('.')[0] in listed else 'no_metadata'
+            skipped.setdefault(reason, []).append(txt)
+        txt_list = [txt for txt in txt_list if txt.split('.')[0] in meta_index]
+
+    # the files of an archive are read in the order they're stored, by one thread
+    if threads > 1 and len(txt_list) > threads and find_archive(path_folder)[0] is None:
+        chunk = -(-len(txt_list) // threads)
+        chunks = [txt_list[i:i + chunk] for i in range(0, len(txt_list), chunk)]
+        with concurrent.futures.ThreadPoolExecutor(len(chunks)) as executor:
+            texts = [text for texts in executor.map(read_texts, [path_folder] * len(chunks), chunks, [blocks] * len(chunks)) for text in texts]
+    else:
+        texts = read_texts(path_folder, txt_list, blocks)
+
+    # only record an entry if the file is readable
+    docs = []
+    for txt, text in zip(txt_list, texts):
+        if text is None:
+            skipped.setdefault('unreadable', []).append(txt)
+            continue
+        author, date = meta_index[txt.split('.')[0]]  # the metadata of one text file
+        docs.append((txt.split('.')[0] + '.txt', author, date, text))
+    return docs, skipped
+
+
+# descriptions of the reasons documents are skipped, see read_bin_docs and
+# transform_doc
+SKIP_REASONS = OrderedDict([('no_metadata', 'without metadata'),
+                            ('unparseable_date', 'with an unparseable date'),
+                            ('unreadable', 'unreadable'),
+                            ('unserializable', 'with metadata that can\'t be written')])
+
+
+def summarize_skipped(skipped, examples=10):
+    """
+    Count the skipped documents of every reason.
+
+    Args:
+        skipped  -- a dictionary that maps a reason to file names, as returned
+                    by read_bin_docs, or to summaries returned by this function
+        examples -- number of file names kept for every reason
+
+    Returns:
+        a dictionary that maps every reason to the "count" of documents and
+        the first file names ("examples")
+    """
+    summary = OrderedDict()
+    for reason, names in skipped.items():
+        if isinstance(names, dict):
+            count, names = names['count'], names['examples']
+        else:
+            count = len(names)
+        summary[reason] = {'count': count, 'examples': list(names[:examples])}
+    return summary
+
+
+def merge_skipped(summaries, examples=10):
+    """
+    Merge the summaries of skipped documents of several bins, see
+    summarize_skipped.
+    """
+    merged = OrderedDict()
+    for summary in summaries:
+        for reason, entry in summary.items():
+            total = merged.setdefault(reason, {'count': 0, 'examples': []})
+            total['count'] += entry['count']
+            total['examples'] = (total['examples'] + entry['examples'])[:examples]
+    return merged
+
+
+def dedup_blocks(parts, counts, table, seen=None, min_length=32):
+    """
+    Replace the repeated blocks of text of a document, e.g. quoted sections
+    and signatures, by their position in a table of blocks shared by the
+    documents of the project.
+
+    A block is repeated if it's in the table, if it appears more than once
+    in the bin, or if it appeared in a previous bin. The bins are written
+    one after the other, so the first document with a block of a previous
+    bin keeps its copy of the block, and the next ones refer to the table.
+
+    Args:
+        parts      -- the blocks of text of the document, see split_blocks
+        counts     -- a collections.Counter of the blocks of every document
+                      of the bin
+        table      -- a dictionary that maps the blocks of the table to their
+                      positions, a repeated block that isn't in the table
+                      yet is added
+        seen       -- a set of the hashes of the blocks of the documents
+                      written so far, which the blocks of the document are
+                      added to, optional
+        min_length -- blocks shorter than this are kept in the document
+
+    Returns:
+        the text of the document, or a list of texts and positions in the
+        table of blocks if the document has repeated blocks
+    """
+    text = []
+    for part in parts:
+        repeated = part in table
+        if not repeated and len(part) >= min_length:
+            # a block of another bin, a hash collision only shares a block
+            # that isn't repeated
+            key = hash(part)
+            repeated = counts[part] > 1 or (seen is not None and key in seen)
+            if seen is not None:
+                seen.add(key)
+        if repeated:
+            text.append(table.setdefault(part, len(table)))
+        elif text and isinstance(text[-1], str):
+            text[-1] += part
+        else:
+            text.append(part)
+    if all(isinstance(part, str) for part in text):
+        return ''.join(text)
+    return text
+
+
+def read_blocks(project_name):
+    """
+    Read the table of repeated blocks of text of a project, see dedup_blocks.
+
+    Returns:
+        the list of blocks, empty if the project has none
+    """
+    path_file = os.path.join(path_tf, 'data', project_name, 'blocks.json')
+    if not os.path.isfile(path_file):
+        return []
+    with open(path_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def transform_doc(project_name, path_doc, path_meta, doc_extension, pool=None, manifest=None, threads=1, dedup=False):
+    """
+    Transform Full Disclosure email documents from .txt formats into
+    JavaScript format that TopicFlow can read.
+
+    Bins are read in parallel when a process pool is given. Tweet ids are
+    numbered in bin order afterwards, so Doc.js is the same either way.
+
+    The documents of every bin are also written to a shard of their own,
+    which the viewer loads when the bin is selected.
+
+    The documents and metadata can be read from archives instead of
+    directories, see Archive. The documents of a compressed .tar archive are
+    read in one pass, without the process pool.
+
+    When the manifest of the project is given, the documents of a bin whose
+    folder and metadata didn't change, and whose tweet ids didn't move, are
+    copied from the previous Doc.js instead of being read again.
+
+    With dedup, the blocks of text repeated by the documents of the project
+    are written once, to a table of blocks, and the documents refer to their
+    positions in the table, see dedup_blocks. The viewer joins the blocks of
+    a document when it's shown.
+
+    Args:
+        project_name  -- name of the new project
+        path_doc      -- path of documents directory or archive
+        path_meta     -- path of documents metadata directory or archive
+        doc_extension -- extension of the document files
+        pool          -- a concurrent.futures.ProcessPoolExecutor, optional
+        manifest      -- the manifest of the project, see new_manifest,
+                         optional. It's updated and written with Doc.js
+        threads       -- number of threads reading the documents of a bin,
+                         see read_bin_docs
+        dedup         -- share the repeated blocks of text of the documents
+
+    Returns:
+        a dictionary that maps document id with .txt file name that will be 
+        used in transform_bins
+        
+    Outcome:        
+        "Doc.js", "docs/<bin>.json" and, with dedup, "blocks.json"
+    """
+
+    ### FIND BINS
+    # the bins of a compressed .tar archive of documents are read one after
+    # the other by this process, which decompresses the archive once
+    if is_archive(path_doc) and open_archive(path_doc).sequential:
+        pool = None
+    skipped_bins = []
+    bins = find_bins(path_doc, path_meta, skipped=skipped_bins)
+
+
+    ### DATA TRANSFORMATION and WRITE
+    # make a directory named after the project name
+    if os.path.isdir(os.path.join(path_tf, 'data', project_name)) == False:
+        os.mkdir(os.path.join(path_tf, 'data', project_name))
+
+    # transform into .js format that TopicFlow can read, the documents of
+    # every bin are written to Doc.js as soon as the bin is read
+    prefix = 'function populate_tweets_' + project_name + '(){\nvar tweet_data ='
+    posfix = ';\nreadTweetJSON(tweet_data);\n}'
+    path_file = os.path.join(path_tf, 'data', project_name, 'Doc.js')
+
+    # find the bins that are unchanged since Doc.js was last written
+    # every document folder is scanned once, for its signature and the list
+    # of its documents
+    doc_files = [scan_folder(bin_paths['doc'], doc_extension) for bin_paths in bins]
+    signatures = [{'doc': folder_signature(bin_paths['doc'], doc_extension, doc_files[bin_ix]),
+                   'meta': folder_signature(bin_paths['meta'], '.csv'),
+                   'doc_extension': doc_extension,
+                   'dedup': dedup} for bin_ix, bin_paths in enumerate(bins)]
+    previous = manifest['doc'] if manifest is not None and os.path.isfile(path_file) else []
+    unchanged = [bin_ix < len(previous) and previous[bin_ix]['name'] == bin_paths['name'] and
+                 previous[bin_ix]['inputs'] == signatures[bin_ix]
+                 for bin_ix, bin_paths in enumerate(bins)]
+
+    # the table of repeated blocks, the documents of copied bins refer to the
+    # positions of the previous table so it's only started over once every
+    # bin is read again
+    path_blocks = os.path.join(path_tf, 'data', project_name, 'blocks.json')
+    table = {}
+    seen = set()  # the hashes of the blocks of the bins read so far
+    if dedup and any(unchanged):
+        if os.path.isfile(path_blocks):
+            table = {block: position for position, block in enumerate(read_blocks(project_name))}
+        else:
+            unchanged = [False] * len(bins)
+    changed = [bin_ix for bin_ix in range(len(bins)) if not unchanged[bin_ix]]
+
+    # initiate one dictionary that maps document id with .txt file name
+    tweet_id_txt = {}  # use this for transform_bins
+    records = []       # the bins of Doc.js, for the manifest
+    copied = 0
+    
+    # find documents
+    id_pointer = 1     # tweet_id starts with 1
+    remove_stale_shards(project_name, 'docs', len(bins))
+    with JSObjectWriter(path_file, prefix, posfix) as writer:
+        docs = map_bins(pool, read_bin_docs, [bins[bin_ix] for bin_ix in changed], [doc_extension] * len(changed),
+                        [[x[0] for x in doc_files[bin_ix]] for bin_ix in changed], [threads] * len(changed), [dedup] * len(changed))
+        for bin_ix, bin_paths in enumerate(bins):
+            tweet_id_txt[str(bin_ix)] = {}
+            tweet_id_txt[str(bin_ix)]['id'] = []
+            tweet_id_txt[str(bin_ix)]['txt'] = []
+            start = writer.position()
+            first_id = id_pointer
+
+            # the documents of the bin also go to the bin's shard of the viewer
+            path_shard = shard_path(project_name, 'docs', bin_ix)
+
+            if unchanged[bin_ix] and previous[bin_ix]['first_id'] == id_pointer:
+                # copy the documents of the bin from the previous Doc.js
+                txt_list = previous[bin_ix]['txt']
+                entries_json = read_entries(path_file, prefix, previous[bin_ix]['span'])
+                writer.write_entries(entries_json, len(txt_list))
+                if not os.path.isfile(path_shard):
+                    with JSObjectWriter(path_shard, '', '') as shard:
+                        shard.write_entries(entries_json, len(txt_list))
+                tweet_id_txt[str(bin_ix)]['id'] = list(range(id_pointer, id_pointer + len(txt_list)))
+                tweet_id_txt[str(bin_ix)]['txt'] = list(txt_list)
+                id_pointer += len(txt_list)
+                copied += 1
+                skipped = previous[bin_ix].get('skipped', {})
+
+            else:
+                if unchanged[bin_ix]:
+                    # the bin didn't change, but a bin before it has a different
+                    # number of documents, so its tweet ids moved
+                    bin_docs, skipped = read_bin_docs(bin_paths, doc_extension, [x[0] for x in doc_files[bin_ix]], threads, dedup)
+                else:
+                    bin_docs, skipped = next(docs)
+                if dedup:
+                    counts = collections.Counter(part for doc in bin_docs for part in doc[3])
+
+                with JSObjectWriter(path_shard, '', '') as shard:
+                    for txt, author, date, text in bin_docs:
+                        # populate content
+                        tweet = {}
+                        tweet['tweet_id'] = id_pointer
+                        tweet['author'] = author
+                        tweet['tweet_date'] = date
+                        tweet['text'] = dedup_blocks(text, counts, table, seen) if dedup else text
+                        try:
+                            tweet_json = json.dumps(tweet, allow_nan=False)
+                        # skip documents whose metadata can't be serialized
+                        # as JSON, NaN or infinite numbers included
+                        except (TypeError, ValueError):
+                            skipped.setdefault('unserializable', []).append(txt)
+                            continue
+                        writer.write_json(id_pointer, tweet_json)
+                        shard.write_json(id_pointer, tweet_json)
+                        tweet_id_txt[str(bin_ix)]['id'].append(id_pointer)
+                        tweet_id_txt[str(bin_ix)]['txt'].append(txt)
+
+                        id_pointer += 1
+                del bin_docs
+
+            records.append({'name': bin_paths['name'],
+                            'inputs': signatures[bin_ix],
+                            'first_id': first_id,
+                            'txt': tweet_id_txt[str(bin_ix)]['txt'],
+                            'skipped': summarize_skipped(skipped),
+                            'span': [start, max(start, writer.offset)]})
+
+        if dedup:
+            writer.posfix = ';\nvar block_data = ' + json.dumps(list(table)) + ';\nreadTweetJSON(tweet_data, block_data);\n}'
+
+    # the shards of the viewer share the table of Doc.js
+    if dedup:
+        with open(path_blocks + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(list(table), file)
+        os.replace(path_blocks + '.tmp', path_blocks)
+    elif os.path.isfile(path_blocks):
+        os.remove(path_blocks)
+
+    if manifest is not None:
+        manifest['doc'] = records
+        write_manifest(project_name, manifest)
+
+    print('\nDoc.js created,             20% complete.')
+    if copied > 0:
+        print('                            ' + str(copied) + ' of ' + str(len(bins)) + ' bins copied from the previous version.')
+    if skipped_bins:
+        print('                            ' + str(len(skipped_bins)) + ' bins skipped, no date of their metadata can be parsed: ' +
+              ', '.join(skipped_bins) + '.')
+    if dedup:
+        print('                            ' + str(len(table)) + ' repeated blocks of text shared by the documents.')
+    skipped = merge_skipped(record['skipped'] for record in records)
+    if skipped:
+        print('                            ' + str(sum(entry['count'] for entry in skipped.values())) + ' documents skipped: ' +
+              ', '.join(str(entry['count']) + ' ' + SKIP_REASONS[reason] for reason, entry in skipped.items()) + '.')
+
+    report(bins=len(bins), bins_copied=copied,
+           files=sum(len(files) for files in doc_files),
+           documents=id_pointer - 1,
+           skipped=skipped,
+           blocks=len(table),
+           output_bytes=os.path.getsize(path_file))
+    
+    return tweet_id_txt
+
+
+def doc_topic_probs(df_topic_doc, tweet_ids):
+    """
+    Read the probabilities of the documents of a bin out of its
+    Topic-document matrix, by tweet id. The .txt file names of the matrix are
+    mapped to tweet ids with one reindex, and documents that didn't make it
+    into Doc.js are dropped.
+
+    Args:
+        df_topic_doc --  Topic-document matrix of the bin, see read_topic_doc
+        tweet_ids    --  the "id" and "txt" lists of the bin in the dictionary
+                         generated by transform_doc
+
+    Returns:
+        a tuple of the tweet ids in increasing order, a list of integers, and
+        the (documents x topics) NumPy array of their probabilities
+    """
+    txt_to_id = pd.Series(tweet_ids['id'], index=tweet_ids['txt'], dtype='float64')
+    overlap_id = txt_to_id.reindex(df_topic_doc.index).values
+    overlap = ~np.isnan(overlap_id)
+    # keep the documents in the order of their tweet ids
+    order = np.argsort(overlap_id[overlap], kind='stable')
+    return [int(x) for x in overlap_id[overlap][order]], df_topic_doc.values[overlap][order]
+
+
+# the decimals and the smallest probability kept by the compact format of the
+# ranks by default, see rank_bin
+COMPACT_PRECISION = 4
+COMPACT_MIN_PROB = 0.01
+
+
+def rank_bin(bin_ix, doc_ids, probs, top_docs=100, compact=None):
+    """
+    Rank the documents of every topic of a bin, and the topics of every
+    document, by probability, so the viewer lists them without sorting the
+    topic model of the bin.
+
+    The compact format keeps "precision" decimals of every probability,
+    stored as integers the viewer divides by "scale", and leaves out the
+    probabilities below "min_prob": the documents of a topic stop at the
+    first one below it, and the topics of every document start at "offsets".
+
+    Args:
+        bin_ix   --  index of the bin
+        doc_ids  --  the tweet ids of the documents, see doc_topic_probs
+        probs    --  the (documents x topics) NumPy array of probabilities
+        top_docs --  number of most probable documents kept for each topic,
+                     None keeps every document
+        compact  --  None to keep every probability as it is, or a dictionary
+                     with the "precision" (None to keep every decimal) and
+                     "min_prob" of the compact format
+
+    Returns:
+        an OrderedDict with the names of the topics ("topic_prob"), the ids
+        ("ids") and probabilities ("probs") of the most probable documents of
+        every topic ("topic_docs"), and, document after document, the indexes
+        ("topics") and probabilities ("probs") of every topic from the most
+        to the least probable ("doc_topics", next to the tweet ids "doc_ids")
+    """
+    topic_names = [str(bin_ix) + '_' + str(topic_ix) for topic_ix in range(probs.shape[1])]
+    scale, min_prob = 1, 0
+    if compact is not None:
+        scale = 10 ** compact['precision'] if compact['precision'] is not None else 1
+        min_prob = compact['min_prob'] or 0
+    encode = (lambda values: np.rint(values * scale).astype(np.int64).tolist()) if scale != 1 else (lambda values: values.tolist())
+
+    # a stable sort keeps documents and topics of the same probability in
+    # the order of their ids, as the viewer sorted them
+    order = np.argsort(-probs, axis=0, kind='stable')[:top_docs]
+    topic_docs = OrderedDict()
+    for topic_ix, name in enumerate(topic_names):
+        column = probs[order[:, topic_ix], topic_ix]
+        # the probabilities are in decreasing order
+        count = int(np.count_nonzero(column >= min_prob))
+        ranked = OrderedDict()
+        ranked['ids'] = [doc_ids[doc_ix] for doc_ix in order[:count, topic_ix].tolist()]
+        ranked['probs'] = encode(column[:count])
+        topic_docs[name] = ranked
+
+    order = np.argsort(-probs, axis=1, kind='stable')
+    sorted_probs = np.take_along_axis(probs, order, axis=1)
+    doc_topics = OrderedDict()
+    doc_topics['doc_ids'] = doc_ids
+    if compact is not None:
+        keep = sorted_probs >= min_prob
+        doc_topics['offsets'] = np.concatenate(([0], np.cumsum(keep.sum(axis=1)))).astype(np.int64).tolist()
+        doc_topics['topics'] = order[keep].tolist()
+        doc_topics['probs'] = encode(sorted_probs[keep])
+    else:
+        doc_topics['topics'] = order.ravel().tolist()
+        doc_topics['probs'] = sorted_probs.ravel().tolist()
+
+    ranks = OrderedDict()
+    ranks['topic_prob'] = topic_names
+    if compact is not None:
+        ranks['format'] = 'compact'
+        ranks['scale'] = scale
+    ranks['topic_docs'] = topic_docs
+    ranks['doc_topics'] = doc_topics
+    return ranks
+
+
+def transform_bin(bin_ix, df_meta, df_topic_doc, df_topic_word, tweet_ids, top_words=10, doc_probs=None):
+    """
+    Transform the metadata, Topic-document matrix and Topic-word matrix of
+    one bin into the bin format that TopicFlow can read.
+
+    Args:
+        bin_ix        --  index of the bin
+        df_meta       --  metadata of the documents of the bin, see read_meta
+        df_topic_doc  --  Topic-document matrix of the bin, see read_topic_doc
+        df_topic_word --  Topic-word matrix of the bin, see read_topic_word
+        tweet_ids     --  the "id" and "txt" lists of the bin in the dictionary
+                          generated by transform_doc
+        top_words     --  number of most frequent words kept for each topic
+        doc_probs     --  the tweet ids and probabilities of the documents of
+                          the bin returned by doc_topic_probs, read out of
+                          df_topic_doc if not given
+
+    Returns:
+        an OrderedDict holding the bin, ready to be serialized into Bins.js
+    """
+    bin_dict = {}
+
+    # populate bin_id
+    bin_dict['bin_id'] = bin_ix
+
+    # populate tweet_ids
+    bin_dict['tweet_Ids'] = tweet_ids['id']
+
+    # populate start_time & end_time
+    # here we need input from df_meta, specifically the length of the bin
+    # this part sorts out the earliest and latest time of a tweet in the bin, and
+    # transform them into "mm/dd/yy hh:mm" format
+    # dates that can't be parsed are left out, as their documents are, and a
+    # bin without any date (see find_bins) has an empty start and end
+    dates = parse_dates(df_meta['date']).dropna()
+    bin_dict['start_time'], bin_dict['end_time'] = format_dates(pd.Series([dates.min(), dates.max()])).fillna('').tolist()
+
+    # initiate topic_model
+    bin_dict['topic_model'] = {}
+    # add 4 sub dictionaries
+    bin_dict['topic_model']['topic_doc'] = {}
+    bin_dict['topic_model']['doc_topic'] = {}
+    bin_dict['topic_model']['topic_word'] = {}
+    bin_dict['topic_model']['topic_prob'] = []
+
+
+    ### POPULATE topic_model
+    # topic_doc and doc_topic hold the same probabilities, so both are read
+    # straight out of the Document_Topic_Matrix as one NumPy array.
+    overlap_id, probs = doc_probs if doc_probs is not None else doc_topic_probs(df_topic_doc, tweet_ids)
+    overlap_id = [str(x) for x in overlap_id]
+
+    topic_names = [str(bin_ix) + '_' + str(prob) for prob in range(probs.shape[1])]
+    # topic_prob & topic_doc
+    bin_dict['topic_model']['topic_prob'] = topic_names
+    for name, column in zip(topic_names, probs.T.tolist()):
+        bin_dict['topic_model']['topic_doc'][name] = dict(zip(overlap_id, column))
+
+    # doc_topic
+    for doc_id, row in zip(overlap_id, probs.tolist()):
+        bin_dict['topic_model']['doc_topic'][doc_id] = dict(zip(topic_names, row))
+
+    # topic_word
+    # every row of the Topic_Term_Matrix is one topic
+    for topic_word_ix in range(len(df_topic_word)):
+        name = str(bin_ix) + '_' + str(topic_word_ix)
+        bin_dict['topic_model']['topic_word'][name] = {}
+        # we choose the top_words most frequent words
+        topwords = df_topic_word.iloc[topic_word_ix].sort_values(ascending=False)[:top_words]
+        topwords = np.around(topwords, 17)
+        for word, value in zip(topwords.index, topwords.values):
+            bin_dict['topic_model']['topic_word'][name][word] = value
+
+
+    ### TRANSFORM INTO AN ORDERED DICTIONARY
+    bin_dict_ordered = OrderedDict()
+    key_order = ('tweet_Ids','start_time','bin_id','topic_model','end_time')
+    for k in key_order:
+        bin_dict_ordered[k] = bin_dict[k]
+    return bin_dict_ordered
+
+
+def transform_bin_json(bin_ix, bin_paths, tweet_ids, top_words=10, top_docs=100, compact=None):
+    """
+    Read the data of one bin and transform it into JSON, see transform_bin
+    and rank_bin.
+
+    Args:
+        bin_ix    --  index of the bin
+        bin_paths --  the bin returned by find_bins
+        tweet_ids --  the "id" and "txt" lists of the bin in the dictionary
+                      generated by transform_doc
+        top_words --  number of most frequent words kept for each topic
+        top_docs  --  number of most probable documents ranked for each
+                      topic, see rank_bin
+        compact   --  the compact format of the ranks, see rank_bin
+
+    Returns:
+        a tuple of the bin serialized as a JSON string, its ranked documents
+        and topics serialized as a JSON string, and the summary of the bin: its "start_time", "end_time" and "topic_word" for the index of
+        the viewer, and the "topic_weight" of every topic, the sum of its
+        probabilities over the documents of the bin
+    """
+    df_topic_doc = read_topic_doc(bin_paths['dtm'])
+    # the bin and its ranks hold the same probabilities
+    doc_probs = doc_topic_probs(df_topic_doc, tweet_ids)
+    bin_dict = transform_bin(bin_ix,
+                             read_meta(bin_paths['meta']),
+                             df_topic_doc,
+                             read_topic_word(bin_paths['ttm']),
+                             tweet_ids,
+                             top_words,
+                             doc_probs)
+    topic_weight = df_topic_doc.values[df_topic_doc.index.isin(tweet_ids['txt'])].sum(axis=0)
+    summary = {'start_time': bin_dict['start_time'],
+               'end_time': bin_dict['end_time'],
+               'topic_word': bin_dict['topic_model']['topic_word'],
+               'topic_weight': [round(float(x), 4) for x in topic_weight]}
+    ranks = rank_bin(bin_ix, *doc_probs, top_docs=top_docs, compact=compact)
+    return json.dumps(bin_dict), json.dumps(ranks), summary
+
+
+def transform_bins(project_name, path_doc, path_meta, path_dtm, path_ttm, path_topic_tf, tweet_id_txt, top_words=10, pool=None, manifest=None, top_docs=100, compact=None):
+    """
+    Transform LDA-genereted Topic-document matrixes and Topic-word matrixes 
+    into JavaScript format that TopicFlow can read.
+
+    Bins are read, transformed and written to Bins.js one at a time, so only
+    the data of one bin (or of one bin per worker) is held in memory.
+
+    Every bin is also written to a shard of its own, and the times and top
+    words of every bin to a small index, so the viewer only has to load the
+    index before drawing the visualization and loads the shards of a bin
+    when the bin is selected. The ranked documents of every topic and topics
+    of every document, see rank_bin, go to a shard of their own, which is all
+    the viewer needs of the topic model of a bin.
+
+    When the manifest of the project is given, a bin whose metadata, matrixes
+    and tweet ids didn't change is copied from the previous Bins.js instead of
+    being transformed again.
+
+    Args:
+        project_name  --  name of the new project
+        path_doc      --  path of documents directory or archive
+        path_meta     --  path of documents metadata directory or archive
+        path_dtm      --  path of Document_Topic_Matrix directory
+        path_ttm      --  path of Topic_Term_Matrix directory
+        path_topic_tf --  path of topicflow similarity file
+        tweet_id_txt  --  a dictionary that maps document id with .txt file name
+                          generated by transform_doc     
+        top_words     --  number of most frequent words kept for each topic
+        pool          --  a concurrent.futures.ProcessPoolExecutor to transform
+                          bins in parallel, optional
+        manifest      --  the manifest of the project, see new_manifest,
+                          optional. It's updated and written with Bins.js
+        top_docs      --  number of most probable documents ranked for each
+                          topic, None for every document
+        compact       --  None to write the ranks of the bins with every
+                          probability as it is, or the options of the compact
+                          format, see rank_bin
+
+    Returns:
+        the weights of the topics of every bin, a list of lists, see
+        transform_bin_json
+
+    Outcome:
+        "Bins.js", "Index.js" and "ranks/<bin>.json"
+    """
+
+    ### FIND BINS
+    bins = find_bins(path_doc, path_meta, path_dtm, path_ttm)
+
+    # transform into .js format that TopicFlow can read
+    prefix = 'function populate_bins_' + project_name + '(){\nvar bin_data = '
+    posfix = ';\nreadBinJSON(bin_data);\n}'
+    path_file = os.path.join(path_tf, 'data', project_name, 'Bins.js')
+
+    # find the bins that are unchanged since Bins.js was last written
+    cache = manifest['files'] if manifest is not None else {}
+    signatures = [{'meta': folder_signature(bin_paths['meta'], '.csv'),
+                   'dtm': file_signature(bin_paths['dtm'], cache),
+                   'ttm': file_signature(bin_paths['ttm'], cache),
+                   'tweet_ids': hashlib.sha1(json.dumps(tweet_id_txt[str(bin_ix)]).encode('utf-8')).hexdigest(),
+                   'top_words': top_words,
+                   'top_docs': top_docs,
+                   'compact': compact} for bin_ix, bin_paths in enumerate(bins)]
+    previous = manifest['bins'] if manifest is not None and os.path.isfile(path_file) else []
+    unchanged = [bin_ix < len(previous) and previous[bin_ix]['name'] == bin_paths['name'] and
+                 previous[bin_ix]['inputs'] == signatures[bin_ix] and 'topic_weight' in previous[bin_ix].get('summary', {}) and
+                 os.path.isfile(shard_path(project_name, 'ranks', bin_ix))
+                 for bin_ix, bin_paths in enumerate(bins)]
+    changed = [bin_ix for bin_ix in range(len(bins)) if not unchanged[bin_ix]]
+    records = []  # the bins of Bins.js, for the manifest
+    index = []    # the bins of Index.js
+
+
+    ### READ, TRANSFORM and WRITE one bin at a time
+    # bins are transformed and serialized by the workers of the pool, if any,
+    # and written in bin order
+    # the viewer reads the ranks of a bin instead of its topic model, which
+    # projects used to have a shard of as well
+    shutil.rmtree(os.path.join(path_tf, 'data', project_name, 'bins'), ignore_errors=True)
+    remove_stale_shards(project_name, 'ranks', len(bins))
+    with JSObjectWriter(path_file, prefix, posfix) as writer:
+        bins_json = map_bins(pool, transform_bin_json, changed, [bins[bin_ix] for bin_ix in changed],
+                             [tweet_id_txt[str(bin_ix)] for bin_ix in changed],
+                             [top_words] * len(changed), [top_docs] * len(changed), [compact] * len(changed))
+        for bin_ix, bin_paths in enumerate(bins):
+            start = writer.position()
+            if unchanged[bin_ix]:
+                # copy the bin from the previous Bins.js
+                entry_json = read_entries(path_file, prefix, previous[bin_ix]['span'])
+                writer.write_entries(entry_json, 1)
+                summary = previous[bin_ix]['summary']
+            else:
+                bin_json, ranks_json, summary = next(bins_json)
+                writer.write_json(bin_ix, bin_json)
+                with open(shard_path(project_name, 'ranks', bin_ix), 'w', encoding='utf-8') as file:
+                    file.write(ranks_json)
+                del bin_json, ranks_json
+            records.append({'name': bin_paths['name'],
+                            'inputs': signatures[bin_ix],
+                            'summary': summary,
+                            'span': [start, writer.offset]})
+
+            ids = tweet_id_txt[str(bin_ix)]['id']
+            bin_index = OrderedDict()
+            bin_index['bin_id'] = bin_ix
+            bin_index['start_time'] = summary['start_time']
+            bin_index['end_time'] = summary['end_time']
+            bin_index['first_id'] = ids[0] if ids else None
+            bin_index['last_id'] = ids[-1] if ids else None
+            bin_index['topic_word'] = summary['topic_word']
+            bin_index['rank'] = 'ranks/' + str(bin_ix) + '.json'
+            bin_index['doc'] = 'docs/' + str(bin_ix) + '.json'
+            index.append(bin_index)
+
+    # write the index of the viewer
+    index_dict = OrderedDict()
+    index_dict['path'] = 'data/' + project_name + '/'
+    index_dict['tweet_count'] = sum(len(tweet_ids['id']) for tweet_ids in tweet_id_txt.values())
+    index_dict['bins'] = index
+    # the documents refer to a table of repeated blocks of text, see transform_doc
+    if os.path.isfile(os.path.join(path_tf, 'data', project_name, 'blocks.json')):
+        index_dict['blocks'] = 'blocks.json'
+    prefix = 'function populate_index_' + project_name + '(){\nvar index_data = '
+    posfix = ';\nreadIndexJSON(index_data);\n}'
+    with open(os.path.join(path_tf, 'data', project_name, 'Index.js'), 'w', encoding='utf-8') as file:
+        file.write(prefix + json.dumps(index_dict) + posfix)
+
+    if manifest is not None:
+        # forget the files that are no longer part of the project
+        used = set(path for bin_paths in bins for path in (bin_paths['dtm'], bin_paths['ttm']))
+        manifest['files'] = {path: entry for path, entry in cache.items() if path in used}
+        manifest['bins'] = records
+        write_manifest(project_name, manifest)
+
+    print('Bins.js created,            40% complete.')
+    if len(changed) < len(bins):
+        print('                            ' + str(len(bins) - len(changed)) + ' of ' + str(len(bins)) + ' bins copied from the previous version.')
+    report(bins=len(bins), bins_copied=len(bins) - len(changed),
+           documents=index_dict['tweet_count'],
+           output_bytes=os.path.getsize(path_file),
+           index_bytes=os.path.getsize(os.path.join(path_tf, 'data', project_name, 'Index.js')))
+    return [record['summary']['topic_weight'] for record in records]
+
+
+SEARCH_TERM = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """
+    Split a text into the terms of the search index: its lower case runs of
+    letters and digits of two characters or more. The viewer splits queries
+    the same way.
+    """
+    return [term for term in SEARCH_TERM.findall(text.lower()) if len(term) > 1]
+
+
+def search_shard(term, shards):
+    """
+    Number of the shard of the search index that holds a term, with the same
+    string hash as searchShard in the viewer.
+    """
+    h = 0
+    for c in term:
+        h = (h * 31 + ord(c)) & 0xFFFFFFFF
+    return h % shards
+
+
+def read_index(project_name):
     """
-    Transform Full Disclosure email documents from .txt formats into
-    JavaScript format that TopicFlow can read.
-
-    Args:
-        project_name -- name of the new project
-        path_doc     -- path of documents directory
+    Read the index of a project written by transform_bins.
 
     Returns:
-        a dictionary that maps document id with .txt file name that will be 
-        used in transform_bins
-        
-    Outcome:        
-        "Doc.js"
+        the index, a dictionary with the bins of the project
     """
+    prefix = 'function populate_index_' + project_name + '(){\nvar index_data = '
+    posfix = ';\nreadIndexJSON(index_data);\n}'
+    with open(os.path.join(path_tf, 'data', project_name, 'Index.js'), 'r', encoding='utf-8') as file:
+        return json.loads(file.read()[len(prefix):-len(posfix)])
 
-    ### READ METADATA and INITIATE MONTH INDEX LIST
-    df_list = read_data(df_list=True)
-    month_index_list = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
+def transform_search(project_name, shard_postings=20000, k1=1.2, b=0.75):
+    """
+    Build an inverted index of the top words of the topics and of the text
+    of the documents of a project, so the viewer searches them without
+    scanning every topic and document.
 
-    ### DATA TRANSFORMATION
-    # initiate one main dictionary of Doc.js and one dictionary that maps 
-    # document id with .txt file name
-    tweet_data = {}    # which contains all elements of documents
-    tweet_id_txt = {}  # use this for transform_bins
-    
-    # find documents
-    id_pointer = 1     # tweet_id starts with 1
-    # store the list of sub-folders in order for each month, remove any folder that isn't what we need
-    # for example, a file like .DS_store can do huge damage to our pipeline
-    path_docs = []
-    for subfolder_ix in month_index_list:
-        for subfolder in os.listdir(path_doc):
-            if subfolder.endswith('_' + subfolder_ix):
-                path_docs.append(subfolder)
-
-    for month_ix, folder in enumerate(path_docs):
-        tweet_id_txt[str(month_ix)] = {}
-        tweet_id_txt[str(month_ix)]['id'] = []
-        tweet_id_txt[str(month_ix)]['txt'] = []
-        path_folder = os.path.join(path_doc, folder) 
-        # read .txt files with the user-specified extension
-        txt_list = [x for x in os.listdir(path_folder) if x.endswith(doc_extension)]
-        # find .txt files that match their metadata entries
-        for txt in txt_list:
-            txt_entry_elements = txt.split('.')[0].split('_')  # looks like ['2005', 'Jan', '0']
-            #txt_entry_elements[1] = folder[-2:]                # looks like ['2005', '01', '0']
-            txt_entry = '_'.join(txt_entry_elements)           # looks like '2005_Jan_0', use this to find document metadata in .csv file
-            # only record an entry if there's a match between .txt file and metadata,
-            # and the file is readable.
-            #print(txt)
-            try:
-                row = df_list[month_ix][df_list[month_ix]['id'] == txt_entry]  # the row of one text file in metadata
-                author = row['author'].values[0]
-                date = pd.to_datetime(row['date']).apply(lambda x: str(x.month) + '/' + str(x.day) + '/' + str(x.year) + ' ' + str(x.hour) + ':' + str(x.minute)).values[0]
-                with open(os.path.join(path_folder, txt), 'r',
-                          encoding='latin1') as textfile:     # notice the encoding
-                    text = textfile.read().replace('"','').replace('http://','').replace('\\','').replace('\n','') # remove irrgular expressions
-                
-                # populate content
-                tweet_data[str(id_pointer)] = {}
-                tweet_id_txt[str(month_ix)]['id'].append(id_pointer)
-                tweet_id_txt[str(month_ix)]['txt'].append(txt.split('.')[0] + '.txt')
-                tweet_data[str(id_pointer)]['tweet_id'] = id_pointer
-                tweet_data[str(id_pointer)]['author'] = author
-                tweet_data[str(id_pointer)]['tweet_date'] = date
-                tweet_data[str(id_pointer)]['text'] = text
-                
-                id_pointer += 1
-            # if for any reason the above "try" fails, we don't record
-            except:
-                # here, you can do things like listing files that can't be parsed
-                # e.g. print(txt)
-                #print('Unable to parse '+txt)
-                pass
-    
-    # transform body into .json format
-    json_tmp = json.dumps(tweet_data)
+    Every term maps to the topics with the term in their top words, with its
+    probability in the topic, and to the documents with the term, with the
+    BM25 weight of the term in the document. The viewer adds up the weights
+    of the terms of a query to rank the documents. The index is split into
+    shards by a hash of the terms, see search_shard, so a query only loads
+    the shards of its terms.
 
-    # transform into .js format that TopicFlow can read
-    prefix = 'function populate_tweets_' + project_name + '(){\nvar tweet_data ='
-    posfix = ';\nreadTweetJSON(tweet_data);\n}'
-    doc_js = prefix + json_tmp + posfix
+    Args:
+        project_name   --  name of the project, whose Index.js and document
+                           shards are written
+        shard_postings --  approximate number of documents of all the terms
+                           of a shard
+        k1, b          --  parameters of BM25
 
+    Outcome:
+        "search/index.json" and "search/<shard>.json"
+    """
+    ### READ the topic words of Index.js and the documents of every bin
+    index = read_index(project_name)
+    topics = collections.defaultdict(list)
+    for entry in index['bins']:
+        for name, words in entry['topic_word'].items():
+            for word, prob in words.items():
+                for term in set(tokenize(word)):
+                    topics[term].append((name, prob))
+
+    # the postings of all the documents are kept in flat lists of term
+    # numbers, document ids, term counts and document lengths
+    vocabulary = {}
+    posting_terms, posting_docs, posting_counts, posting_lengths = [], [], [], []
+    doc_lengths = []
+    blocks = read_blocks(project_name)
+    for bin_ix in range(len(index['bins'])):
+        with open(shard_path(project_name, 'docs', bin_ix), 'r', encoding='utf-8') as file:
+            docs = json.load(file)
+        for doc in docs.values():
+            text = doc['text']
+            if not isinstance(text, str):
+                # the repeated blocks of the text are in the table, see dedup_blocks
+                text = ''.join(part if isinstance(part, str) else blocks[part] for part in text)
+            counts = collections.Counter(tokenize(text))
+            length = sum(counts.values())
+            posting_terms.extend(vocabulary.setdefault(term, len(vocabulary)) for term in counts)
+            posting_docs.extend([doc['tweet_id']] * len(counts))
+            posting_counts.extend(counts.values())
+            posting_lengths.extend([length] * len(counts))
+            doc_lengths.append(length)
+        del docs
+    posting_terms = np.array(posting_terms, dtype=np.int64)
+    posting_docs = np.array(posting_docs, dtype=np.int64)
+    posting_counts = np.array(posting_counts, dtype=np.float64)
+    posting_lengths = np.array(posting_lengths, dtype=np.float64)
+
+
+    ### WEIGH every posting with BM25
+    n_docs = len(doc_lengths)
+    avg_length = max(np.mean(doc_lengths), 1) if n_docs else 1
+    doc_freq = np.bincount(posting_terms, minlength=len(vocabulary))
+    idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+    weights = idf[posting_terms] * posting_counts * (k1 + 1) / (posting_counts + k1 * (1 - b + b * posting_lengths / avg_length))
+    weights = np.round(weights, 3)
+
+
+    ### WRITE the terms into their shards
+    # documents are read in the order of their ids, so a stable sort by term
+    # keeps the documents of every term in that order
+    n_shards = max(1, -(-len(posting_terms) // shard_postings))
+    order = np.argsort(posting_terms, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(doc_freq)))
+    shards = [{} for _ in range(n_shards)]
+    terms = set(vocabulary) | set(topics)
+    for term in terms:
+        entry = OrderedDict()
+        if term in topics:
+            ranked = sorted(topics[term], key=lambda topic: -topic[1])
+            entry['topics'] = [name for name, prob in ranked]
+            entry['topic_probs'] = [prob for name, prob in ranked]
+        if term in vocabulary:
+            postings = order[bounds[vocabulary[term]]:bounds[vocabulary[term] + 1]]
+            entry['docs'] = posting_docs[postings].tolist()
+            entry['weights'] = weights[postings].tolist()
+        shards[search_shard(term, n_shards)][term] = entry
+
+    remove_stale_shards(project_name, 'search', n_shards)
+    output_bytes = 0
+    for shard_ix, shard in enumerate(shards):
+        path_shard = shard_path(project_name, 'search', shard_ix)
+        with open(path_shard, 'w', encoding='utf-8') as file:
+            json.dump(shard, file, sort_keys=True)
+        output_bytes += os.path.getsize(path_shard)
+    with open(os.path.join(path_tf, 'data', project_name, 'search', 'index.json'), 'w', encoding='utf-8') as file:
+        json.dump({'shards': n_shards, 'documents': n_docs, 'terms': len(terms)}, file)
+
+    print('Search index created,       50% complete.')
+    report(terms=len(terms), postings=len(posting_terms), shards=n_shards, output_bytes=output_bytes)
+
+
+# the tables of the database of a project, see transform_sqlite, indexed
+# once they are filled
+SQLITE_TABLES = '''
+CREATE TABLE bins (bin_id INTEGER PRIMARY KEY, start_time TEXT, end_time TEXT, first_id INTEGER, last_id INTEGER);
+CREATE TABLE docs (tweet_id INTEGER PRIMARY KEY, bin_id INTEGER, author TEXT, tweet_date TEXT, text TEXT);
+CREATE TABLE topic_words (topic TEXT, word TEXT, prob REAL);
+CREATE TABLE topic_docs (topic TEXT, tweet_id INTEGER, prob REAL);
+'''
+SQLITE_INDEXES = '''
+CREATE INDEX topic_words_topic ON topic_words (topic, prob DESC);
+CREATE INDEX topic_docs_topic ON topic_docs (topic, prob DESC, tweet_id);
+CREATE INDEX topic_docs_doc ON topic_docs (tweet_id, prob DESC);
+'''
+
+
+def transform_sqlite(project_name):
+    """
+    Write the bins, documents and topic models of a project into an indexed
+    SQLite database, which the server queries to answer the JSON API of the
+    viewer, see api_response. The viewer then loads one page of documents at
+    a time instead of the documents of whole bins.
 
-    ### WRITE
-    # make a directory named after the project name
-    if os.path.isdir(os.path.join(path_tf, 'data', project_name)) == False:
-        os.mkdir(os.path.join(path_tf, 'data', project_name))
-        
-    # write
-    with open(os.path.join(path_tf, 'data', project_name, 'Doc.js'), 'w') as file:
-        file.write(doc_js)
+    The database is filled from Index.js and the shards of the bins, one bin
+    at a time. The topics of a document are the ones of its ranks shard,
+    every topic of its bin, or the ones the compact format keeps.
+
+    Args:
+        project_name -- name of the project, whose Index.js and shards are
+                        written
+
+    Outcome:
+        "project.db"
+    """
+    index = read_index(project_name)
+    blocks = read_blocks(project_name)
+    path_project = os.path.join(path_tf, 'data', project_name)
+    path_file = os.path.join(path_project, 'project.db')
+    # the previous version is replaced once the new one is complete
+    if os.path.isfile(path_file + '.tmp'):
+        os.remove(path_file + '.tmp')
+    connection = sqlite3.connect(path_file + '.tmp')
+    n_docs, n_topic_docs = 0, 0
+    try:
+        connection.executescript(SQLITE_TABLES)
+        for entry in index['bins']:
+            connection.execute('INSERT INTO bins VALUES (?, ?, ?, ?, ?)',
+                               (entry['bin_id'], entry['start_time'], entry['end_time'], entry['first_id'], entry['last_id']))
+            connection.executemany('INSERT INTO topic_words VALUES (?, ?, ?)',
+                                   ((name, word, prob) for name, words in entry['topic_word'].items() for word, prob in words.items()))
+
+            with open(os.path.join(path_project, entry['doc']), 'r', encoding='utf-8') as file:
+                docs = json.load(file)
+            rows = []
+            for doc in docs.values():
+                text = doc['text']
+                if not isinstance(text, str):
+                    # the repeated blocks of the text are in the table, see dedup_blocks
+                    text = ''.join(part if isinstance(part, str) else blocks[part] for part in text)
+                rows.append((doc['tweet_id'], entry['bin_id'], doc['author'], doc['tweet_date'], text))
+            connection.executemany('INSERT INTO docs VALUES (?, ?, ?, ?, ?)', rows)
+            n_docs += len(rows)
+            del docs, rows
+
+            with open(os.path.join(path_project, entry['rank']), 'r', encoding='utf-8') as file:
+                ranks = json.load(file)
+            names = ranks['topic_prob']
+            doc_topics = ranks['doc_topics']
+            # the compact format leaves out small probabilities, see rank_bin
+            scale = ranks.get('scale', 1)
+            offsets = doc_topics.get('offsets', range(0, len(doc_topics['probs']) + 1, len(names)))
+            connection.executemany('INSERT INTO topic_docs VALUES (?, ?, ?)',
+                                   ((names[topic_ix], doc_id, prob / scale if scale != 1 else prob)
+                                    for doc_id, start, end in zip(doc_topics['doc_ids'], offsets, offsets[1:])
+                                    for topic_ix, prob in zip(doc_topics['topics'][start:end], doc_topics['probs'][start:end])))
+            n_topic_docs += len(doc_topics['probs'])
+            del ranks
+        connection.executescript(SQLITE_INDEXES)
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(path_file + '.tmp', path_file)
+
+    print('Database created,           55% complete.')
+    report(bins=len(index['bins']), documents=n_docs, topic_docs=n_topic_docs, output_bytes=os.path.getsize(path_file))
+
+
+def remove_sqlite(project_name):
+    """
+    Remove the database of a project, see transform_sqlite, e.g. after an
+    update without --sqlite, so the viewer no longer uses its API.
+    """
+    path_file = os.path.join(path_tf, 'data', project_name, 'project.db')
+    for path in (path_file, path_file + '.tmp'):
+        if os.path.isfile(path):
+            os.remove(path)
 
-    print('\nDoc.js created,             20% complete.')
-    
-    return tweet_id_txt
 
+SIMILARITY_MEASURES = ('cosine', 'jensen-shannon')
 
-def transform_bins(project_name, path_doc, path_meta, path_dtm, path_ttm, path_topic_tf, tweet_id_txt):
+
+def topic_similarity(df_topic_word1, df_topic_word2, measure='cosine'):
     """
-    Transform LDA-genereted Topic-document matrixes and Topic-word matrixes 
-    into JavaScript format that TopicFlow can read.
+    Compute the similarity between every topic of a bin and every topic of
+    another bin from their Topic_Term_Matrixes, as matrix operations. Terms
+    that only one of the bins has count as 0 in the other.
 
     Args:
-        project_name  --  name of the new project
-        path_doc      --  path of documents directory
-        path_meta     --  path of documents metadata directory
-        path_dtm      --  path of Document_Topic_Matrix directory
-        path_ttm      --  path of Topic_Term_Matrix directory
-        path_topic_tf --  path of topicflow similarity file
-        tweet_id_txt  --  a dictionary that maps document id with .txt file name
-                          generated by transform_doc     
+        df_topic_word1 -- Topic-word matrix of the first bin, see read_topic_word
+        df_topic_word2 -- Topic-word matrix of the second bin
+        measure        -- "cosine" for the cosine similarity of the term
+                          distributions of the topics, or "jensen-shannon" for
+                          1 minus their Jensen-Shannon divergence in bits
 
-    Outcome:
-        "Bins.js"
+    Returns:
+        a NumPy array with one row per topic of the first bin and one column
+        per topic of the second bin, of similarities between 0 and 1
     """
+    df_topic_word1, df_topic_word2 = df_topic_word1.align(df_topic_word2, join='outer', axis=1, fill_value=0)
+    p = np.clip(df_topic_word1.values.astype('float64'), 0, None)
+    q = np.clip(df_topic_word2.values.astype('float64'), 0, None)
 
-    ### DEFINE month_list, READ DATA
-    month_list = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    # read df_list
-    df_list = read_data(df_list=True)
-    # read topic-doc & topic-word data sets
-    df_topic_doc = read_data(df_topic_doc=True)
-    # read topic-word data sets
-    df_topic_word = read_data(df_topic_word=True)
+    if measure == 'cosine':
+        p = p / np.maximum(np.linalg.norm(p, axis=1, keepdims=True), 1e-300)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-300)
+        return np.clip(p @ q.T, 0, 1)
 
+    if measure == 'jensen-shannon':
+        p = p / np.maximum(p.sum(axis=1, keepdims=True), 1e-300)
+        q = q / np.maximum(q.sum(axis=1, keepdims=True), 1e-300)
 
-    ### DATA TRANSFORMATION - 1
-    # initiate bins, each month is one bin, each bin is also a dictionary
-    bin_dict = {}
-    for month_ix in range(len(month_list)):
-        bin_dict[str(month_ix)] = {}
+        def entropy(x):
+            # in bits, 0 * log(0) is 0
+            return -(x * np.log2(np.where(x > 0, x, 1))).sum(axis=-1)
 
-    # populate bin_id
-    for month_ix in range(len(month_list)):
-        bin_dict[str(month_ix)]['bin_id'] = month_ix
+        # JSD(p, q) = H((p + q) / 2) - (H(p) + H(q)) / 2, one row of p at a
+        # time against every row of q to bound the memory to a matrix
+        h_p, h_q = entropy(p), entropy(q)
+        divergence = np.empty((len(p), len(q)))
+        for i in range(len(p)):
+            divergence[i] = entropy((p[i] + q) / 2) - (h_p[i] + h_q) / 2
+        return np.clip(1 - divergence, 0, 1)
 
-    # populate tweet_ids
-    for month_ix in range(len(month_list)):
-        bin_dict[str(month_ix)]['tweet_Ids'] = tweet_id_txt[str(month_ix)]['id']
+    raise ValueError('Unknown similarity measure "' + str(measure) + '", use one of ' + ', '.join(SIMILARITY_MEASURES))
 
-    # populate start_time & end_time
-    # here we need input from df_list, specifically the length of each month
-    # this part sorts out the earliest and latest time of a tweet in each month, and
-    # transform them into "mm/dd/yy hh:mm" format
-    for month_ix in range(len(month_list)):
-        bin_dict[str(month_ix)]['start_time'] = pd.to_datetime(df_list[month_ix].date).sort_values().apply(lambda x: str(x.month) + '/' + str(x.day) + '/' + str(x.year) + ' ' + str(x.hour) + ':' + str(x.minute)).tolist()[0]
-    for month_ix in range(len(month_list)):
-        bin_dict[str(month_ix)]['end_time'] = pd.to_datetime(df_list[month_ix].date).sort_values().apply(lambda x: str(x.month) + '/' + str(x.day) + '/' + str(x.year) + ' ' + str(x.hour) + ':' + str(x.minute)).tolist()[-1]
 
-    # initiate topic_model
-    for month_ix in range(len(month_list)):
-        bin_dict[str(month_ix)]['topic_model'] = {}
-        # add 4 sub dictionaries
-        bin_dict[str(month_ix)]['topic_model']['topic_doc'] = {}
-        bin_dict[str(month_ix)]['topic_model']['doc_topic'] = {}
-        bin_dict[str(month_ix)]['topic_model']['topic_word'] = {}
-        bin_dict[str(month_ix)]['topic_model']['topic_prob'] = []
+def select_links(similarity, top_links=None, min_similarity=0):
+    """
+    Select the links between the topics of two bins.
 
-        
-    ### DATA TRANSFORMATION - 2: POPULATE topic_model
-    # topic_model is the hardest part. We need to populate them month by month,
-    # and one by one.
-    for month_ix in range(len(month_list)):
-        overlap = set(df_topic_doc[month_ix].index.tolist()) & set(tweet_id_txt[str(month_ix)]['txt'])
-        overlap = list(overlap)
-        df_topic_doc_overlap = df_topic_doc[month_ix].copy().loc[overlap, :]
-        # topic_prob & topic_doc
-        for prob in range(10):
-            bin_dict[str(month_ix)]['topic_model']['topic_prob'].append(str(month_ix) + '_' + str(prob))
-            # initiate topic_doc
-            bin_dict[str(month_ix)]['topic_model']['topic_doc'][str(month_ix) + '_' + str(prob)] = {}
-            overlap_id = [tweet_id_txt[str(month_ix)]['txt'].index(index_txtfile) for index_txtfile in df_topic_doc_overlap.index.tolist()]
-            overlap_id = [tweet_id_txt[str(month_ix)]['id'][index_tweetid] for index_tweetid in overlap_id]
-            for overlap_ix in range(len(overlap_id)):
-                bin_dict[str(month_ix)]['topic_model']['topic_doc'][str(month_ix) + '_' + str(prob)][str(overlap_id[overlap_ix])] = df_topic_doc_overlap[str(int(prob + 1))].tolist()[overlap_ix]
-        
-        # doc_topic
-        overlap_id = [tweet_id_txt[str(month_ix)]['txt'].index(index_txtfile) for index_txtfile in df_topic_doc_overlap.index.tolist()]
-        overlap_id = [tweet_id_txt[str(month_ix)]['id'][index_tweetid] for index_tweetid in overlap_id] 
-        for overlap_ix2 in range(len(overlap_id)):
-            row = df_topic_doc_overlap.iloc[overlap_ix2, :].tolist()
-            bin_dict[str(month_ix)]['topic_model']['doc_topic'][str(overlap_id[overlap_ix2])] = {}
-            for row_ix in range(len(row)):
-                bin_dict[str(month_ix)]['topic_model']['doc_topic'][str(overlap_id[overlap_ix2])][str(month_ix) + '_' + str(row_ix)] = row[row_ix]
-            
-        # topic_word
-        for topic_word_ix in range(10):
-            name = str(month_ix) + '_' + str(topic_word_ix)
-            bin_dict[str(month_ix)]['topic_model']['topic_word'][name] = {}
-            topwords = df_topic_word[month_ix].iloc[topic_word_ix].sort_values(ascending=False)[:10]
-            topwords = np.around(topwords, 17)
-            # we choose top 10 most frequent words, so here the range is 10
-            for topword_ix in range(10):
-                bin_dict[str(month_ix)]['topic_model']['topic_word'][name][topwords.index[topword_ix]] = topwords.values[topword_ix]
-        
-        # delete df_topic_doc_overlap to aviod overwritting error and save memory
-        del df_topic_doc_overlap
-        
+    Args:
+        similarity     -- similarity matrix of the topics, see topic_similarity
+        top_links      -- number of most similar topics of the second bin every
+                          topic of the first bin is linked to, None for all
+        min_similarity -- topics less similar than this are not linked
 
-    ### TRANSFORM INTO JS FORMAT
-    # transform bin_dict into an ordered dictionary
-    bin_dict_ordered = {}
+    Returns:
+        a list of (source topic, target topic, similarity) tuples, by source
+        topic and decreasing similarity
+    """
+    order = np.argsort(-similarity, axis=1, kind='stable')
+    if top_links is not None:
+        order = order[:, :top_links]
+    links = []
+    for source, targets in enumerate(order.tolist()):
+        for target in targets:
+            if similarity[source, target] >= min_similarity:
+                links.append((source, target, float(similarity[source, target])))
+    return links
 
-    key_order = ('tweet_Ids','start_time','bin_id','topic_model','end_time')
-    for month_ix in range(len(month_list)):
-        tmp = OrderedDict()
-        for k in key_order:
-            tmp[k] = bin_dict[str(month_ix)][k]
-        bin_dict_ordered[str(month_ix)] = tmp
 
-    # transform body into .json format
-    json_tmp = json.dumps(bin_dict_ordered)
+# the viewport the viewer draws the topics in, see drawViz in controller.js
+LAYOUT_SIZE = (569, 700)
+LAYOUT_NODE_WIDTH = 15
+LAYOUT_NODE_PADDING = 10
 
-    # transform into .js format that TopicFlow can read
-    prefix = 'function populate_bins_' + project_name + '(){\nvar bin_data = '
-    posfix = ';\nreadBinJSON(bin_data);\n}'
-    bins_js = prefix + json_tmp + posfix
+
+def viewer_time(date):
+    """
+    Time of a "m/d/yyyy h:m" date in milliseconds, as the viewer computes it
+    with Date.UTC(year, month, day, hour, minute): the month is passed as a
+    month index, and days past the end of the month carry over.
+    """
+    month, day, year, hour, minute = (int(x) for x in re.split('[/ :]', date))
+    year, month = year + month // 12, month % 12
+    days = (datetime.date(year, month + 1, 1) - datetime.date(1970, 1, 1)).days + day - 1
+    return ((days * 24 + hour) * 60 + minute) * 60000
 
 
-    ### WRITE
-    with open(os.path.join(path_tf, 'data', project_name, 'Bins.js'), 'w') as file:
-        file.write(bins_js)
+def stack_links(ends, depths, widths):
+    """
+    Stack the links of every topic on one of their sides, in the order of
+    the topics at their other end.
 
-    print('Bins.js created,            40% complete.')
+    Args:
+        ends   -- the topic every link is stacked on
+        depths -- the position of the topic at the other end of every link
+        widths -- the width of every link
+
+    Returns:
+        a NumPy array of the position of every link on its topic
+    """
+    # by topic, then by depth, links of the same depth in order
+    order = np.lexsort((depths, ends))
+    ends, widths = ends[order], widths[order]
+    tops = np.cumsum(widths) - widths
+    # the position of the first link of every topic is 0
+    new_end = np.ones(len(ends), dtype=bool)
+    new_end[1:] = ends[1:] != ends[:-1]
+    tops -= tops[np.maximum.accumulate(np.where(new_end, np.arange(len(ends)), 0))]
+    offsets = np.empty(len(order))
+    offsets[order] = tops
+    return offsets
+
+
+def layout_topics(nodes, links, starts, size=LAYOUT_SIZE, node_width=LAYOUT_NODE_WIDTH, node_padding=LAYOUT_NODE_PADDING, columns=None):
+    """
+    Place the topics and the links of the visualization, as the layout of
+    the viewer (scripts/d3/topicflow.js) does, so the viewer only scales
+    them to its size.
 
+    Topics are placed by the start time of their bin from left to right,
+    and from top to bottom by weight, as high as the topics of the bin allow.
+    Links are stacked on their topics in the order of the topics they link to.
+
+    Args:
+        nodes        -- the nodes of TopicSimilarity.js
+        links        -- the links of TopicSimilarity.js, with node indexes
+        starts       -- the start time of every bin, see transform_bin
+        size         -- width and height of the viewport
+        node_width   -- width of a topic
+        node_padding -- space between the topics of a bin
+        columns      -- the index in starts of the bin of every node, read
+                        from the names of the nodes by default
 
-def transform_topicSimilarity(project_name, path_topic_tf):
+    Returns:
+        an OrderedDict with the size, node width and padding of the layout,
+        the position ("x", "y") and height ("dy") of every node, and the
+        width ("link_dy") and position on its source and target ("link_sy",
+        "link_ty") of every link
+    """
+    values = np.array([node['value'] for node in nodes], dtype=np.float64)
+    sources = np.array([link['source'] for link in links], dtype=np.int64)
+    targets = np.array([link['target'] for link in links], dtype=np.int64)
+    link_values = np.array([link['value'] for link in links], dtype=np.float64)
+
+    ### PLACE the topics of a bin in a column
+    times = np.array([viewer_time(start) for start in starts], dtype=np.float64)
+    if columns is None:
+        columns = [int(node['name'].split('_')[0]) for node in nodes]
+    bin_of = np.array(columns, dtype=np.int64)
+    span = times[-1] - times[0] if len(times) else 0
+    x = (times[bin_of] - times[0]) * ((size[0] - node_width) / span if span else 0)
+    # columns of topics at the same position, with the heaviest topics of a
+    # column first and topics of the same weight in order
+    _, column_of = np.unique(x, return_inverse=True)
+    column_of = column_of.reshape(-1)
+    n_columns = column_of.max() + 1 if len(nodes) else 0
+    order = np.lexsort((-values, column_of))
+    bounds = np.searchsorted(column_of[order], np.arange(n_columns + 1))
+
+    # scale the weights so the tallest column fits
+    totals = np.bincount(column_of, weights=values, minlength=n_columns)
+    counts = np.bincount(column_of, minlength=n_columns)
+    heights = (size[1] - (counts[totals > 0] - 1) * node_padding) / totals[totals > 0]
+    ky = heights.min() if len(heights) else 0
+    dy = values * ky
+    y = np.zeros(len(nodes))
+    for first, last in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        # the topics are stacked down, the k-th at least at k: with steps the
+        # heights and paddings of the topics above, y[k] = max(k, y[k - 1] +
+        # dy[k - 1] + padding) = steps[k] + max(j - steps[j] for j <= k)
+        column = order[first:last]
+        steps = np.concatenate(([0], np.cumsum(dy[column[:-1]] + node_padding)))
+        y_column = steps + np.maximum.accumulate(np.arange(len(column)) - steps)
+        # and pushed back up if the column is taller than the viewport, y[k] =
+        # min(y[k], y[k + 1] - dy[k] - padding) from the bottom topic up
+        overflow = y_column[-1] + dy[column[-1]] - size[1]
+        if overflow > 0:
+            y_column[-1] -= overflow
+            y_column = steps + np.minimum.accumulate((y_column - steps)[::-1])[::-1]
+        y[column] = y_column
+
+
+    ### STACK the links on their topics
+    # links are scaled so they fit the topics with links on both sides
+    has_out = np.bincount(sources, minlength=len(nodes)) > 0
+    has_in = np.bincount(targets, minlength=len(nodes)) > 0
+    linked = has_out & has_in if (has_out & has_in).any() else has_out | has_in
+    widest = np.full(len(nodes), -np.inf)
+    np.maximum.at(widest, sources, link_values)
+    np.maximum.at(widest, targets, link_values)
+    link_scale = (dy[linked] / widest[linked]).min() if linked.any() else 0
+    link_dy = link_values * link_scale
+    link_sy = stack_links(sources, y[targets], link_dy)
+    link_ty = stack_links(targets, y[sources], link_dy)
+
+    layout = OrderedDict()
+    layout['size'] = list(size)
+    layout['node_width'] = node_width
+    layout['node_padding'] = node_padding
+    for key, array in (('x', x), ('y', y), ('dy', dy), ('link_dy', link_dy), ('link_sy', link_sy), ('link_ty', link_ty)):
+        layout[key] = np.round(array, 3).tolist()
+    return layout
+
+
+def transform_topicSimilarity(project_name, path_topic_tf, topic_weights=None, similarity=None):
     """
     Transform topic similarity matrix into JavaScript format
     that TopicFlow can read.
 
+    The similarities of the topics of adjacent bins are read from the
+    topicflow similarity file, or computed from their Topic_Term_Matrixes,
+    see topic_similarity.
+
     Args:
         project_name  -- name of the new project
-        path_topic_tf -- path of topicflow similarity file
+        path_topic_tf -- path of topicflow similarity file, None to compute
+                         the similarities
+        topic_weights -- the weights of the topics of every bin returned by
+                         transform_bins, they set the size of the topics in the
+                         visualization
+        similarity    -- None to read the similarity file, or a dictionary
+                         with the "measure" (see topic_similarity),
+                         "top_links" and "min_similarity" (see select_links)
+                         of the similarities to compute
 
     Outcome:
-        "TopicSimilarity.js"
+        "TopicSimilarity.js", with the layout of the topics, see layout_topics
     """
 
-    ### DEFINE month_list, READ DATA
-    month_list = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    df_topic_tf = read_data(df_topic_tf=True)
+    ### FIND BINS, READ DATA
+    # the columns of a bin in the similarity file are named after its
+    # Document_Topic_Matrix, e.g. "Jan" or "2012_Jan". The metadata leaves
+    # out the bins transform_bins left out
+    bins = find_bins(path_doc, path_meta, path_dtm, path_ttm)
+    if similarity is None:
+        df_topic_tf = read_data(df_topic_tf=True)
 
 
     ### DATA TRANSFORMATION
@@ -339,29 +2502,54 @@ def transform_topicSimilarity(project_name, path_topic_tf):
     sim_dict = {}
 
     # populate nodes
-    # put topics into nodes, record their orders
+    # put topics into nodes, record their orders. Every bin has as many topics
+    # as rows in its Topic_Term_Matrix, sized by their weight in the
+    # Document_Topic_Matrix
     nodes = []
-    for i in range(len(month_list)):
-        for j in range(10):
+    node_offsets = []  # index of the first node of every bin
+    for i, bin_paths in enumerate(bins):
+        node_offsets.append(len(nodes))
+        weights = topic_weights[i] if topic_weights is not None else []
+        for j in range(count_topics(bin_paths['ttm'])):
             tmp = {}
             name = str(i) + '_' + str(j)
-            # how to calculate the value of a topic? the paper didn't define clearly
-            # so here I use a random number
-            value = np.random.randint(1,100)
+            value = weights[j] if j < len(weights) else 0
             tmp['name'], tmp['value'] = name, value
             nodes.append(tmp)
+    node_offsets.append(len(nodes))
 
     # populate links
     # put source, target, value into links
     links = []
-    for month_ix in range(len(month_list) - 1):
-        # get unique pais between every two months, in total we have 11 pairs
-        mm1, mm2 = month_list[month_ix], month_list[month_ix + 1]
+    df_topic_word = None
+    for bin_ix in range(len(bins) - 1):
+        if similarity is not None:
+            # every Topic_Term_Matrix is read once
+            df_topic_word_prev = df_topic_word if df_topic_word is not None else read_topic_word(bins[bin_ix]['ttm'])
+            df_topic_word = read_topic_word(bins[bin_ix + 1]['ttm'])
+            scores = topic_similarity(df_topic_word_prev, df_topic_word, similarity['measure'])
+            for source, target, score in select_links(scores, similarity['top_links'], similarity['min_similarity']):
+                link_tmp = {}
+                link_tmp['source'] = node_offsets[bin_ix] + source
+                link_tmp['target'] = node_offsets[bin_ix + 1] + target
+                link_tmp['value'] = round(score * 100, 4)
+                links.append(link_tmp)
+            continue
+
+        # get unique pairs between every two adjacent bins
+        mm1, mm2 = bins[bin_ix]['label'], bins[bin_ix + 1]['label']
         sim = mm1 + '_' + mm2 + '_similarity'
+        if not set([mm1, mm2, sim]) <= set(df_topic_tf.columns):
+            print('No similarity scores between ' + mm1 + ' and ' + mm2 + ', the two bins are not linked.')
+            continue
         df_tmp = df_topic_tf[[mm1, mm2, sim]].dropna(axis=0).drop_duplicates()
         for row_ix in range(len(df_tmp)):
-            source = month_ix*10 + int(df_tmp[mm1].values[row_ix]) - 1
-            target = (month_ix+1)*10 + int(df_tmp[mm2].values[row_ix]) - 1
+            # topics are numbered from 1 in the similarity file
+            source = node_offsets[bin_ix] + int(df_tmp[mm1].values[row_ix]) - 1
+            target = node_offsets[bin_ix + 1] + int(df_tmp[mm2].values[row_ix]) - 1
+            if not (node_offsets[bin_ix] <= source < node_offsets[bin_ix + 1] and
+                    node_offsets[bin_ix + 1] <= target < node_offsets[bin_ix + 2]):
+                continue
             score = df_tmp[sim].values[row_ix] * 100 # 100 makes it neither too thin nor too thick
             link_tmp = {}
             link_tmp['source'], link_tmp['target'], link_tmp['value'] = source, target, score
@@ -370,6 +2558,12 @@ def transform_topicSimilarity(project_name, path_topic_tf):
     # put two lists into sim_dict
     sim_dict['nodes'], sim_dict['links'] = nodes, links
 
+    # place the topics for the viewer, with the start times of the bins
+    # in the index of the project
+    if os.path.isfile(os.path.join(path_tf, 'data', project_name, 'Index.js')):
+        starts = [entry['start_time'] for entry in read_index(project_name)['bins']]
+        sim_dict['layout'] = layout_topics(nodes, links, starts)
+
 
     ### TRANSFORM INTO JS FORMAT
     json_tmp = json.dumps(sim_dict)
@@ -385,88 +2579,421 @@ def transform_topicSimilarity(project_name, path_topic_tf):
         file.write(topicSimilarity_js)
 
     print('TopicSimilarity.js created, 60% complete.')
+    report(measure=similarity['measure'] if similarity is not None else 'file',
+           nodes=len(nodes), links=len(links),
+           output_bytes=len(topicSimilarity_js))
 
 
-def modify_html(project_name, path_tf):
+def read_similarity(project_name):
     """
-    Modify the content of \topicflow\index.html.
-    Two hand-added comments are used to locate the lines where new content can be
-    added. Executing the function would replace the existing index.html.
-    
+    Read the similarity graph of a project written by transform_topicSimilarity.
+
+    Returns:
+        the graph, a dictionary with the nodes, links and layout of the topics
+    """
+    prefix = 'function populate_similarity_' + project_name + '(){\nvar sim_data = '
+    posfix = ';\nreadSimilarityJSON(sim_data);\n}'
+    with open(os.path.join(path_tf, 'data', project_name, 'TopicSimilarity.js'), 'r', encoding='utf-8') as file:
+        return json.loads(file.read()[len(prefix):-len(posfix)])
+
+
+# the coarser levels of the bins of a project, with the number of months of
+# their periods, see transform_levels
+LEVELS = OrderedDict([('quarter', 3), ('year', 12)])
+
+
+def follow_topics(n_nodes, links):
+    """
+    Follow the topics of a project from bin to bin: a topic continues the
+    topic of the previous bin it is the most similar to, if it's also the
+    topic of its bin that this topic is the most similar to.
+
     Args:
-        project_name -- name of the new project
-        path_tf      -- path of topicflow directory
-    
+        n_nodes -- number of nodes of TopicSimilarity.js
+        links   -- the links of TopicSimilarity.js, with node indexes
+
+    Returns:
+        the index of the topic every topic continues, -1 for none
+    """
+    best_target = {}
+    best_source = {}
+    # the first of equally similar topics wins
+    for link in links:
+        source, target, value = link['source'], link['target'], link['value']
+        if source not in best_target or value > best_target[source][1]:
+            best_target[source] = (target, value)
+        if target not in best_source or value > best_source[target][1]:
+            best_source[target] = (source, value)
+    previous = [-1] * n_nodes
+    for target, (source, _) in best_source.items():
+        if best_target[source][0] == target:
+            previous[target] = source
+    return previous
+
+
+def period_label(level, year, period_ix):
+    """
+    Returns:
+        the label of a period of a level, e.g. "2012 Q1" or "2012"
+    """
+    if level == 'quarter':
+        return str(year) + ' Q' + str(period_ix + 1)
+    return str(year)
+
+
+def level_periods(level, months, entries):
+    """
+    Group the bins of a project into the periods of a level. Consecutive bins
+    that start in the same period are grouped.
+
+    Args:
+        level   -- name of the level, see LEVELS
+        months  -- number of months of a period
+        entries -- the bins of the index of the project, see read_index
+
+    Returns:
+        the periods, with their "label", "start_time", "end_time", the
+        indexes of their first and last bins ("bins") and the path of their
+        window ("window"), see transform_levels, and the period of every bin
+    """
+    periods, period_of = [], []
+    key = None
+    for bin_ix, entry in enumerate(entries):
+        month, _, year = (int(x) for x in entry['start_time'].split(' ')[0].split('/'))
+        bin_key = (year, (month - 1) // months)
+        if bin_key != key:
+            key = bin_key
+            periods.append(OrderedDict([('label', period_label(level, year, bin_key[1])),
+                                        ('start_time', entry['start_time']),
+                                        ('end_time', entry['end_time']),
+                                        ('bins', [bin_ix, bin_ix]),
+                                        ('window', 'levels/{}/{}.json'.format(level, len(periods)))]))
+        periods[-1]['end_time'] = entry['end_time']
+        periods[-1]['bins'][1] = bin_ix
+        period_of.append(len(periods) - 1)
+    return periods, period_of
+
+
+def sub_graph(nodes, links, keep, periods, columns):
+    """
+    Cut the nodes of a time window out of a similarity graph, with the links
+    between them, and place them for the viewer, see layout_topics.
+
+    Args:
+        nodes   -- the nodes of the graph
+        links   -- the links of the graph, with node indexes
+        keep    -- the indexes of the nodes of the window
+        periods -- the columns of the window, with their "start_time"
+        columns -- the index in periods of the column of every node of keep
+
+    Returns:
+        the graph of the window, with its "periods", "nodes", "links" and "layout"
+    """
+    new_ix = {node_ix: i for i, node_ix in enumerate(keep)}
+    window_nodes = [nodes[node_ix] for node_ix in keep]
+    window_links = [dict(link, source=new_ix[link['source']], target=new_ix[link['target']])
+                    for link in links if link['source'] in new_ix and link['target'] in new_ix]
+    graph = OrderedDict()
+    graph['periods'] = periods
+    graph['nodes'] = window_nodes
+    graph['links'] = window_links
+    graph['layout'] = layout_topics(window_nodes, window_links, [period['start_time'] for period in periods], columns=columns)
+    return graph
+
+
+def transform_levels(project_name):
+    """
+    Aggregate the bins of a project into coarser levels, quarters and years,
+    so the viewer shows long projects with fewer columns of topics and loads
+    the topics of the bins of a period when it zooms into the period.
+
+    The topics of a period of a level are the threads of topics of its bins,
+    see follow_topics. A thread is weighted by the sum of the weights of its
+    topics, and the threads of two adjacent periods are linked by the links
+    between their topics across the two periods. Links between the topics of
+    a period are left out.
+
+    Every period also has a window, the graph of the next finer level (the
+    bins of a quarter, the quarters of a year) within the period, placed for
+    the viewer like TopicSimilarity.js.
+
+    Args:
+        project_name -- name of the project, whose Index.js and
+                        TopicSimilarity.js are written
+
     Outcome:
-        a modified "index.html" that includes a new project
+        "Levels.js", with the graph of every level, and
+        "levels/<level>/<period>.json", the windows of its periods
     """
-    # read exisitng index.html and parse by lines
-    with open(os.path.join(path_tf, 'index.html'), 'r') as file:
-        html = file.read()
+    entries = read_index(project_name)['bins']
+    sim = read_similarity(project_name)
+    nodes, links = sim['nodes'], sim['links']
+    node_bin = [int(node['name'].split('_')[0]) for node in nodes]
+    previous = follow_topics(len(nodes), links)
+    path_project = os.path.join(path_tf, 'data', project_name)
+    bin_periods = [OrderedDict([('label', entry['start_time'].split(' ')[0]),
+                                ('start_time', entry['start_time']),
+                                ('end_time', entry['end_time']),
+                                ('bins', [bin_ix, bin_ix])]) for bin_ix, entry in enumerate(entries)]
+
+    levels = []
+    # the level whose graph the windows of the next level show, the bins first
+    finer = {'nodes': nodes, 'links': links, 'node_period': node_bin, 'periods': bin_periods}
+    n_windows = 0
+    for level, months in LEVELS.items():
+        periods, period_of = level_periods(level, months, entries)
+
+        ### GROUP the topics of a period into threads
+        thread_of = [-1] * len(nodes)
+        threads = []  # the topics of every thread
+        for node_ix in range(len(nodes)):
+            prev = previous[node_ix]
+            if prev != -1 and period_of[node_bin[prev]] == period_of[node_bin[node_ix]]:
+                thread_of[node_ix] = thread_of[prev]
+                threads[thread_of[node_ix]].append(node_ix)
+            else:
+                thread_of[node_ix] = len(threads)
+                threads.append([node_ix])
+        # threads are numbered within their period, in the order of their first topic
+        thread_period = [period_of[node_bin[topics[0]]] for topics in threads]
+        order = sorted(range(len(threads)), key=lambda t: (thread_period[t], threads[t][0]))
+        new_ix = {t: i for i, t in enumerate(order)}
+        level_nodes = []
+        count = collections.Counter()
+        for t in order:
+            topics = sorted(threads[t], key=lambda node_ix: -nodes[node_ix]['value'])
+            period_ix = thread_period[t]
+            level_nodes.append(OrderedDict([('name', level[0] + str(period_ix) + '_' + str(count[period_ix])),
+                                            ('value', round(sum(nodes[node_ix]['value'] for node_ix in topics), 4)),
+                                            ('topics', [nodes[node_ix]['name'] for node_ix in topics])]))
+            count[period_ix] += 1
+
+        ### LINK the threads of adjacent periods
+        level_links = []
+        for link in links:
+            source, target = thread_of[link['source']], thread_of[link['target']]
+            if source != target and thread_period[source] != thread_period[target]:
+                level_links.append(OrderedDict([('source', new_ix[source]), ('target', new_ix[target]),
+                                                ('value', link['value']),
+                                                ('topics', [nodes[link['source']]['name'], nodes[link['target']]['name']])]))
+        node_period = [thread_period[t] for t in order]
+
+        ### WINDOWS of the periods, in the finer level
+        remove_stale_shards(project_name, os.path.join('levels', level), len(periods))
+        for period_ix, period in enumerate(periods):
+            first, last = period['bins']
+            sub_periods = [p for p in range(len(finer['periods'])) if first <= finer['periods'][p]['bins'][0] <= last]
+            keep = [node_ix for node_ix, p in enumerate(finer['node_period']) if p in sub_periods]
+            window = sub_graph(finer['nodes'], finer['links'], keep, [finer['periods'][p] for p in sub_periods],
+                               [finer['node_period'][node_ix] - sub_periods[0] for node_ix in keep])
+            with open(os.path.join(path_project, period['window']), 'w', encoding='utf-8') as file:
+                json.dump(window, file)
+            n_windows += 1
+
+        level_dict = OrderedDict()
+        level_dict['name'] = level
+        level_dict['periods'] = periods
+        level_dict['nodes'] = level_nodes
+        level_dict['links'] = level_links
+        level_dict['layout'] = layout_topics(level_nodes, level_links, [period['start_time'] for period in periods],
+                                             columns=node_period)
+        levels.append(level_dict)
+        finer = {'nodes': level_nodes, 'links': level_links, 'node_period': node_period, 'periods': periods}
 
-    html_parse = html.split('\n')
+    ### WRITE
+    levels_dict = OrderedDict()
+    levels_dict['path'] = 'data/' + project_name + '/'
+    # the graph of the bins is loaded when the bins are shown
+    levels_dict['similarity'] = 'TopicSimilarity.js'
+    levels_dict['populate'] = 'populate_similarity_' + project_name
+    levels_dict['levels'] = levels
+    prefix = 'function populate_levels_' + project_name + '(){\nvar levels_data = '
+    posfix = ';\nreadLevelsJSON(levels_data);\n}'
+    levels_js = prefix + json.dumps(levels_dict) + posfix
+    with open(os.path.join(path_project, 'Levels.js'), 'w', encoding='utf-8') as file:
+        file.write(levels_js)
+
+    print('Levels created,             65% complete.')
+    report(bins=len(entries), **{level['name'] + 's': len(level['periods']) for level in levels},
+           **{level['name'] + '_nodes': len(level['nodes']) for level in levels},
+           windows=n_windows, output_bytes=len(levels_js))
+
+
+def remove_levels(project_name):
+    """
+    Remove the levels of a project, see transform_levels, e.g. after an
+    update without --levels.
+    """
+    path_project = os.path.join(path_tf, 'data', project_name)
+    for name in ('Levels.js', 'Levels.js.gz', 'Levels.js.br'):
+        if os.path.isfile(os.path.join(path_project, name)):
+            os.remove(os.path.join(path_project, name))
+    if os.path.isdir(os.path.join(path_project, 'levels')):
+        shutil.rmtree(os.path.join(path_project, 'levels'))
 
-    # add new section after '<!-- add new section after this line -->'
-    ix = html_parse.index('<!-- add new section after this line -->')
-    new_section = '<script src="data/SHA/Doc.js"></script>\n<script src="data/SHA/Bins.js"></script>\n<script src="data/SHA/TopicSimilarity.js"></script>\n'.replace('SHA',project_name)
-    html_parse.insert(ix+1, new_section)
 
-    # add new selector after '<!-- add new dataset selector after this line -->'
-    ix = html_parse.index('\t\t\t<!-- add new dataset selector after this line -->')
-    new_selector = '\t\t\t<li id="{}"><a href="#">{}</a></li>'.format(project_name, project_name.replace('_', ' '))
-    html_parse.insert(ix+1, new_selector)
+def compress_file(path_file):
+    """
+    Write the precompressed variants of a file that the server sends to the
+    browsers that accept them: <file>.gz, and <file>.br if the brotli package
+    is installed. Variants that are newer than the file are kept.
 
-    # replace existing index.html
-    html_combine = '\n'.join(html_parse)
-    os.remove(os.path.join(path_tf, 'index.html'))
-    with open(os.path.join(path_tf, 'index.html'), 'w') as file:
-        file.write(html_combine)
+    Args:
+        path_file -- path of the file
 
-    print('index.html modified,        80% complete.')
+    Returns:
+        the number of variants written
+    """
+    written = 0
+    mtime = os.stat(path_file).st_mtime_ns
+    for suffix in ('.gz', '.br'):
+        path_variant = path_file + suffix
+        if suffix == '.br' and brotli is None:
+            continue
+        if os.path.isfile(path_variant) and os.stat(path_variant).st_mtime_ns >= mtime:
+            continue
+        # compress chunk by chunk, data files can be larger than memory allows
+        with open(path_file, 'rb') as source, open(path_variant + '.tmp', 'wb') as target:
+            if suffix == '.gz':
+                with gzip.GzipFile(fileobj=target, mode='wb', compresslevel=6, mtime=0) as compressed:
+                    shutil.copyfileobj(source, compressed, 1 << 20)
+            else:
+                compressor = brotli.Compressor(quality=9)
+                for chunk in iter(lambda: source.read(1 << 20), b''):
+                    target.write(compressor.process(chunk))
+                target.write(compressor.finish())
+        os.replace(path_variant + '.tmp', path_variant)
+        written += 1
+    return written
+
+
+def compress_project(project_name):
+    """
+    Precompress the data files of a project, see compress_file, and remove
+    the variants of files that no longer exist.
 
+    Args:
+        project_name -- name of the project
 
-def modify_controller(project_name, path_tf):
+    Outcome:
+        "<file>.gz" and "<file>.br" for every .js and .json file of the project
     """
-    Modify the content of \topicflow\scripts\controller.js.
-    Two hand-added comments are used to locate the lines where new content can be
-    added. Executing the function would replace the existing controller.js.
-    
+    files, written = 0, 0
+    for path_folder, _, names in os.walk(os.path.join(path_tf, 'data', project_name)):
+        for name in names:
+            path_file = os.path.join(path_folder, name)
+            if name.endswith(('.gz', '.br')):
+                if not os.path.isfile(path_file[:-3]):
+                    os.remove(path_file)
+            elif name.endswith(('.js', '.json')) and name not in ('manifest.json', 'profile.json'):
+                files += 1
+                written += compress_file(path_file)
+
+    print('Compressed copies created,  70% complete.')
+    report(files=files, variants_written=written)
+
+
+def project_entry(project_name):
+    """
+    Create the entry of a project in the project registry, see read_projects.
+
     Args:
-        project_name -- name of the new project
-        path_tf      -- path of topicflow directory
-    
+        project_name -- name of the project
+
+    Returns:
+        the entry, with the name shown in the dataset selector, the data files
+        the viewer loads when the project is selected, the functions of the
+        files that populate the visualization and, if the project has a
+        database, the URL of its JSON API
+    """
+    path_project = os.path.join(path_tf, 'data', project_name)
+    # the viewer loads the bins of a project with an index when they are
+    # selected, and every document and bin of an older project at once. The
+    # levels of a project replace its similarities, see transform_levels
+    if os.path.isfile(os.path.join(path_project, 'Levels.js')):
+        files = [('Index.js', 'index'), ('Levels.js', 'levels')]
+    elif os.path.isfile(os.path.join(path_project, 'Index.js')):
+        files = [('Index.js', 'index'), ('TopicSimilarity.js', 'similarity')]
+    else:
+        files = [('Doc.js', 'tweets'), ('Bins.js', 'bins'), ('TopicSimilarity.js', 'similarity')]
+    files = [(name, kind) for name, kind in files if os.path.isfile(os.path.join(path_project, name))]
+    entry = {'id': project_name,
+             'name': project_name.replace('_', ' '),
+             'scripts': ['data/{}/{}'.format(project_name, name) for name, kind in files],
+             'populate': ['populate_{}_{}'.format(kind, project_name) for name, kind in files]}
+    # the viewer queries the documents of a project with a database, see api_response
+    if os.path.isfile(os.path.join(path_project, 'project.db')):
+        entry['api'] = 'api/{}/'.format(project_name)
+    return entry
+
+
+def read_projects():
+    """
+    Read the project registry, data/projects.json. The viewer lists the
+    projects of the registry in its dataset selector and loads the data files
+    of a project when it is selected. A registry of the project folders is
+    created if there is none yet, e.g. for projects added when index.html
+    listed the projects. Folders without TopicSimilarity.js, such as the
+    ones of projects that failed to build, are left out.
+
+    Returns:
+        the registry, a dictionary with the list of projects
+    """
+    path_file = os.path.join(path_tf, 'data', 'projects.json')
+    if not os.path.isfile(path_file):
+        data_dir = os.path.join(path_tf, 'data')
+        names = sorted(name for name in os.listdir(data_dir) if os.path.isfile(os.path.join(data_dir, name, 'TopicSimilarity.js')))
+        # the base project is listed first
+        names.sort(key=lambda name: name != 'Full_Disclosure_2012')
+        return {'projects': [project_entry(name) for name in names]}
+    with open(path_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_projects(registry):
+    """
+    Write the project registry, see read_projects.
+
     Outcome:
-        a modified "controller.js" that includes a new project
+        "data/projects.json"
     """
-    # read exisitng controller.js and parse by lines
-    with open(os.path.join(path_tf, 'scripts', 'controller.js'), 'r') as file:
-        controller = file.read()
+    path_file = os.path.join(path_tf, 'data', 'projects.json')
+    with open(path_file + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(registry, file, indent=1)
+    os.replace(path_file + '.tmp', path_file)
 
-    controller_parse = controller.split('\n')
 
-    # add idToName after '// add new idToName'
-    ix = controller_parse.index('\t\t\t\t\t// add new idToName')
-    new_idToName = '\t\t\t\t\t"{}":"{}",'.format(project_name, project_name.replace('_', ' '))
-    controller_parse.insert(ix+1, new_idToName)
+def register_project(*project_names):
+    """
+    Add projects to the project registry, or update their entries, so the
+    viewer lists them. The data files of the projects must be written.
 
-    # add selected dataset after '// add new selected dataset here'
-    ix = controller_parse.index('\t// add new selected dataset here')
-    new_selectedDataset = '\tif (selected_data==="SHA") {\n\t\tpopulate_tweets_SHA();\n\t\tpopulate_bins_SHA();\n\t\tpopulate_similarity_SHA();\n\t}'.replace('SHA', project_name)
-    controller_parse.insert(ix+1, new_selectedDataset)
+    Args:
+        project_names -- names of the new projects
 
-    # replace existing controller.js
-    controller_combine = '\n'.join(controller_parse)
-    os.remove(os.path.join(path_tf, 'scripts', 'controller.js'))
-    with open(os.path.join(path_tf, 'scripts', 'controller.js'), 'w') as file:
-        file.write(controller_combine)
+    Outcome:
+        a modified "data/projects.json" that includes the projects
+    """
+    registry = read_projects()
+    for project_name in project_names:
+        entry = project_entry(project_name)
+        ids = [project['id'] for project in registry['projects']]
+        if project_name in ids:
+            registry['projects'][ids.index(project_name)] = entry
+        else:
+            registry['projects'].append(entry)
+    write_projects(registry)
 
-    print('controller.js modified,     100% complete.')
+    if len(project_names) == 1:
+        print('Project registered,         100% complete.')
+    else:
+        print(str(len(project_names)) + ' projects registered,     100% complete.')
 
 
 def del_project(project_name_delete):
     """
-    Delete an existing project. Content of the project in index.html, 
-    controller.js, and data/<project> folder will be deleted. The base project 
+    Delete an existing project. The project is removed from the project
+    registry, and the data/<project> folder is deleted. The base project
     "Full_Disclosure_2012" should not be deleted.
     
     Args:
@@ -475,75 +3002,629 @@ def del_project(project_name_delete):
     Outcome:
         Removal of an existing project or multiple existing projects.
     """
-    ### DELETE CONTENT IN index.html
-    # read exisitng index.html and parse by lines
-    with open(os.path.join(path_tf, 'index.html'), 'r') as file:
-        html = file.read()
-    html_parse = html.split('\n')
-
-    # delete section after '<!-- add new section after this line -->'
-    ix_1 = html_parse.index('<!-- add new section after this line -->')
-    ix_2 = html_parse.index('<!-- end of adding new datasets. -->')
-    delete_ix = 0
-    for i_1 in range(ix_1, ix_2):
-        # make sure only the specified project is deleted, we don't want to delete other projects that have the this name in it
-        if project_name_delete in html_parse[i_1] and 'Doc.js' in html_parse[i_1] and len(html_parse[i_1]) == 36+len(project_name_delete):
-            delete_ix = i_1
-    for i_2 in range(4): # there are 4 lines for each project section, and we don't want to delete the end line
-        if not delete_ix == 0:
-            html_parse.pop(delete_ix)
-
-    # delete dataset selector after '<!-- add new dataset selector after this line -->'
-    ix_1 = html_parse.index('\t\t\t<!-- add new dataset selector after this line -->')
-    ix_2 = html_parse.index('\t\t\t<!-- end of adding new dataset selector -->')
-    for i_3 in range(ix_1, ix_2):
-        if 'id="' + project_name_delete + '"' in html_parse[i_3]:
-            html_parse.pop(i_3)
-    
-    # replace existing index.html
-    html_combine = '\n'.join(html_parse)
-    os.remove(os.path.join(path_tf, 'index.html'))
-    with open(os.path.join(path_tf, 'index.html'), 'w') as file:
-        file.write(html_combine)
-    
-    
-    ### DELETE CONTENT IN controller.js
-    # read exisitng controller.js and parse by lines
-    with open(os.path.join(path_tf, 'scripts', 'controller.js'), 'r') as file:
-        controller = file.read()
-    controller_parse = controller.split('\n')
-
-    # delete idToName after '// add new idToName'
-    ix_1 = controller_parse.index('\t\t\t\t\t// add new idToName')
-    ix_2 = controller_parse.index('\t\t\t\t\t"Full_Disclosure_2012":"Full Disclosure 2012"')
-    for i_4 in range(ix_1, ix_2):
-        if '"' + project_name_delete + '"' in controller_parse[i_4]:
-            controller_parse.pop(i_4)
-
-    # delete selected dataset after '// add new selected dataset here'
-    ix_1 = controller_parse.index('\t// add new selected dataset here')
-    ix_2 = controller_parse.index('\t// end of adding new selected datasets')
-    delete_ix = 0
-    for i_5 in range(ix_1, ix_2):
-        if '"' + project_name_delete + '"' in controller_parse[i_5]:
-            delete_ix = i_5
-    for i_6 in range(5): # there are 5 lines for each selected dataset, and we don't want to delete the end line
-        if not delete_ix == 0:
-            controller_parse.pop(delete_ix)
-
-    # replace existing controller.js
-    controller_combine = '\n'.join(controller_parse)
-    os.remove(os.path.join(path_tf, 'scripts', 'controller.js'))
-    with open(os.path.join(path_tf, 'scripts', 'controller.js'), 'w') as file:
-        file.write(controller_combine)
-    
+    ### DELETE THE PROJECT IN data/projects.json
+    registry = read_projects()
+    registry['projects'] = [project for project in registry['projects'] if project['id'] != project_name_delete]
+    write_projects(registry)
     
     ### DELETE data.<project_name_delete> FOLDER
-    # delete three .js files
-    for js_file in os.listdir(os.path.join(path_tf, 'data', project_name_delete)):
-        os.remove(os.path.join(path_tf, 'data', project_name_delete, js_file))
-    # delete project folder
-    os.rmdir(os.path.join(path_tf, 'data', project_name_delete))
+    # delete the .js files, the shards and the project folder
+    shutil.rmtree(os.path.join(path_tf, 'data', project_name_delete))
+
+
+# the number of items of a page of the JSON API by default, and at most
+API_PAGE = 100
+API_MAX_PAGE = 1000
+# the columns of a document, the ones of an entry of Doc.js and its bin
+API_DOC_COLUMNS = 'tweet_id, bin_id, author, tweet_date, text'
+
+
+def api_response(path_db, route, params):
+    """
+    Answer a request of the JSON API of a project from its database, see
+    transform_sqlite:
+
+        bins                    -- the bins, in order
+        docs                    -- the documents in the order of their tweet
+                                   ids, or the ones whose tweet ids are listed
+                                   in the "ids" parameter, e.g. "ids=4,8,15"
+        docs/<tweet id>         -- a document
+        docs/<tweet id>/topics  -- the topics of a document, the most probable
+                                   first
+        topics/<topic>/docs     -- the documents of a topic, the most probable
+                                   first, with their probabilities
+        topics/<topic>/words    -- the top words of a topic, the most probable
+                                   first
+
+    Lists are answered one page at a time, from the "offset" parameter (0 by
+    default) with "limit" items (API_PAGE by default, API_MAX_PAGE at most).
+
+    Args:
+        path_db -- path of the database of the project
+        route   -- the path of the request after "api/<project>/", split at "/"
+        params  -- the query parameters, as returned by urllib.parse.parse_qs
+
+    Returns:
+        a tuple of the HTTP status and the JSON serializable answer, an object
+        with the "total" number of items, the "offset", the "limit" and the
+        "items" of the page for a list, and with the "error" otherwise
+    """
+    try:
+        offset = int(params.get('offset', ['0'])[0])
+        limit = int(params.get('limit', [str(API_PAGE)])[0])
+        ids = [int(x) for x in params['ids'][0].split(',') if x] if 'ids' in params else None
+        tweet_id = int(route[1]) if len(route) > 1 and route[0] == 'docs' else None
+    except ValueError:
+        return http.HTTPStatus.BAD_REQUEST, {'error': 'offset, limit and tweet ids are integers'}
+    if offset < 0 or not 0 < limit <= API_MAX_PAGE or len(ids or []) > API_MAX_PAGE:
+        return http.HTTPStatus.BAD_REQUEST, {'error': 'offset is at least 0, and limit and the number of ids between 1 and ' + str(API_MAX_PAGE)}
+
+    connection = sqlite3.connect('file:' + urllib.request.pathname2url(path_db) + '?mode=ro', uri=True)
+    connection.row_factory = sqlite3.Row
+    try:
+        def page(sql_items, sql_count, args=()):
+            # one page of the items of a query and their total number
+            total = connection.execute(sql_count, args).fetchone()[0]
+            rows = connection.execute(sql_items + ' LIMIT ? OFFSET ?', tuple(args) + (limit, offset))
+            return http.HTTPStatus.OK, {'total': total, 'offset': offset, 'limit': limit, 'items': [dict(row) for row in rows]}
+
+        if route == ['bins']:
+            return page('SELECT * FROM bins ORDER BY bin_id', 'SELECT COUNT(*) FROM bins')
+        if route == ['docs'] and ids is None:
+            return page('SELECT ' + API_DOC_COLUMNS + ' FROM docs ORDER BY tweet_id', 'SELECT COUNT(*) FROM docs')
+        if route == ['docs']:
+            where = ' FROM docs WHERE tweet_id IN (' + ', '.join(['?'] * len(ids)) + ')'
+            return page('SELECT ' + API_DOC_COLUMNS + where + ' ORDER BY tweet_id', 'SELECT COUNT(*)' + where, ids)
+        if len(route) == 2 and route[0] == 'docs':
+            row = connection.execute('SELECT ' + API_DOC_COLUMNS + ' FROM docs WHERE tweet_id = ?', (tweet_id,)).fetchone()
+            if row is None:
+                return http.HTTPStatus.NOT_FOUND, {'error': 'no document ' + str(tweet_id)}
+            return http.HTTPStatus.OK, dict(row)
+        # topics of the same probability keep the order of the ranks shard
+        if len(route) == 3 and route[0] == 'docs' and route[2] == 'topics':
+            return page('SELECT topic, prob FROM topic_docs WHERE tweet_id = ? ORDER BY prob DESC, rowid',
+                        'SELECT COUNT(*) FROM topic_docs WHERE tweet_id = ?', (tweet_id,))
+        if len(route) == 3 and route[0] == 'topics' and route[2] == 'docs':
+            return page('SELECT d.tweet_id, t.prob, d.bin_id, d.author, d.tweet_date, d.text FROM topic_docs t JOIN docs d ON d.tweet_id = t.tweet_id '
+                        'WHERE t.topic = ? ORDER BY t.prob DESC, t.tweet_id',
+                        'SELECT COUNT(*) FROM topic_docs WHERE topic = ?', (route[1],))
+        if len(route) == 3 and route[0] == 'topics' and route[2] == 'words':
+            return page('SELECT word, prob FROM topic_words WHERE topic = ? ORDER BY prob DESC, rowid',
+                        'SELECT COUNT(*) FROM topic_words WHERE topic = ?', (route[1],))
+        return http.HTTPStatus.NOT_FOUND, {'error': 'unknown request ' + '/'.join(route)}
+    finally:
+        connection.close()
+
+
+class TopicFlowRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serve the files of TopicFlow with their precompressed variants, caching
+    headers, conditional requests and range requests.
+
+    A file is sent brotli or gzip encoded when the browser accepts it and
+    compress_file wrote the variant. Every file is sent with an ETag, a
+    Last-Modified date and "Cache-Control: no-cache", so a reload revalidates
+    files that an update may have changed and gets "304 Not Modified" for the
+    others instead of downloading them again.
+
+    Requests of "api/<project>/..." are answered from the database of the
+    project, see api_response. The parsed input files in the "cache"
+    directory, see read_cached, are not served.
+    """
+    # keep connections alive, the viewer requests a shard per bin
+    protocol_version = 'HTTP/1.1'
+    cache_control = 'no-cache'
+    # variants in order of preference
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+    # directories of the served root that are never sent
+    private = ('cache',)
+
+    def send_head(self):
+        self.remaining = None
+        path = self.translate_path(self.path)
+        if os.path.relpath(path, self.directory).split(os.sep)[0] in self.private:
+            self.send_error(http.HTTPStatus.NOT_FOUND, 'File not found')
+            return None
+        if os.path.isdir(path):
+            # let SimpleHTTPRequestHandler redirect to the directory with a
+            # trailing slash, or list a directory without an index
+            if not self.path.split('?', 1)[0].split('#', 1)[0].endswith('/'):
+                return super().send_head()
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return super().send_head()
+        if not os.path.isfile(path):
+            return super().send_head()
+
+        # pick the variant to send
+        accepted = [x.split(';')[0].strip() for x in self.headers.get('Accept-Encoding', '').split(',')]
+        encoding, path_sent = None, path
+        for name, suffix in self.encodings:
+            if name in accepted and os.path.isfile(path + suffix):
+                encoding, path_sent = name, path + suffix
+                break
+        try:
+            file = open(path_sent, 'rb')
+        except OSError:
+            self.send_error(http.HTTPStatus.NOT_FOUND, 'File not found')
+            return None
+
+        stat = os.fstat(file.fileno())
+        etag = '"{:x}-{:x}{}"'.format(stat.st_mtime_ns, stat.st_size, '-' + encoding if encoding else '')
+        last_modified = self.date_time_string(int(stat.st_mtime))
+
+        if self.not_modified(etag, stat.st_mtime):
+            file.close()
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.send_validators(etag, last_modified)
+            self.end_headers()
+            return None
+
+        byte_range = self.requested_range(stat.st_size, etag, last_modified)
+        if byte_range is False:
+            file.close()
+            self.send_response(http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', 'bytes */' + str(stat.st_size))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        first, last = byte_range or (0, stat.st_size - 1)
+
+        self.send_response(http.HTTPStatus.PARTIAL_CONTENT if byte_range else http.HTTPStatus.OK)
+        self.send_header('Content-Type', self.guess_type(path))
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        if byte_range:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(first, last, stat.st_size))
+        self.send_header('Content-Length', str(last - first + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_validators(etag, last_modified)
+        self.end_headers()
+        file.seek(first)
+        self.remaining = last - first + 1
+        return file
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path.startswith('/api/'):
+            self.send_api()
+        else:
+            super().do_GET()
+
+    def send_api(self):
+        """
+        Answer a request of the JSON API of a project, see api_response. The
+        answer is gzip encoded when the browser accepts it, and cached by the
+        browser until the database changes.
+        """
+        url = urllib.parse.urlsplit(self.path)
+        route = [urllib.parse.unquote(part) for part in url.path.split('/')[2:]]
+        project_name = route[0] if route else ''
+        path_db = os.path.join(self.directory, 'data', project_name, 'project.db')
+        accepted = [x.split(';')[0].strip() for x in self.headers.get('Accept-Encoding', '').split(',')]
+        encoded = 'gzip' in accepted
+        etag = None
+        if not project_name or project_name.startswith('.') or '/' in project_name or os.sep in project_name or not os.path.isfile(path_db):
+            status, answer = http.HTTPStatus.NOT_FOUND, {'error': 'no database of project ' + project_name + ', add the project with --sqlite'}
+        else:
+            stat = os.stat(path_db)
+            etag = '"{:x}-{:x}{}"'.format(stat.st_mtime_ns, stat.st_size, '-gzip' if encoded else '')
+            last_modified = self.date_time_string(int(stat.st_mtime))
+            if self.not_modified(etag, stat.st_mtime):
+                self.send_response(http.HTTPStatus.NOT_MODIFIED)
+                self.send_validators(etag, last_modified)
+                self.end_headers()
+                return
+            try:
+                status, answer = api_response(path_db, route[1:], urllib.parse.parse_qs(url.query))
+            except sqlite3.Error as e:
+                status, answer = http.HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+        body = json.dumps(answer).encode('utf-8')
+        if encoded:
+            body = gzip.compress(body, 6)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if encoded:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None and status == http.HTTPStatus.OK:
+            self.send_validators(etag, last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_validators(self, etag, last_modified):
+        """
+        Send the headers that let browsers cache and revalidate a file.
+        """
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Cache-Control', self.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def not_modified(self, etag, mtime):
+        """
+        Returns:
+            True if the browser's copy of the file, identified by the
+            If-None-Match or If-Modified-Since header, is up to date
+        """
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or 'W/' + etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError):
+                return False
+            return since is not None and int(mtime) <= since.timestamp()
+        return False
+
+    def requested_range(self, size, etag, last_modified):
+        """
+        Parse the Range header of a request. Only single byte ranges are
+        supported, the whole file is sent for other ranges.
+
+        Returns:
+            None to send the whole file, a (first, last) tuple of byte
+            positions, or False if the range is outside of the file
+        """
+        header = self.headers.get('Range')
+        if header is None or not header.startswith('bytes=') or ',' in header:
+            return None
+        # a range of another version of the file is ignored
+        if_range = self.headers.get('If-Range')
+        if if_range is not None and if_range.strip() not in (etag, last_modified):
+            return None
+        first, _, last = header[len('bytes='):].strip().partition('-')
+        try:
+            if first == '':
+                # the last bytes of the file
+                length = int(last)
+                if length == 0 or size == 0:
+                    return False
+                return (max(0, size - length), size - 1)
+            first = int(first)
+            last = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if first >= size:
+            return False
+        if last < first:
+            return None
+        return (first, min(last, size - 1))
+
+    def copyfile(self, source, outputfile):
+        # send only the requested range of a file opened by send_head
+        if self.remaining is None:
+            return super().copyfile(source, outputfile)
+        while self.remaining > 0:
+            chunk = source.read(min(1 << 16, self.remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            self.remaining -= len(chunk)
+
+    ### ACCESS LOG
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def parse_request(self):
+        # a request starts once its request line is read, an idle connection
+        # waiting for the next request is not counted
+        self.time_start = time.perf_counter()
+        self.status = None
+        self.body_start = self.wfile.count
+        self.server.request_started()
+        return super().parse_request()
+
+    def handle_one_request(self):
+        self.time_start = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.time_start is not None:
+                self.server.request_finished(self.access_log_line())
+
+    def end_headers(self):
+        super().end_headers()
+        self.body_start = self.wfile.count
+
+    def log_request(self, code='-', size='-'):
+        # logged with the bytes sent and the latency once the request is done
+        self.status = int(code) if code != '-' else code
+
+    def access_log_line(self):
+        """
+        Returns:
+            the access log line of the current request in the Common Log
+            Format, followed by the time taken to answer it
+        """
+        size = self.wfile.count - self.body_start
+        return '{} - - [{}] "{}" {} {} {:.1f}ms\n'.format(self.address_string(), self.log_date_time_string(),
+                                                         self.requestline, self.status or '-', size or '-',
+                                                         (time.perf_counter() - self.time_start) * 1000)
+
+
+class CountingWriter:
+    """
+    Wrap a file object and count the bytes written to it.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class TopicFlowServer(http.server.ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer that writes an access log, and keeps track of the
+    requests in progress so that it can stop without cutting them off.
+    """
+
+    def __init__(self, server_address, handler, access_log=None):
+        super().__init__(server_address, handler)
+        self.access_log = access_log if access_log is not None else sys.stderr
+        self.active_requests = 0
+        self.condition = threading.Condition()
+
+    def request_started(self):
+        with self.condition:
+            self.active_requests += 1
+
+    def request_finished(self, log_line):
+        with self.condition:
+            self.active_requests -= 1
+            self.access_log.write(log_line)
+            self.access_log.flush()
+            self.condition.notify_all()
+
+    def wait_for_requests(self, timeout=None):
+        """
+        Wait until the requests in progress are answered.
+
+        Returns:
+            False if some requests were still in progress after timeout seconds
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.active_requests == 0, timeout)
+
+
+def serve(path_tf, port=8000, bind='', access_log=None, timeout=10):
+    """
+    Serve TopicFlow over HTTP, with one thread per connection, see
+    TopicFlowRequestHandler. The server stops on Ctrl+C or SIGTERM, after the
+    requests in progress are answered.
+
+    Args:
+        path_tf    -- path of topicflow directory
+        port       -- port to listen on, 0 for any free port
+        bind       -- address to listen on, every interface by default
+        access_log -- file object the access log is written to, stderr by default
+        timeout    -- seconds to wait for the requests in progress when stopping
+    """
+    handler = functools.partial(TopicFlowRequestHandler, directory=path_tf)
+    try:
+        httpd = TopicFlowServer((bind, port), handler, access_log)
+    except OSError as e:
+        sys.exit('Could not serve at {}:{}: {}'.format(bind or '*', port, e.strerror or e))
+
+    def stop(signum, frame):
+        # shutdown waits for serve_forever to return, call it from another thread
+        threading.Thread(target=httpd.shutdown).start()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print('serving at port', httpd.server_address[1],
+          '(http://{}:{}/)'.format(bind or 'localhost', httpd.server_address[1]))
+    try:
+        httpd.serve_forever()
+        # a second Ctrl+C stops without waiting
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print('\nStopping the server...')
+        if not httpd.wait_for_requests(timeout):
+            print('Requests still in progress after', timeout, 'seconds are cut off.')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def project_paths_exist(path_doc, path_meta, path_dtm, path_ttm, path_topic_tf=None):
+    """
+    Returns:
+        True if the input folders, or archives, and files of a project exist
+    """
+    return ((os.path.isdir(path_doc) or is_archive(path_doc)) and (os.path.isdir(path_meta) or is_archive(path_meta)) and
+            os.path.isdir(path_dtm) and os.path.isdir(path_ttm) and (path_topic_tf is None or os.path.isfile(path_topic_tf)))
+
+
+def compact_args(args, compact=None):
+    """
+    Returns:
+        the options of the compact format of the ranks given on the command
+        line (--precision, --min-prob), in the format of rank_bin, starting
+        from the options of a project, or from 4 decimals and 0.01
+    """
+    compact = dict(compact or {'precision': COMPACT_PRECISION, 'min_prob': COMPACT_MIN_PROB})
+    if args.precision is not None:
+        compact['precision'] = args.precision
+    if args.min_prob is not None:
+        compact['min_prob'] = args.min_prob
+    return compact
+
+
+def project_options(args, path_topic_tf=None):
+    """
+    Returns:
+        the options of the command line for a new project, in the format of
+        the arguments of its manifest, see new_manifest
+    """
+    options = {'top_words': args.top_words if args.top_words is not None else 10,
+               # 0 lists every document of a topic
+               'top_docs': (args.top_docs if args.top_docs is not None else 100) or None,
+               'compact': compact_args(args) if args.compact else None,
+               'similarity': None,
+               'dedup': bool(args.dedup),
+               'sqlite': bool(args.sqlite),
+               'levels': bool(args.levels)}
+    if args.similarity or path_topic_tf is None:
+        options['similarity'] = similarity_args(args)
+    return options
+
+
+def build_project(project_name, manifest, pool=None, io_threads=8):
+    """
+    Transform the input files of a project into the data files of the
+    viewer, with the paths and options recorded in its manifest. Every stage
+    is profiled, see profiled.
+
+    Args:
+        project_name -- name of the project
+        manifest     -- the manifest of the project, see new_manifest
+        pool         -- a concurrent.futures.ProcessPoolExecutor, optional
+        io_threads   -- number of threads reading the documents of a bin
+
+    Outcome:
+        the data files of the project, except its entry in the registry, see
+        register_project
+    """
+    # read_data and transform_topicSimilarity read the input paths of the
+    # project being built from the module
+    global path_doc, path_meta, path_dtm, path_ttm, path_topic_tf
+    args = manifest['args']
+    path_doc, path_meta, path_dtm, path_ttm = args['path_doc'], args['path_meta'], args['path_dtm'], args['path_ttm']
+    path_topic_tf = args['path_topic_tf']
+    try:
+        with profiled('transform_doc'):
+            tweet_id_txt = transform_doc(project_name, args['path_doc'], args['path_meta'], args['doc_extension'], pool, manifest,
+                                         io_threads, args.get('dedup', False))
+        with profiled('transform_bins'):
+            topic_weights = transform_bins(project_name, args['path_doc'], args['path_meta'], args['path_dtm'], args['path_ttm'],
+                                           args['path_topic_tf'], tweet_id_txt, args['top_words'], pool, manifest,
+                                           args.get('top_docs', 100), args.get('compact'))
+        with profiled('transform_search'):
+            transform_search(project_name)
+        if args.get('sqlite', False):
+            with profiled('transform_sqlite'):
+                transform_sqlite(project_name)
+        else:
+            remove_sqlite(project_name)
+        with profiled('transform_topicSimilarity'):
+            transform_topicSimilarity(project_name, args['path_topic_tf'], topic_weights, args.get('similarity'))
+        if args.get('levels', False):
+            with profiled('transform_levels'):
+                transform_levels(project_name)
+        else:
+            remove_levels(project_name)
+        with profiled('compress_project'):
+            compress_project(project_name)
+    finally:
+        # the archives of the project are listed again for the next one
+        close_archives()
+
+
+# a comment line of a batch file, see read_batch
+BATCH_COMMENT = re.compile(r'\s*(#|//)')
+
+
+def read_batch(path_file):
+    """
+    Read a batch file, the list of the projects to build with --batch, e.g.
+
+        {"projects": [{"name": "FD2014",
+                       "path_doc": "2014.parsed", "path_meta": "2014.metadata",
+                       "doc_extension": ".reply.body.txt",
+                       "path_dtm": "2014/dtm", "path_ttm": "2014/ttm",
+                       "path_topic_tf": "2014/topic_flow.csv",
+                       "top_words": 20}]}
+
+    "path_topic_tf" and the options of the project, in the format of the
+    arguments of its manifest (see new_manifest), can be left out. Relative
+    paths are relative to the folder of the batch file. Lines starting with
+    "#" or "//" are comments.
+
+    Returns:
+        the list of projects, with absolute paths and names without spaces
+
+    Raises:
+        ValueError if a project misses a path, its paths don't exist, or two
+        projects have the same name
+    """
+    with open(path_file, 'r', encoding='utf-8') as file:
+        # comments are blanked out, so errors keep their line numbers
+        batch = json.loads(''.join('\n' if BATCH_COMMENT.match(line) else line for line in file))
+    if not isinstance(batch, dict) or not isinstance(batch.get('projects'), list):
+        raise ValueError('the batch file has no "projects" list')
+    path_base = os.path.dirname(os.path.abspath(path_file))
+    projects = []
+    for entry in batch['projects']:
+        missing = [key for key in ('name', 'path_doc', 'path_meta', 'doc_extension', 'path_dtm', 'path_ttm') if key not in entry]
+        if missing:
+            raise ValueError('project ' + str(entry.get('name', len(projects) + 1)) + ' has no ' + ', '.join(missing))
+        entry = dict(entry, name=entry['name'].replace(' ', '_'))
+        for key in ('path_doc', 'path_meta', 'path_dtm', 'path_ttm', 'path_topic_tf'):
+            if entry.get(key) is not None:
+                entry[key] = os.path.join(path_base, os.path.expanduser(entry[key]))
+        if not project_paths_exist(entry['path_doc'], entry['path_meta'], entry['path_dtm'], entry['path_ttm'], entry.get('path_topic_tf')):
+            raise ValueError('wrong path(s) for project ' + entry['name'])
+        if entry['name'] in [project['name'] for project in projects]:
+            raise ValueError('two projects are named ' + entry['name'])
+        projects.append(entry)
+    return projects
+
+
+def similarity_args(args, similarity=None):
+    """
+    Returns:
+        the options of the computed similarities, see
+        transform_topicSimilarity, of the command line, in place of the ones
+        in similarity if given
+    """
+    similarity = dict(similarity or {'measure': 'cosine', 'top_links': 3, 'min_similarity': 0})
+    if args.similarity is not None:
+        similarity['measure'] = args.similarity
+    if args.top_links is not None:
+        similarity['top_links'] = args.top_links or None
+    if args.min_similarity is not None:
+        similarity['min_similarity'] = args.min_similarity
+    return similarity
+
+
+def write_profile(project_name, command, workers, io_threads):
+    """
+    Write the report of the profiler of the run, if profiling, as
+    "data/<project>/profile.json". The CPU time of the stages is the one of
+    this process, it doesn't include the worker processes.
+    """
+    if profiler is None:
+        return
+    path_file = os.path.join(path_tf, 'data', project_name, 'profile.json')
+    profiler.write(path_file, project=project_name, command=command,
+                   workers=workers, io_threads=io_threads, cache=path_cache is not None)
+    print('Profile written to ' + path_file + '\n')
+
+
+def serve_args(path_tf, args):
+    """
+    Call serve with the server options of the command line.
+    """
+    if args.access_log is None:
+        serve(path_tf, args.port, args.bind)
+    else:
+        with open(args.access_log, 'a', buffering=1) as access_log:
+            serve(path_tf, args.port, args.bind, access_log)
 
 
 if __name__ == "__main__":
@@ -557,20 +3638,63 @@ if __name__ == "__main__":
                                      description = 'This script allows you to add PERCEIVE\'s topicflow R package output data into topicflowviz format and visualize it in localhost. Added projects can be later visualized using run.py, unless explicitly deleted.',
                                      epilog = 'Example of adding a new project: python run.py -a "FD2014" "/**/2014.parsed" "/**/2014.metadata" ".reply.body.txt" "/**/dtm" "/**/ttm" "/**/topic_flow.csv"')
     parser.add_argument('-a', '--add', type = str, nargs = '+',
-                        help = 'If adding a new project. Please specify all the following items, an example is provided for each item: [project name - "FD2014", path of document folder - "/**/2014.parsed", path of document metadata folder - "/**/2014.metadata", document extension - ".reply.body.txt", path of Document Topic Matrix folder - "/**/dtm", path of Topic Term Matrix folder - "/**/ttm", path of Topic Flow Similarity file - "/**/topic_flow.csv"], 7 items in total.')
+                        help = 'If adding a new project. Please specify all the following items, an example is provided for each item: [project name - "FD2014", path of document folder - "/**/2014.parsed", path of document metadata folder - "/**/2014.metadata", document extension - ".reply.body.txt", path of Document Topic Matrix folder - "/**/dtm", path of Topic Term Matrix folder - "/**/ttm", path of Topic Flow Similarity file - "/**/topic_flow.csv"], 7 items in total. The document and metadata folders can also be .zip or .tar(.gz) archives, which are read without extracting them. The Topic Flow Similarity file can be left out, the similarities are then computed from the Topic Term Matrixes, see --similarity.')
     parser.add_argument('-d', '--delete', type = str, nargs = '+',
                         help = 'Delete one or multiple existing projects. Specify the name(s) of the project(s) that should be deleted in double quotes. The base project "Full_Disclosure_2012" should not be deleted. Single deletion example: python run.py -d "FD2014". Multiple deletion example: python run.py -d "FD2014" "FD2015".')
     parser.add_argument('-s', '--show', help='Show existing projects',
                         action="store_true")
+    parser.add_argument('-u', '--update', type = str, nargs = '+',
+                        help = 'Update one or multiple existing projects after their input files changed, e.g. when a new month of data was added. Only the bins whose folders or matrix files changed are transformed again, the others are copied from the existing data. The paths the project was added with are used. Example: python run.py -u "FD2014".')
+    parser.add_argument('-b', '--batch', type = str, default = None,
+                        help = 'Add or update every project of a batch file, then exit without starting the server. The batch file is a JSON object whose "projects" list has one object per project with its "name", "path_doc", "path_meta", "doc_extension", "path_dtm", "path_ttm" and, optionally, "path_topic_tf", e.g. {"projects": [{"name": "FD2014", "path_doc": "2014.parsed", ...}]}. Relative paths are relative to the batch file. The options of the command line apply to every project, and a project can set its own in the format of its manifest.json, e.g. "top_words": 20. A project that was built before is updated. Example: python run.py -b nightly.json -j 0.')
+    parser.add_argument('-j', '--workers', type = int, default = 1,
+                        help = 'Number of processes that read and transform bins in parallel when adding or updating a project, 0 uses every core (default: 1). The output is the same for any number of workers.')
+    parser.add_argument('--io-threads', type = int, default = 8,
+                        help = 'Number of threads that read the documents of a bin when adding or updating a project (default: 8). More threads help on network file systems, where waiting for files takes most of the time.')
+    parser.add_argument('-w', '--top-words', type = int, default = None,
+                        help = 'Number of most frequent words kept for each topic when adding or updating a project (default: 10, or the number the project was added with).')
+    parser.add_argument('--top-docs', type = int, default = None,
+                        help = 'Number of most probable documents listed for each topic when adding or updating a project, 0 for all (default: 100, or the number the project was added with). The documents of every topic and the topics of every document are ranked when the project is added, instead of in the browser.')
+    parser.add_argument('-c', '--compact', action = argparse.BooleanOptionalAction, default = None,
+                        help = 'Write the ranked documents and topics of the bins, which the viewer loads, in a compact format when adding or updating a project: 4 decimals of every probability, stored as integers, and without the probabilities below 0.01. --no-compact keeps every probability again with -u.')
+    parser.add_argument('--precision', type = int, default = None,
+                        help = 'With --compact, number of decimals kept for each probability (default: 4).')
+    parser.add_argument('--min-prob', type = float, default = None,
+                        help = 'With --compact, leave out the probabilities below this threshold, 0 to keep every probability (default: 0.01).')
+    parser.add_argument('--dedup', action = argparse.BooleanOptionalAction, default = None,
+                        help = 'Write the blocks of text that documents repeat, e.g. quoted replies and signatures, once to a table of blocks when adding or updating a project, instead of in every document of Doc.js and of the document shards. Blocks repeated across bins are shared too, from their second appearance on. The viewer joins the blocks of a document when it is shown. --no-dedup writes every document in full again with -u.')
+    parser.add_argument('--sqlite', action = argparse.BooleanOptionalAction, default = None,
+                        help = 'Also write the bins, documents and topic models of the project into an indexed SQLite database, data/<project>/project.db, when adding or updating a project. The server then answers the JSON API of the project, api/<project>/..., and the viewer loads one page of documents at a time from it instead of the documents of whole bins. --no-sqlite removes the database with -u.')
+    parser.add_argument('--levels', action = argparse.BooleanOptionalAction, default = None,
+                        help = 'Also aggregate the bins of the project into quarters and years when adding or updating a project, data/<project>/Levels.js. The viewer then shows long projects by quarter or by year, zooms into a period to show its bins, and only loads the similarities of every bin when they are shown. --no-levels removes the levels with -u.')
+    parser.add_argument('--similarity', type = str, choices = SIMILARITY_MEASURES, default = None,
+                        help = 'Compute the similarities between the topics of adjacent bins from their Topic Term Matrixes with this measure, instead of reading them from the Topic Flow Similarity file, when adding or updating a project (default: cosine if no Topic Flow Similarity file is given).')
+    parser.add_argument('--top-links', type = int, default = None,
+                        help = 'With computed similarities, number of most similar topics of the next bin every topic is linked to, 0 for all (default: 3).')
+    parser.add_argument('--min-similarity', type = float, default = None,
+                        help = 'With computed similarities, topics less similar than this are not linked, e.g. 0.2 (default: 0).')
+    parser.add_argument('--profile', action = 'store_true',
+                        help = 'Write a report of the wall time, CPU time and peak memory of every stage when adding or updating a project, with the number of bins, documents and files processed and the documents skipped and why, to data/<project>/profile.json.')
+    parser.add_argument('--no-cache', action = 'store_true',
+                        help = 'Parse every metadata and matrix file when adding or updating a project, instead of loading the files parsed by previous runs from the "cache" directory.')
+    # the server options are accepted before and after "serve"
+    subparsers = parser.add_subparsers(dest = 'command', metavar = 'command')
+    parser_serve = subparsers.add_parser('serve', argument_default = argparse.SUPPRESS,
+                                         help = 'Only serve the existing projects, the same as running run.py without a command. Example: python run.py serve --bind 127.0.0.1 --port 8080.')
+    for server_parser in (parser, parser_serve):
+        server_parser.add_argument('--bind', type = str, default = '',
+                                   help = 'Address the server listens on, e.g. 127.0.0.1 (default: every interface).')
+        server_parser.add_argument('--port', type = int, default = 8000,
+                                   help = 'Port the server listens on, 0 for any free port (default: 8000).')
+        server_parser.add_argument('--access-log', type = str, default = None,
+                                   help = 'File the access log is appended to, with the status, the bytes sent and the time taken by every request (default: the terminal).')
     args = parser.parse_args()
+    if not args.no_cache:
+        path_cache = os.path.join(path_tf, 'cache')
 
     # show existing projects
     if args.show:
-        existing_projects = []
-        data_dir = os.path.join(path_tf, 'data')
-        for existing_project in os.listdir(data_dir):
-            if os.path.isdir(os.path.join(path_tf, 'data', existing_project)):
-                existing_projects.append(existing_project.replace('_', ' '))
+        existing_projects = [project['name'] for project in read_projects()['projects']]
         print('Existing projects:\n', existing_projects)
 
     # delete an existing project, if true, end the outer if.
@@ -584,61 +3708,145 @@ if __name__ == "__main__":
         elif len(args.delete) >= 1:
             print('Projects successfully deleted.')
     
-    # add a new project
-    elif args.add:
-        project_name = args.add[0]
-        path_doc = args.add[1]
-        path_meta = args.add[2]
-        doc_extension = args.add[3]
-        path_dtm = args.add[4]
-        path_ttm = args.add[5]
-        path_topic_tf = args.add[6]
-
-        # replace spaces in the project name with underlines
-        project_name = project_name.replace(' ', '_')
-
-        # change '~' to path 
-        path_doc = os.path.expanduser(path_doc)
-        path_meta = os.path.expanduser(path_meta)
-        path_dtm = os.path.expanduser(path_dtm)
-        path_ttm = os.path.expanduser(path_ttm)
-        path_topic_tf = os.path.expanduser(path_topic_tf)
-        
+    # build the projects of a batch file, and exit without serving them
+    elif args.batch:
+        try:
+            batch = read_batch(args.batch)
+        except (OSError, ValueError) as e:
+            sys.exit('Could not read the batch file ' + args.batch + ': ' + str(e))
+
+        # one pool of worker processes for the bins of every project
+        workers = args.workers if args.workers > 0 else os.cpu_count()
+        pool = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
         time_start = time.time()
-        
-        if os.path.isdir(path_doc) and os.path.isdir(path_meta) and os.path.isdir(path_dtm) and os.path.isdir(path_ttm) and os.path.isfile(path_topic_tf):
-            print('\nData transformation started...')
-            tweet_id_txt = transform_doc(project_name, path_doc, path_meta, doc_extension)
-            transform_bins(project_name, path_doc, path_meta, path_dtm, path_ttm, path_topic_tf, tweet_id_txt)
-            transform_topicSimilarity(project_name, path_topic_tf)
-            modify_html(project_name, path_tf)
-            modify_controller(project_name, path_tf)
-            print('\nTotal time taken:', str(round(time.time() - time_start, 2)), 'seconds.\n')
-        else:
-            print('\nData transformation failed because of wrong path(s) in the arguments, showing the existing projects...')
+        built, failed = [], []
+        try:
+            for project_ix, entry in enumerate(batch):
+                project_name = entry['name']
+                options = project_options(args, entry.get('path_topic_tf'))
+                options.update((key, entry[key]) for key in list(options) if key in entry)
+                manifest = new_manifest(project_name, entry['path_doc'], entry['path_meta'], entry['doc_extension'],
+                                        entry['path_dtm'], entry['path_ttm'], entry.get('path_topic_tf'), **options)
+                # a project built before is updated, only the bins whose
+                # input files changed are transformed again
+                previous = read_manifest(project_name)
+                if previous is not None:
+                    previous['args'] = manifest['args']
+                    manifest = previous
+                print('\nBuilding ' + project_name + ', project ' + str(project_ix + 1) + ' of ' + str(len(batch)) + '...')
+                profiler = Profiler() if args.profile else None
+                try:
+                    build_project(project_name, manifest, pool, args.io_threads)
+                except Exception:
+                    # the other projects are still built
+                    traceback.print_exc()
+                    print('\nBuilding ' + project_name + ' failed.')
+                    failed.append(project_name)
+                    continue
+                write_profile(project_name, 'batch', workers, args.io_threads)
+                built.append(project_name)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if built:
+            register_project(*built)
+        print('\n' + str(len(built)) + ' of ' + str(len(batch)) + ' projects built in', str(round(time.time() - time_start, 2)), 'seconds.')
+        if failed:
+            sys.exit('Failed projects: ' + ', '.join(failed))
+
+    # add a new project, or update existing ones
+    elif args.add or args.update:
+        # a pool of worker processes shared by the transformations
+        workers = args.workers if args.workers > 0 else os.cpu_count()
+        pool = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            if args.add:
+                project_name = args.add[0]
+                path_doc = args.add[1]
+                path_meta = args.add[2]
+                doc_extension = args.add[3]
+                path_dtm = args.add[4]
+                path_ttm = args.add[5]
+                path_topic_tf = args.add[6] if len(args.add) > 6 else None
+
+                # replace spaces in the project name with underlines
+                project_name = project_name.replace(' ', '_')
+
+                # change '~' to path 
+                path_doc = os.path.expanduser(path_doc)
+                path_meta = os.path.expanduser(path_meta)
+                path_dtm = os.path.expanduser(path_dtm)
+                path_ttm = os.path.expanduser(path_ttm)
+                if path_topic_tf is not None:
+                    path_topic_tf = os.path.expanduser(path_topic_tf)
+                
+                time_start = time.time()
+                
+                if project_paths_exist(path_doc, path_meta, path_dtm, path_ttm, path_topic_tf):
+                    print('\nData transformation started...')
+                    profiler = Profiler() if args.profile else None
+                    manifest = new_manifest(project_name, path_doc, path_meta, doc_extension, path_dtm, path_ttm, path_topic_tf,
+                                            **project_options(args, path_topic_tf))
+                    build_project(project_name, manifest, pool, args.io_threads)
+                    with profiled('register_project'):
+                        register_project(project_name)
+                    print('\nTotal time taken:', str(round(time.time() - time_start, 2)), 'seconds.\n')
+                    write_profile(project_name, 'add', workers, args.io_threads)
+                else:
+                    print('\nData transformation failed because of wrong path(s) in the arguments, showing the existing projects...')
+
+            # update existing projects with the paths they were added with
+            else:
+                for arg_update in args.update:
+                    project_name = arg_update.replace(' ', '_')
+                    manifest = read_manifest(project_name)
+                    if manifest is None:
+                        print('\nProject ' + arg_update + ' has no manifest.json, add it again with -a to be able to update it.')
+                        continue
+                    if args.top_words is not None:
+                        manifest['args']['top_words'] = args.top_words
+                    if args.top_docs is not None:
+                        manifest['args']['top_docs'] = args.top_docs or None
+                    # -c switches the project to the compact ranks, --precision
+                    # and --min-prob change the options of the format, and
+                    # --no-compact switches it off
+                    compact = manifest['args'].get('compact')
+                    if args.compact is False:
+                        manifest['args']['compact'] = None
+                    elif args.compact or compact is not None:
+                        manifest['args']['compact'] = compact_args(args, compact)
+                    # --dedup switches the project to shared blocks of text,
+                    # --sqlite adds its database, --levels its quarters and
+                    # years, and --no-dedup, --no-sqlite and --no-levels
+                    # switch them off. The project keeps them otherwise
+                    for option in ('dedup', 'sqlite', 'levels'):
+                        if getattr(args, option) is not None:
+                            manifest['args'][option] = getattr(args, option)
+                    # --similarity switches the project to computed similarities,
+                    # --top-links and --min-similarity change how topics are linked
+                    similarity = manifest['args'].get('similarity')
+                    if args.similarity or similarity is not None:
+                        similarity = similarity_args(args, similarity)
+                        manifest['args']['similarity'] = similarity
+
+                    time_start = time.time()
+                    print('\nUpdating ' + project_name + '...')
+                    profiler = Profiler() if args.profile else None
+                    build_project(project_name, manifest, pool, args.io_threads)
+                    # projects added before the registry existed are registered
+                    with profiled('register_project'):
+                        register_project(project_name)
+                    print('\nTotal time taken:', str(round(time.time() - time_start, 2)), 'seconds.\n')
+                    write_profile(project_name, 'update', workers, args.io_threads)
+        finally:
+            if pool is not None:
+                pool.shutdown()
 
 
         ### INVOKE SERVER
-        PORT = np.random.randint(9000, 10000)
-
-        # change the working directory to topicflow
-        os.chdir(path_tf)
-
-        Handler = http.server.SimpleHTTPRequestHandler
-
-        with socketserver.TCPServer(("", PORT), Handler) as httpd:
-            print("serving at port", PORT)
-            httpd.serve_forever()
+        serve_args(path_tf, args)
 
     else:
         ### INVOKE SERVER
-        PORT = np.random.randint(9000, 10000)
-
-        # change the working directory to topicflow
-        os.chdir(path_tf)
-
-        Handler = http.server.SimpleHTTPRequestHandler
-
-        with socketserver.TCPServer(("", PORT), Handler) as httpd:
-            print("serving at port", PORT)
-            httpd.serve_forever()
\ No newline at end of file
+        serve_args(path_tf, args)
\ No newline at end of file
@@ -18,11 +18,74 @@ Bin.prototype.wrap = function(bin) {
 	return this.tm.topics;
 }
 
+/**
+ * Method to wrap the entry of a bin in a project index. Only the top words
+ * of the topics are known until the bin is loaded.
+ * @param entry  the entry of the bin
+ * @param path  the path of the project data
+ */
+Bin.prototype.wrapIndex = function(entry, path) {
+	this.id = entry.bin_id;
+	this.start = entry.start_time;
+	this.end = entry.end_time;
+	this.first_id = entry.first_id;
+	this.last_id = entry.last_id;
+	this.rank_url = entry.rank === undefined ? undefined : path + entry.rank;
+	this.doc_url = path + entry.doc;
+	tm = new TopicModel();
+	tm.wrap({topic_word: entry.topic_word, topic_doc: {}, doc_topic: {}});
+	this.tm = tm;
+
+	return this.tm.topics;
+}
+
+/**
+ * Method to load the ranked documents and topics of a bin read from a project
+ * index, they are all the visualization needs of its topic model.
+ * @returns a promise resolved once the ranks are loaded
+ */
+Bin.prototype.loadTopicModel = function() {
+	var bin = this;
+	if (!this.tm_request) {
+		this.tm_request = this.rank_url === undefined ? $.when() : dataLoader.loadJSON(this.rank_url, "ranks").done(function(data) {
+			bin.tm.wrapRanks(data);
+		});
+	}
+	return this.tm_request;
+}
+
+/**
+ * Method to load the tweets of a bin read from a project index.
+ * @returns a promise resolved once the tweets are loaded
+ */
+Bin.prototype.loadTweets = function() {
+	var bin = this;
+	if (!this.doc_request) {
+		this.doc_request = this.doc_url === undefined ? $.when() : $.when(dataLoader.loadJSON(this.doc_url), loadBlocks()).done(function(docs, blocks) {
+			// skip the tweets of a data set that is no longer shown
+			if (bins[bin.id] === bin) readTweetJSON(docs, blocks);
+		});
+	}
+	return this.doc_request;
+}
+
+/**
+ * Method to load the topic model and the tweets of a bin read from a project index.
+ * @returns a promise resolved once both are loaded
+ */
+Bin.prototype.load = function() {
+	return $.when(this.loadTopicModel(), this.loadTweets());
+}
+
 Bin.prototype.getTopic = function(id) {
 	return this.tm.getTopic(id);
 }
 
 Bin.prototype.hasTweet = function(id) {
+	// the tweets of a bin read from a project index are numbered consecutively
+	if (this.first_id !== undefined) {
+		return this.first_id !== null && Number(id) >= this.first_id && Number(id) <= this.last_id;
+	}
 	for (var i=0; i<this.tweets.length; i++) {
 		var t_id = this.tweets[i];
 		if (id===t_id.toString()) {
@@ -34,4 +97,8 @@ Bin.prototype.hasTweet = function(id) {
 
 Bin.prototype.getTopicsForTweet = function(id) {
 	return this.tm.getTopicsForDocument(id);
+}
+
+Bin.prototype.getRankedTopicsForTweet = function(id) {
+	return this.tm.getRankedTopicsForDocument(id);
 }
\ No newline at end of file
@@ -0,0 +1,101 @@
+/**
+ * Loads the data files of projects in a Web Worker, see DataWorker.js, so the
+ * page keeps responding and shows the progress while they are downloaded and
+ * decoded. The files are loaded by the page itself when the browser can't
+ * run the worker, e.g. for a page opened from the disk.
+ * @param url  the URL of DataWorker.js
+ */
+function DataLoader(url) {
+	var loader = this;
+	this.requests = new Object(); // the pending requests by id
+	this.next_id = 0;
+	try {
+		this.worker = new Worker(url);
+	} catch (e) {
+		this.worker = null;
+		return;
+	}
+	this.worker.onmessage = function(event) {
+		loader.receive(event.data);
+	};
+	// the worker script could not be loaded, load the files on the page instead
+	this.worker.onerror = function(event) {
+		event.preventDefault();
+		loader.worker = null;
+		var pending = loader.requests;
+		loader.requests = new Object();
+		$.each(pending, function(id, request) {
+			loader.fallback(request.message).done(request.deferred.resolve).fail(request.deferred.reject);
+		});
+	};
+}
+
+/**
+ * Method to send a request to the worker.
+ * @param message  the request, see DataWorker.js
+ * @returns a promise resolved with the result, notified with the number of
+ * bytes loaded and the size of the file (0 if unknown) while it downloads
+ */
+DataLoader.prototype.request = function(message) {
+	if (!this.worker) return this.fallback(message);
+	var deferred = $.Deferred();
+	message.id = this.next_id++;
+	this.requests[message.id] = {message: message, deferred: deferred};
+	this.worker.postMessage(message);
+	return deferred.promise();
+}
+
+/**
+ * Method to handle an answer of the worker.
+ * @param data  the answer, see DataWorker.js
+ */
+DataLoader.prototype.receive = function(data) {
+	var request = this.requests[data.id];
+	if (!request) return;
+	if (data.loaded !== undefined) {
+		request.deferred.notify(data.loaded, data.total);
+		return;
+	}
+	delete this.requests[data.id];
+	if (data.error !== undefined) request.deferred.reject(data.error);
+	else request.deferred.resolve(data.result);
+}
+
+/**
+ * Method to load a file on the page, when there is no worker.
+ * @param message  the request, see DataWorker.js
+ * @returns a promise resolved with the result
+ */
+DataLoader.prototype.fallback = function(message) {
+	if (message.type === "script") {
+		// let the browser cache the files, the server revalidates them
+		return $.ajax({url: message.url, dataType: "script", cache: true}).then(function() {
+			return {populate: message.populate};
+		});
+	}
+	// the viewer reads the shards without decoding them
+	return $.getJSON(message.url).then(function(data) { return data; });
+}
+
+/**
+ * Method to load a data file of a project, e.g. Doc.js.
+ * @param url  the URL of the file
+ * @param populate  the name of the populate function of the file
+ * @returns a promise resolved with the name of the read function, e.g.
+ * readTweetJSON ("reader"), and its arguments ("args"), or with the name of
+ * the populate function to call ("populate") if the file was run on the page
+ */
+DataLoader.prototype.loadScript = function(url, populate) {
+	return this.request({type: "script", url: url, populate: populate});
+}
+
+/**
+ * Method to load a shard of a project.
+ * @param url  the URL of the shard
+ * @param decode  "ranks" for a ranks shard, "map" for a graph of topics, e.g. a
+ * window of Levels.js, optional
+ * @returns a promise resolved with the shard
+ */
+DataLoader.prototype.loadJSON = function(url, decode) {
+	return this.request({type: "json", url: url, decode: decode});
+}
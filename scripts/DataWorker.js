@@ -0,0 +1,176 @@
+/**
+ * The Web Worker that downloads and decodes the data files of projects, see
+ * DataLoader. The page only receives the decoded data, the JSON of the files
+ * is parsed here, and the arrays of numbers of the ranks and the layout are
+ * sent as typed arrays, whose buffers are moved to the page without copying.
+ * The page still builds the Bin, TopicModel and Tweet objects of the viewer
+ * from the decoded data: objects sent by a worker lose their methods.
+ *
+ * A message is a request {id, type, url}: "script" requests run a data file
+ * of a project and call its function "populate", "json" requests parse a
+ * shard and decode it as "decode" says ("ranks", "map", or nothing). The
+ * answers are {id, loaded, total} while the file downloads, then {id, result}
+ * or {id, error}.
+ */
+
+var result = null; // the data read by the populate function of a data file
+
+self.onmessage = function(event) {
+	var message = event.data;
+	download(message, function(text) {
+		var transfer = [];
+		var data;
+		if (message.type === "script") {
+			data = runScript(text, message.populate, transfer);
+		} else {
+			data = JSON.parse(text);
+			if (message.decode === "ranks") data = decodeRanks(data, transfer);
+			if (message.decode === "map" && data.layout) data.layout = decodeLayout(data.layout, transfer);
+		}
+		self.postMessage({id: message.id, result: data}, transfer);
+	});
+}
+
+/**
+ * Method to download a file, reporting the progress to the page.
+ * @param message  the request
+ * @param done  the function called with the text of the file
+ */
+function download(message, done) {
+	var xhr = new XMLHttpRequest();
+	xhr.open("GET", message.url);
+	xhr.onprogress = function(event) {
+		self.postMessage({id: message.id, loaded: event.loaded, total: event.lengthComputable ? event.total : 0});
+	};
+	xhr.onload = function() {
+		if (xhr.status < 200 || xhr.status >= 300 && xhr.status != 304) {
+			self.postMessage({id: message.id, error: message.url + ": " + xhr.status + " " + xhr.statusText});
+			return;
+		}
+		try {
+			done(xhr.responseText);
+		} catch (e) {
+			self.postMessage({id: message.id, error: message.url + ": " + e});
+		}
+	};
+	xhr.onerror = function() {
+		self.postMessage({id: message.id, error: message.url + ": the file could not be downloaded"});
+	};
+	xhr.send();
+}
+
+/**
+ * Method to run a data file of a project, e.g. Doc.js, whose populate function
+ * passes its data to one of the read functions below.
+ * @param text  the text of the data file
+ * @param populate  the name of the populate function of the file
+ * @param transfer  the array of buffers to move to the page
+ * @returns the name of the read function of the page ("reader") and its arguments ("args")
+ */
+function runScript(text, populate, transfer) {
+	var url = URL.createObjectURL(new Blob([text], {type: "text/javascript"}));
+	try {
+		importScripts(url);
+	} finally {
+		URL.revokeObjectURL(url);
+	}
+	result = null;
+	self[populate]();
+	// the function holds the data of the file
+	self[populate] = null;
+	if (result.reader === "readSimilarityJSON" && result.args[0].layout) {
+		result.args[0].layout = decodeLayout(result.args[0].layout, transfer);
+	}
+	if (result.reader === "readLevelsJSON") {
+		var levels = result.args[0].levels;
+		for (var i = 0; i < levels.length; i++) {
+			if (levels[i].layout) levels[i].layout = decodeLayout(levels[i].layout, transfer);
+		}
+	}
+	return result;
+}
+
+function readTweetJSON(tweet_data, block_data) {
+	result = {reader: "readTweetJSON", args: [tweet_data, block_data]};
+}
+
+function readBinJSON(bin_data) {
+	result = {reader: "readBinJSON", args: [bin_data]};
+}
+
+function readIndexJSON(index_data) {
+	result = {reader: "readIndexJSON", args: [index_data]};
+}
+
+function readSimilarityJSON(sim_data) {
+	result = {reader: "readSimilarityJSON", args: [sim_data]};
+}
+
+function readLevelsJSON(levels_data) {
+	result = {reader: "readLevelsJSON", args: [levels_data]};
+}
+
+/**
+ * Method to store the tweet ids, topics and probabilities of the ranks of a
+ * bin, see TopicModel.wrapRanks, in typed arrays. The probabilities of the
+ * compact format are divided by its scale.
+ * @param ranks  the ranks json object
+ * @param transfer  the array of buffers to move to the page
+ * @returns the ranks json object
+ */
+function decodeRanks(ranks, transfer) {
+	var dt = ranks.doc_topics;
+	var scale = ranks.scale || 1;
+	dt.doc_ids = typedArray(Int32Array, dt.doc_ids, transfer);
+	dt.topics = typedArray(Int32Array, dt.topics, transfer);
+	dt.probs = unscale(typedArray(Float64Array, dt.probs, transfer), scale);
+	if (dt.offsets) dt.offsets = typedArray(Int32Array, dt.offsets, transfer);
+	for (var t in ranks.topic_docs) {
+		var docs = ranks.topic_docs[t];
+		docs.ids = typedArray(Int32Array, docs.ids, transfer);
+		docs.probs = unscale(typedArray(Float64Array, docs.probs, transfer), scale);
+	}
+	ranks.scale = 1;
+	return ranks;
+}
+
+/**
+ * Method to divide the probabilities of the compact format by their scale.
+ * @param probs  the Float64Array of the probabilities, divided in place
+ * @param scale  the scale of the probabilities
+ * @returns the probabilities
+ */
+function unscale(probs, scale) {
+	if (scale !== 1) {
+		for (var i = 0; i < probs.length; i++) probs[i] /= scale;
+	}
+	return probs;
+}
+
+/**
+ * Method to store the positions of the layout of the topics, see
+ * topicflow.load, in typed arrays.
+ * @param layout  the layout json object
+ * @param transfer  the array of buffers to move to the page
+ * @returns the layout json object
+ */
+function decodeLayout(layout, transfer) {
+	var keys = ["x", "y", "dy", "link_dy", "link_sy", "link_ty"];
+	for (var i = 0; i < keys.length; i++) {
+		layout[keys[i]] = typedArray(Float64Array, layout[keys[i]], transfer);
+	}
+	return layout;
+}
+
+/**
+ * Method to copy an array of numbers into a typed array.
+ * @param type  the type of the typed array, e.g. Float64Array
+ * @param values  the array
+ * @param transfer  the array of buffers to move to the page
+ * @returns the typed array
+ */
+function typedArray(type, values, transfer) {
+	var array = new type(values);
+	transfer.push(array.buffer);
+	return array;
+}
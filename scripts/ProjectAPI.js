@@ -0,0 +1,90 @@
+/**
+ * The JSON API of a project with a database, see api_response in run.py. The
+ * tweets of the project are loaded one page at a time from it, instead of
+ * with the shards of their bins.
+ * @param url  the URL of the API of the project
+ */
+function ProjectAPI(url) {
+	this.url = url;
+}
+
+/**
+ * Method to request the API.
+ * @param path  the request, e.g. "docs/1/topics"
+ * @param params  the query parameters, optional
+ * @returns a promise resolved with the answer
+ */
+ProjectAPI.prototype.get = function(path, params) {
+	return $.getJSON(this.url + path, params);
+}
+
+/**
+ * Method to read the tweets of a page of the API, unless another data set
+ * was selected in the meantime.
+ * @param page  the page
+ */
+ProjectAPI.prototype.readTweets = function(page) {
+	if (projectAPI === this) readTweetJSON(page.items);
+}
+
+/**
+ * Method to load the tweets with ids from first to last that aren't loaded yet.
+ * @returns a promise resolved once the tweets are loaded
+ */
+ProjectAPI.prototype.loadTweets = function(first, last) {
+	var api = this;
+	// the tweet ids of a project are consecutive from 1
+	while (first <= last && tweets[first]) first++;
+	while (last >= first && tweets[last]) last--;
+	if (first > last) return $.when();
+	var requests = [];
+	for (var start = first; start <= last; start += 1000) {
+		requests.push(this.get("docs", {offset: start - 1, limit: Math.min(1000, last - start + 1)}).done(function(page) {
+			api.readTweets(page);
+		}));
+	}
+	return $.when.apply($, requests);
+}
+
+/**
+ * Method to load the tweets with the given ids that aren't loaded yet.
+ * @param ids  at most 1000 tweet ids
+ * @returns a promise resolved once the tweets are loaded
+ */
+ProjectAPI.prototype.loadTweetsById = function(ids) {
+	var api = this;
+	var missing = $.grep(ids, function(id) { return !tweets[id]; });
+	if (missing.length == 0) return $.when();
+	return this.get("docs", {ids: missing.join(","), limit: missing.length}).done(function(page) {
+		api.readTweets(page);
+	});
+}
+
+/**
+ * Method to load the most probable tweets of a topic, once, see Topic.getRankedDocs.
+ * @param topic  the topic object
+ * @returns a promise resolved once the tweets are loaded
+ */
+ProjectAPI.prototype.loadTopicDocs = function(topic) {
+	var api = this;
+	if (topic.ranked_docs) return $.when();
+	return this.get("topics/" + encodeURIComponent(topic.id) + "/docs", {limit: 100}).done(function(page) {
+		api.readTweets(page);
+		topic.ranked_docs = {
+			ids: $.map(page.items, function(doc) { return doc.tweet_id; }),
+			probs: $.map(page.items, function(doc) { return doc.prob; })
+		};
+	});
+}
+
+/**
+ * Method to get the topics of a tweet from the most to the least probable.
+ * @param id  the tweet id
+ * @returns a promise resolved with an array of objects with the name ("text")
+ * and P(topic|doc) ("value") of every topic, see getRankedTopicsForDocument
+ */
+ProjectAPI.prototype.getTopicsForTweet = function(id) {
+	return this.get("docs/" + id + "/topics", {limit: 1000}).then(function(page) {
+		return $.map(page.items, function(topic) { return {text: topic.topic, value: topic.prob}; });
+	});
+}
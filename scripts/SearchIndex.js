@@ -0,0 +1,108 @@
+/**
+ * The search index of a project, see transform_search in run.py. The shards
+ * of the index are loaded when the terms of a query are in them.
+ * @param path  the path of the project data
+ */
+function SearchIndex(path) {
+	this.path = path + "search/";
+	this.shards = new Object();
+	this.requests = new Object();
+}
+
+/**
+ * Method to load the description of the index, once.
+ * @returns a promise resolved with the description
+ */
+SearchIndex.prototype.loadInfo = function() {
+	if (!this.info_request) {
+		this.info_request = $.getJSON(this.path + "index.json");
+	}
+	return this.info_request;
+}
+
+/**
+ * Method to load a shard of the index, once.
+ * @param ix  the number of the shard
+ * @returns a promise resolved once the shard is loaded
+ */
+SearchIndex.prototype.loadShard = function(ix) {
+	var index = this;
+	if (!this.requests[ix]) {
+		this.requests[ix] = $.getJSON(this.path + ix + ".json").done(function(data) {
+			index.shards[ix] = data;
+		});
+	}
+	return this.requests[ix];
+}
+
+/**
+ * Method to search the topics and the documents of the project.
+ *
+ * Topics with every term of the query in their top words are scored by the
+ * sum of the probabilities of the terms, documents with any term of the query
+ * by the sum of the weights of the terms.
+ * @param query  the query
+ * @returns a promise resolved with the scores of the topics by topic id
+ * ("topics"), and the [tweet id, score] pairs of the documents from the best
+ * to the worst match ("docs")
+ */
+SearchIndex.prototype.search = function(query) {
+	var index = this;
+	var terms = searchTerms(query);
+	return this.loadInfo().then(function(info) {
+		var requests = $.map(terms, function(term) {
+			return index.loadShard(searchShard(term, info.shards));
+		});
+		return $.when.apply($, requests).then(function() {
+			var matches = new Object();
+			var topics = new Object();
+			var docs = new Object();
+			$.each(terms, function(i, term) {
+				var entry = index.shards[searchShard(term, info.shards)][term] || {};
+				$.each(entry.topics || [], function(j, topic) {
+					matches[topic] = (matches[topic] || 0) + 1;
+					topics[topic] = (topics[topic] || 0) + entry.topic_probs[j];
+				});
+				$.each(entry.docs || [], function(j, doc) {
+					docs[doc] = (docs[doc] || 0) + entry.weights[j];
+				});
+			});
+			for (var topic in matches) {
+				if (matches[topic] < terms.length) delete topics[topic];
+			}
+			var ranked = [];
+			for (var doc in docs) {
+				ranked.push([Number(doc), docs[doc]]);
+			}
+			ranked.sort(function(a, b) { return b[1] - a[1] || a[0] - b[0]; });
+			return {topics: topics, docs: ranked};
+		});
+	});
+}
+
+/**
+ * Method to split a query into the terms of the search index, see tokenize in run.py.
+ * @param query  the query
+ * @returns the distinct terms of the query
+ */
+function searchTerms(query) {
+	var terms = [];
+	$.each(query.toLowerCase().match(/[a-z0-9]+/g) || [], function(i, term) {
+		if (term.length > 1 && terms.indexOf(term) == -1) terms.push(term);
+	});
+	return terms;
+}
+
+/**
+ * Method to find the shard of the search index that holds a term, see search_shard in run.py.
+ * @param term  the term
+ * @param shards  the number of shards of the index
+ * @returns the number of the shard
+ */
+function searchShard(term, shards) {
+	var h = 0;
+	for (var i = 0; i < term.length; i++) {
+		h = (h * 31 + term.charCodeAt(i)) % 4294967296;
+	}
+	return h % shards;
+}
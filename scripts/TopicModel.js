@@ -23,10 +23,65 @@ TopicModel.prototype.wrap = function(tm) {
 	this.populateTopics();
 }
 
+/**
+ * Method to add the ranked documents of every topic and the ranked topics of
+ * every document of a bin to a topic model that was wrapped with its top
+ * words only, keeping the same topic objects.
+ * @param ranks  the ranks json object
+ */
+TopicModel.prototype.wrapRanks = function(ranks) {
+	// the compact format stores the probabilities as integers, which the
+	// worker divides by their scale, see DataWorker.js
+	if (ranks.scale && ranks.scale !== 1) {
+		var lists = [ranks.doc_topics.probs];
+		for (var t in ranks.topic_docs) lists.push(ranks.topic_docs[t].probs);
+		for (var l = 0; l < lists.length; l++) {
+			for (var i = 0; i < lists[l].length; i++) lists[l][i] /= ranks.scale;
+		}
+		ranks.scale = 1;
+	}
+	this.ranks = ranks;
+	this.rank_rows = new Object();
+	for (var i = 0; i < ranks.doc_topics.doc_ids.length; i++) {
+		this.rank_rows[ranks.doc_topics.doc_ids[i]] = i;
+	}
+	for (var t in this.topics) {
+		this.topics[t].ranked_docs = ranks.topic_docs[t];
+	}
+}
+
 TopicModel.prototype.getTopicsForDocument = function(doc) {
 	return this.doc_topics[doc];
 }
 
+/**
+ * Method to get the topics of a document from the most to the least probable.
+ * @param doc  the tweet id of the document
+ * @returns an array of objects with the name ("text") and P(topic|doc) ("value") of every topic
+ */
+TopicModel.prototype.getRankedTopicsForDocument = function(doc) {
+	var data = new Array();
+	if (this.ranks) {
+		var row = this.rank_rows[doc];
+		if (row === undefined) return data;
+		var names = this.ranks.topic_prob;
+		var dt = this.ranks.doc_topics;
+		// the compact format lists the topics of a document from its offset
+		var start = dt.offsets ? dt.offsets[row] : row * names.length;
+		var end = dt.offsets ? dt.offsets[row+1] : (row+1) * names.length;
+		for (var j = start; j < end; j++) {
+			data.push({text:names[dt.topics[j]], value:dt.probs[j]});
+		}
+		return data;
+	}
+	var tmp_topics = this.getTopicsForDocument(doc);
+	for (var t in tmp_topics) {
+		data.push({text:t, value:tmp_topics[t]});
+	}
+	data.sort(function(a, b) { return b.value - a.value; });
+	return data;
+}
+
 
 function Topic(id, top_words, top_docs) {
 	this.id = id;
@@ -69,4 +124,23 @@ Topic.prototype.getTopWords = function() {
 
 Topic.prototype.getTopDocs = function() {
 	return this.top_docs;
+}
+
+/**
+ * Method to get the documents of the topic from the most to the least probable.
+ * @returns an array of [tweet id, P(topic|doc)] pairs
+ */
+Topic.prototype.getRankedDocs = function() {
+	var sortable = [];
+	if (this.ranked_docs) {
+		for (var i = 0; i < this.ranked_docs.ids.length; i++) {
+			sortable.push([this.ranked_docs.ids[i], this.ranked_docs.probs[i]]);
+		}
+		return sortable;
+	}
+	for (var tweet in this.top_docs) {
+		sortable.push([tweet, this.top_docs[tweet]]);
+	}
+	sortable.sort(function(a,b){return b[1]-a[1]});
+	return sortable;
 }
\ No newline at end of file
@@ -7,4 +7,7 @@ function TopicSimilarityMap() {
 TopicSimilarityMap.prototype.wrap = function(tsm) {
 	this.links = tsm.links;
 	this.nodes = tsm.nodes;
+	this.layout = tsm.layout;
+	// the periods of the columns of a level, see readLevelsJSON
+	this.periods = tsm.periods;
 }
\ No newline at end of file
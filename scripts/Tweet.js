@@ -8,12 +8,31 @@ function Tweet(id, text, author, date) {
 /**
  * Method to wrap a tweet json object. 
  * @param tweet
+ * @param blocks  the table of repeated blocks of text its text refers to, optional
  * @returns
  */
-Tweet.prototype.wrap = function(tweet) {
+Tweet.prototype.wrap = function(tweet, blocks) {
 	this.text = tweet.text;
+	this.blocks = blocks;
 	this.author = tweet.author;
 	this.id = tweet.tweet_id;
 	this.date = tweet.tweet_date;
 }
 
+
+/**
+ * Method to get the text of the tweet. A text that refers to repeated blocks
+ * of text, see dedup_blocks in run.py, is joined the first time it's shown.
+ * @returns the text
+ */
+Tweet.prototype.getText = function() {
+	if (typeof this.text !== "string") {
+		var text = "";
+		for (var i = 0; i < this.text.length; i++) {
+			text += typeof this.text[i] === "string" ? this.text[i] : this.blocks[this.text[i]];
+		}
+		this.text = text;
+		this.blocks = undefined;
+	}
+	return this.text;
+}
@@ -2,6 +2,19 @@ var tweets = new Object();
 var topics = new Object();
 var bins = new Array();
 var similarityMap = new Object();
+var projects = new Object(); // the projects of the registry by id
+var selectedProject;
+var tweetCount = 0; // number of tweets of a project read from an index
+var searchIndex = null; // the search index of a project read from an index
+var blockUrl = null; // the table of repeated blocks of text of a project read from an index
+var blockRequest = null;
+var projectAPI = null; // the JSON API of a project with a database, see ProjectAPI
+var dataLoader = null; // loads the data files of projects, see DataLoader
+var levels = null; // the quarters and years of a project, see readLevelsJSON
+var levelMaps = new Object(); // the requests of the graphs of the levels and of their windows, see loadLevelMap
+var shownLevel = null; // the level shown by the visualization, see showLevel
+var topicNodes = null; // the name of the node that draws every topic shown by the visualization, see showMap
+var LEVEL_COLUMNS = 24; // the most periods a project with levels is shown with at first
 var svg_width;
 var svg_height;
 
@@ -37,8 +50,10 @@ function drawViz() {
 
 	topicflow
 	      .nodes(similarityMap.nodes)
-	      .links(similarityMap.links)
-	      .layout(0);
+	      .links(similarityMap.links);
+	// place the topics where the pipeline placed them, if it did
+	if (similarityMap.layout) topicflow.load(similarityMap.layout);
+	else topicflow.layout(0);
 
 	  var link = svg.append("g").selectAll(".link")
 	      .data(similarityMap.links)
@@ -55,7 +70,9 @@ function drawViz() {
  			    $("#similarity_holder").fadeIn();
 			    var w = 200;
 				var h = $("#similarity_holder").height();
-			    showTopicSimilarity_bar(d.source.name, d.target.name, w);
+			    // the link of two threads of topics compares their linked topics
+			    var names = d.topics || [d.source.name, d.target.name];
+			    showTopicSimilarity_bar(names[0], names[1], w);
 				positionTopicSimilarity(2*w,h);
 	      })
 		  .on("mouseover",function(l) {
@@ -90,15 +107,19 @@ function drawViz() {
 				return "node " + type;})
 	    .attr("transform", function(d) { return "translate(" + d.x + "," + d.y + ")"; })
 	    .on("click", function(n) {
-	    	showTopicData(n.name);
+	    	// a topic of a quarter or a year zooms into its period
+	    	if (n.topics) zoomIn(n.name);
+	    	else showTopicData(n.name);
 	    })
 		.on("mouseover",function(n) {
-			// Find the bin containing the topic
-		  	var id = n.name;
+			// Find the bin containing the topic, the heaviest topic of the
+			// thread of topics of a quarter or a year
+		  	var id = n.topics ? n.topics[0] : n.name;
 			var b = id.split("_")[0];
 			var tmp = bins[b].getTopic(id);
 
-			tooltip.show("Topic " + n.name + ":<br/>" + tmp.getHTMLSummary());
+			var title = n.topics ? "Topics " + n.topics.join(", ") : "Topic " + n.name;
+			tooltip.show(title + ":<br/>" + tmp.getHTMLSummary());
 			})
 		.on("mouseout",function() {tooltip.hide();});
 
@@ -107,8 +128,10 @@ function drawViz() {
 	      .attr("width", topicflow.nodeWidth())
 		  .attr("class","node_rect");
 		// CREATE X AXIS
-	  	var end = bins[bins.length-1].start.split(/[/ :]/);
-	  	var start = bins[0].start.split(/[/ :]/);
+		// the columns of a level or of a window are its periods, the bins otherwise
+		var periods = similarityMap.periods;
+	  	var end = (periods ? periods[periods.length-1].start_time : bins[bins.length-1].start).split(/[/ :]/);
+	  	var start = (periods ? periods[0].start_time : bins[0].start).split(/[/ :]/);
 	  	var min = Date.UTC(start[2],start[0]-1,start[1], start[3], start[4]);
 	  	var max = Date.UTC(end[2],end[0]-1,end[1], end[3], end[4]);
 	  	var xScale = d3.time.scale.utc()
@@ -229,16 +252,232 @@ function readBinJSON(bin_data) {
 
 /**
  * Method to read the JSON for tweets.
+ * @param tweet_data
+ * @param block_data  the table of repeated blocks of text of the tweets, optional
  * @returns {Object}
  */
-function readTweetJSON(tweet_data) {
+function readTweetJSON(tweet_data, block_data) {
 	$.each(tweet_data, function(i, tweet) {
 		tmp = new Tweet();
-		tmp.wrap(tweet);
+		tmp.wrap(tweet, block_data);
 		tweets[tmp.id] = tmp;
 	});
 }
 
+/**
+ * Method to read the JSON index of a project. The topic models and tweets of
+ * its bins are loaded when they are needed.
+ * @param index_data
+ */
+function readIndexJSON(index_data) {
+	$.each(index_data.bins, function(i, entry) {
+		tmp = new Bin();
+		var tmp_topics = tmp.wrapIndex(entry, index_data.path);
+		for (topic in tmp_topics) {
+			topics[topic] = tmp_topics[topic];
+		}
+		bins.push(tmp);
+	});
+	tweetCount = index_data.tweet_count;
+	searchIndex = new SearchIndex(index_data.path);
+	blockUrl = index_data.blocks === undefined ? null : index_data.path + index_data.blocks;
+	blockRequest = null;
+}
+
+/**
+ * Method to load the table of repeated blocks of text of a project read from
+ * an index, once.
+ * @returns a promise resolved with the table, or null if the project has none
+ */
+function loadBlocks() {
+	if (!blockRequest) {
+		blockRequest = blockUrl === null ? $.when(null) : dataLoader.loadJSON(blockUrl);
+	}
+	return blockRequest;
+}
+
+/**
+ * Method to read the JSON of the levels of a project, its quarters and years,
+ * see transform_levels in run.py. The graph of the bins of the project is
+ * loaded when they are shown, see loadLevelMap.
+ * @param levels_data
+ */
+function readLevelsJSON(levels_data) {
+	levels = levels_data;
+	levelMaps = new Object();
+}
+
+/**
+ * Method to get a level of a project with levels.
+ * @param name  "quarter" or "year"
+ * @returns the level
+ */
+function getLevel(name) {
+	for (var i = 0; i < levels.levels.length; i++) {
+		if (levels.levels[i].name === name) return levels.levels[i];
+	}
+}
+
+/**
+ * Method to load the graph of a level of a project with levels, or of the
+ * window of a period of a level, once.
+ * @param name  "bin", "quarter" or "year"
+ * @param within  the level and the index of the period of the window, e.g. ["year", 1], optional
+ * @returns a promise resolved with the graph, a TopicSimilarityMap
+ */
+function loadLevelMap(name, within) {
+	var key = within ? within[0] + "/" + within[1] : name;
+	if (!levelMaps[key]) {
+		var request;
+		if (within) {
+			request = dataLoader.loadJSON(levels.path + getLevel(within[0]).periods[within[1]].window, "map").then(function(data) {
+				var map = new TopicSimilarityMap();
+				map.wrap(data);
+				return map;
+			});
+		} else if (name === "bin") {
+			request = dataLoader.loadScript(levels.path + levels.similarity, levels.populate).then(function(file) {
+				// keep the graph that is shown
+				var shown = similarityMap;
+				readDataFile(file);
+				var map = similarityMap;
+				similarityMap = shown;
+				return map;
+			});
+		} else {
+			var map = new TopicSimilarityMap();
+			map.wrap(getLevel(name));
+			request = $.when(map);
+		}
+		var maps = levelMaps;
+		levelMaps[key] = request.fail(function() {
+			delete maps[key];
+		});
+	}
+	return levelMaps[key];
+}
+
+/**
+ * Method to choose the level a project with levels is shown with at first:
+ * the finest level with at most LEVEL_COLUMNS periods, or the coarsest one.
+ * @returns the name of the level
+ */
+function defaultLevel() {
+	if (bins.length <= LEVEL_COLUMNS) return "bin";
+	for (var i = 0; i < levels.levels.length; i++) {
+		if (levels.levels[i].periods.length <= LEVEL_COLUMNS) return levels.levels[i].name;
+	}
+	return levels.levels[levels.levels.length-1].name;
+}
+
+/**
+ * Method to show a level of a project with levels in the visualization, or
+ * the window of a period of a coarser level.
+ * @param name  "bin", "quarter" or "year"
+ * @param within  the level and the index of the period to zoom into, e.g. ["year", 1], optional
+ */
+function showLevel(name, within) {
+	var project = selectedProject;
+	$("#loader").show();
+	loadLevelMap(name, within).done(function(map) {
+		// skip a level of a data set that is no longer shown
+		if (selectedProject !== project) return;
+		shownLevel = {name: name, within: within || null};
+		showMap(map);
+	}).fail(function() {
+		if (selectedProject === project) alert("The topics of the " + name + "s could not be loaded.");
+	}).always(function() {
+		if (selectedProject === project) $("#loader").hide();
+	});
+}
+
+/**
+ * Method to zoom into the period of a topic of a quarter or a year, see showLevel.
+ * @param id  the id of the topic, e.g. "q4_2" for a topic of the fifth quarter
+ */
+function zoomIn(id) {
+	var period = parseInt(id.split("_")[0].substring(1));
+	if (id.charAt(0) === "q") showLevel("bin", ["quarter", period]);
+	else showLevel("quarter", ["year", period]);
+}
+
+/**
+ * Method to list the levels of a project with levels above the visualization,
+ * with the period it zoomed into.
+ */
+function drawLevels() {
+	var holder = $("#levels").empty();
+	if (!levels) return;
+	// the links float right, the last one is on the left
+	$.each([["bin", "Bins"], ["quarter", "Quarters"], ["year", "Years"]], function(i, level) {
+		var link = $("<span class='level_link'></span>").text(level[1]);
+		if (shownLevel.name === level[0] && !shownLevel.within) link.addClass("selected");
+		else link.click(function() { showLevel(level[0]); });
+		holder.append(link);
+	});
+	if (shownLevel.within) {
+		var period = getLevel(shownLevel.within[0]).periods[shownLevel.within[1]];
+		holder.append($("<span class='level_period'></span>").text(period.label));
+	}
+}
+
+/**
+ * Method to draw a graph of topics in the visualization, with the topic list and the filters.
+ * @param map  the graph, a TopicSimilarityMap
+ */
+function showMap(map) {
+	similarityMap = map;
+	topicNodes = mapTopics(map);
+	$("#flow_viz").empty();
+	drawViz();
+	populateTopics();
+	drawFilters();
+	drawLevels();
+}
+
+/**
+ * Method to find the node that draws every topic of a graph of topics: a
+ * topic of the bins is drawn by its own node, or by the node of its thread
+ * for a quarter or a year. The topics of the bins outside of a window have
+ * no node.
+ * @param map  the graph, a TopicSimilarityMap
+ * @returns the name of the node of every topic with one, by topic id
+ */
+function mapTopics(map) {
+	var nodes = new Object();
+	$.each(map.nodes, function(i, node) {
+		$.each(node.topics || [node.name], function(j, id) {
+			nodes[id] = node.name;
+		});
+	});
+	return nodes;
+}
+
+/**
+ * Method to read a data file of a project, see DataLoader.loadScript.
+ * @param file  the data of the file, read by the worker or by its populate function
+ */
+function readDataFile(file) {
+	if (file.reader) window[file.reader].apply(window, file.args);
+	else window[file.populate]();
+}
+
+/**
+ * Method to load the tweets with ids from first to last, for a project read
+ * from an index.
+ * @returns a promise resolved once the tweets are loaded
+ */
+function loadTweets(first, last) {
+	if (projectAPI) return projectAPI.loadTweets(first, last);
+	var requests = [];
+	$.each(bins, function(i, bin) {
+		if (bin.first_id !== undefined && bin.first_id !== null && bin.first_id <= last && bin.last_id >= first) {
+			requests.push(bin.loadTweets());
+		}
+	});
+	return $.when.apply($, requests);
+}
+
 /**
  * Method to initially populate the topic list.
  */
@@ -253,16 +492,17 @@ function populateTopics() {
 	var count = 0;
 	$.each(bins, function(i, bin) {
 		var tm = bin.tm;
+		// only the topics drawn by the visualization, see mapTopics
+		var shown = $.grep(Object.keys(tm.topics), function(j) { return topicNodes[j] !== undefined; });
+		if (shown.length == 0) return;
 		//divider
 		var start = bin.start;
 		var end = bin.end;
 		if (showTimestamps) $("#topic_list").append("<li class=\"time\"><span class=\"left\">" + formatTime(start) + "</span><span class=\"right\">" + formatTime(end) + "</span></li>");
 
-		$.each(tm.topics, function(j, topic) {
-			// if ($("g #"+j)[0].style.display != "none") {
-				addTopic(topic);
-				count = count + 1;
-			// }
+		$.each(shown, function(k, j) {
+			addTopic(tm.topics[j]);
+			count = count + 1;
 		});
 	});
 
@@ -303,32 +543,35 @@ function populateTweets(start) {
 	// Number of tweets to load at a time
 	var num = 500;
 
-	var totalTweets = Object.keys(tweets).length;
+	var totalTweets = tweetCount || Object.keys(tweets).length;
 
 	// Decide end
 	var end = start + num;
 	if (end > totalTweets+1) end = totalTweets + 1; // plus 1 becuase of 1-based indexing
 
-	// Populate the tweets in increments
-	var tweetsToAdd = ""
-
-	for (var i = start; i < end; i++) {
-		tweetsToAdd += addTweet(tweets[i]);
-	}
+	// Load the tweets first if the project was read from an index
+	loadTweets(start, end - 1).done(function() {
+		// Populate the tweets in increments
+		var tweetsToAdd = ""
 
-	// Show the tweet count in the tweet list
-	$("#tweet_list_panel > #tweet_list_title").text("DOCUMENTS (" + totalTweets + ")");
-	$("#tweet_list").append(tweetsToAdd);
+		for (var i = start; i < end; i++) {
+			tweetsToAdd += addTweet(tweets[i]);
+		}
 
-	// Display show more button if applicable
-	if (end < totalTweets+1) {
-		var button = $("<center><button id='display_more'>Load More Tweets</button></center>");
-		button.click(function() {
-			$(this).remove();
-			populateTweets(end);
-		});
-		$("#tweet_list").append(button);
-	}
+		// Show the tweet count in the tweet list
+		$("#tweet_list_panel > #tweet_list_title").text("DOCUMENTS (" + totalTweets + ")");
+		$("#tweet_list").append(tweetsToAdd);
+
+		// Display show more button if applicable
+		if (end < totalTweets+1) {
+			var button = $("<center><button id='display_more'>Load More Tweets</button></center>");
+			button.click(function() {
+				$(this).remove();
+				populateTweets(end);
+			});
+			$("#tweet_list").append(button);
+		}
+	});
 }
 
 /**
@@ -347,8 +590,8 @@ function addTopic(topic) {
  */
 function addTweet(tweet) {
 	// Shorten the text field
-	var text = tweet.text.substring(0, 80);
-	if (tweet.text.length > 80) text += "...";
+	var text = tweet.getText().substring(0, 80);
+	if (tweet.getText().length > 80) text += "...";
 
 	return "<div class='tweet_card' id='" + tweet.id + "'><span class=\"tweet_author\">" + tweet.author + "</span><span class='tweet_date time'>" + formatTime(tweet.date) + "</span><span class='clear'></span><span class='tweet_text'>" + text + "</span></div>";
 
@@ -395,15 +638,19 @@ function highlightTopic(id) {
 	}
 	$("#" + id + ".topic_card").addClass("selected");
 
-	// Scroll to the selected topic in the list
-	var offset = $("#topic_list").scrollTop() + ($("#" + id + ".topic_card").offset().top-$("#topic_list").offset().top);
-	$('html, #topic_list').animate({
-	    scrollTop:offset
-	}, 50);
+	// Scroll to the selected topic in the list, a topic outside of the window
+	// of the visualization isn't listed
+	if ($("#" + id + ".topic_card").length > 0) {
+		var offset = $("#topic_list").scrollTop() + ($("#" + id + ".topic_card").offset().top-$("#topic_list").offset().top);
+		$('html, #topic_list').animate({
+		    scrollTop:offset
+		}, 50);
+	}
 
 
-	// Highlight in visualization
-	highlightViz(id);
+	// Highlight in visualization, the node of the thread of the topic for a
+	// quarter or a year
+	highlightViz(topicNodes && topicNodes[id] !== undefined ? topicNodes[id] : id);
 }
 
 function highlightViz(id) {
@@ -477,15 +724,21 @@ function showTopicData(id) {
 	var b = id.split("_")[0];
 	var tmp = bins[b].getTopic(id);
 
-	// Show the top tweets for the topic
-	showTweetsForTopic(tmp);
-
 	// Show the word distribution for the topic
 	showWordsForTopic(tmp);
 
 
 	// Highlight selected topic & its paths in and out
 	highlightTopic(id);
+
+	// Show the top tweets for the topic, once its bin is loaded if the project
+	// was read from an index, or its tweets if the project has an API, unless
+	// another topic was selected in the meantime
+	(projectAPI ? projectAPI.loadTopicDocs(tmp) : bins[b].load()).done(function() {
+		if ($("#" + id + ".topic_card.selected").length > 0) {
+			showTweetsForTopic(tmp);
+		}
+	});
 }
 
 /**
@@ -556,14 +809,8 @@ function clearTweetData() {
  * @param topic  The topic object
  */
 function showTweetsForTopic(topic) {
-	var tweetsToShow = topic.top_docs;
-
 	// order the tweets by P(tweet|topic)
-	var sortable = [];
-	for (var tweet in topic.top_docs) {
-		sortable.push([tweet, topic.top_docs[tweet]]);
-	}
-	sortable.sort(function(a,b){return b[1]-a[1]});
+	var sortable = topic.getRankedDocs();
 
 	// Show the tweets
 	 $("#tweet_list").empty();
@@ -579,6 +826,43 @@ function showTweetsForTopic(topic) {
 	 $("#topic_list_panel > .panel_name > #view_all").show();
 }
 
+/**
+ * Method to show the documents found by a search, see liveSearch.
+ *
+ * Empties the tweet list and shows the 100 best matches of the search.
+ * @param query  The search
+ * @param ranked  The [tweet id, score] pairs of the documents from the best to the worst match
+ */
+function showTweetsForSearch(query, ranked) {
+	var shown = ranked.slice(0, 100);
+	var requests = [];
+	if (projectAPI) {
+		requests.push(projectAPI.loadTweetsById($.map(shown, function(pair) { return pair[0]; })));
+	} else {
+		$.each(bins, function(i, bin) {
+			for (var j = 0; j < shown.length; j++) {
+				if (bin.hasTweet(String(shown[j][0]))) {
+					requests.push(bin.loadTweets());
+					break;
+				}
+			}
+		});
+	}
+	$.when.apply($, requests).done(function() {
+		// skip a search that was changed in the meantime
+		if ($('input#topic_searchbox').val() !== query) return;
+
+		$("#tweet_list").empty();
+		var tweetsToAdd = "";
+		for (var i = 0; i < shown.length; i++) {
+			tweetsToAdd += addTweet(tweets[shown[i][0]]);
+		}
+
+		$("#tweet_list_panel > #tweet_list_title").text("Documents: " + query + " (" + ranked.length + ")");
+		$("#tweet_list").append(tweetsToAdd);
+	});
+}
+
 /**
  * Method to show the topics for the selected tweet.
  *
@@ -587,23 +871,38 @@ function showTweetsForTopic(topic) {
  * @param id Tweet ID
  */
 function showTopicsForTweet(id) {
-	var tmp_topics;
-	// Find the bin containing the tweet and get the topics
+	// a project with an API has the topics of every tweet ranked in its database
+	if (projectAPI) {
+		projectAPI.getTopicsForTweet(id).done(function(data) {
+			if ($(".tweet_card.selected#" + id).length > 0) {
+				showTopicChart(data);
+			}
+		});
+		return;
+	}
+
+	// Find the bin containing the tweet
 	// TODO: smarter way to determine bin or topics for the tweet
 	for (var i=0; i<bins.length; i++) {
 		var bin = bins[i];
 		if (bin.hasTweet(id)) {
-			tmp_topics = bin.getTopicsForTweet(id);
+			// get the topics once the bin is loaded if the project was read
+			// from an index, unless the tweet was deselected in the meantime
+			bin.loadTopicModel().done(function() {
+				if ($(".tweet_card.selected#" + id).length > 0) {
+					showTopicChart(bin.getRankedTopicsForTweet(id));
+				}
+			});
 			break;
 		}
 	}
+}
 
-	// order the topics by P(Topic|Tweet)
-	var data = new Array();
-	for (var t in tmp_topics) {
-		data.push({text:t, value:tmp_topics[t]});
-	}
-	data.sort(function(a, b) { return b.value - a.value; });
+/**
+ * Method to draw the topics of the selected tweet, see showTopicsForTweet.
+ * @param data  the topics of the tweet ordered by P(Topic|Tweet), see getRankedTopicsForDocument
+ */
+function showTopicChart(data) {
 
 	var w = 250,
 		h = 20,
@@ -745,7 +1044,7 @@ function showFullTweet(id) {
 	$(".tweet_card.selected#" + id).empty();
 	var tweet = tweets[id];
 
-	var t = $("<span class='tweet_author'><a target='_blank' href='https://twitter.com/" + tweet.author + "'>" + tweet.author + "</a></span><span class='tweet_date time'>" + formatTime(tweet.date) + "</span><span class='clear'></span><div class='tweet_text'>" + tweet.text + "</div>");
+	var t = $("<span class='tweet_author'><a target='_blank' href='https://twitter.com/" + tweet.author + "'>" + tweet.author + "</a></span><span class='tweet_date time'>" + formatTime(tweet.date) + "</span><span class='clear'></span><div class='tweet_text'>" + tweet.getText() + "</div>");
 
 	$(".tweet_card.selected#"+id).append(t);
 }
@@ -932,6 +1231,15 @@ function clear() {
 	similarityMap = new Object();
 	bins = new Array();
 	tweets = new Object();
+	tweetCount = 0;
+	searchIndex = null;
+	blockUrl = null;
+	blockRequest = null;
+	projectAPI = null;
+	levels = null;
+	levelMaps = new Object();
+	shownLevel = null;
+	topicNodes = null;
 
 	$("#tweet_list").empty();
 	$("#topic_list").empty();
@@ -947,48 +1255,139 @@ function clear() {
 
 }
 
+/**
+ * Method to read the project registry and list its projects in the dataset selector.
+ * @returns a promise resolved once the registry is read
+ */
+function loadProjects() {
+	return $.getJSON("data/projects.json").done(function(data) {
+		$("#popup_data_selector").empty();
+		$.each(data.projects, function(i, project) {
+			projects[project.id] = project;
+			var link = $("<a href=\"#\"></a>").text(project.name);
+			$("#popup_data_selector").append($("<li></li>").attr("id", project.id).append(link));
+		});
+		$("#popup_data_selector").menu("refresh");
+	});
+}
+
+/**
+ * Method to load the data files of a project, see DataLoader.loadScript. The
+ * files are only loaded the first time the project is selected, and the
+ * progress of the download is shown while they load.
+ * @param project  the project read from the registry
+ * @returns a promise resolved with the data of the files once they are loaded
+ */
+function loadProject(project) {
+	if (!project.request) {
+		var loaded = new Array();
+		var total = new Array();
+		project.request = $.when.apply($, $.map(project.scripts, function(url, i) {
+			return dataLoader.loadScript(url, project.populate[i]).progress(function(bytes, size) {
+				loaded[i] = bytes;
+				total[i] = size;
+				if (selectedProject === project.id) showProgress(loaded, total);
+			});
+		})).then(function() {
+			return $.makeArray(arguments);
+		}).fail(function() {
+			delete project.request;
+		});
+	}
+	return project.request;
+}
+
+/**
+ * Method to show the progress of the download of the data files of a project.
+ * @param loaded  the number of bytes loaded of every file
+ * @param total  the size of every file, 0 if unknown
+ */
+function showProgress(loaded, total) {
+	var bytes = 0;
+	var size = 0;
+	$.each(loaded, function(i, value) {
+		bytes += value || 0;
+		size += total[i] || 0;
+	});
+	var text = (bytes / 1048576).toFixed(1) + " MB";
+	if (size > 0) text = Math.min(100, Math.round(100 * bytes / size)) + "% of " + (size / 1048576).toFixed(1) + " MB";
+	$("#loader_progress").text("Loading " + text);
+}
+
 /**
  * Methodt to populate the visualization with the selected dataset.
  * @param selected_data  the selected data set
  */
 function populateVisualization(selected_data) {
 	// Show the loading image
+	$("#loader_progress").text("");
 	$("#loader").show();
 
+	var project = projects[selected_data];
+	selectedProject = selected_data;
+	loadProject(project).done(function(data) {
+		// skip a data set that was replaced by another selection while loading
+		if (selectedProject === selected_data) drawProject(project, data);
+	}).fail(function() {
+		$("#loader").hide();
+		alert("The data of " + project.name + " could not be loaded.");
+	});
+}
+
+/**
+ * Method to populate the visualization with a project whose data files are loaded.
+ * @param project  the project read from the registry
+ * @param data  the data of the files, see loadProject
+ */
+function drawProject(project, data) {
 	// Clear the interface
 	clear();
 
-	var idToName = {
-					// add new idToName
-					"Full_Disclosure_2012":"Full Disclosure 2012"
-					}
+	// Load the tweets from the JSON API of the project if it has one
+	if (project.api) projectAPI = new ProjectAPI(project.api);
 
-	// Populate the interface with the selected dataset
-	if (selected_data==="Full_Disclosure_2012") {
-		populate_tweets_Full_Disclosure_2012();
-		populate_bins_Full_Disclosure_2012();
-		populate_similarity_Full_Disclosure_2012();
-	}
-	// add new selected dataset here
-	// end of adding new selected datasets
-
-	// Populate the visualization
-	drawViz();
+	// Populate the interface with the selected dataset, read by the worker or
+	// by the populate functions of the files
+	$.each(data, function(i, file) {
+		readDataFile(file);
+	});
 
-	// Populate the topic list - need to figure out how to handle topics at different bin slices
-	populateTopics();
+	// Populate the visualization, the topic list and the filters, by quarter
+	// or by year if the project has levels and too many bins to show
+	if (levels) showLevel(defaultLevel());
+	else showMap(similarityMap);
 
 	// Populate the tweet list
 	populateTweets(1);
 
 	// Change labels for title
-	$('#dataset_name').text(' | ' + idToName[selected_data]);
+	$('#dataset_name').text(' | ' + project.name);
 
-	// Hide the loading image
-	$("#loader").hide();
+	// Hide the loading image, once the level is shown for a project with levels
+	if (!levels) $("#loader").hide();
 
   // Filters pane
   $(function() {
+	  $('.checkall').click(function () {
+		 $(this).parents('fieldset:eq(0)').find(':checkbox').attr('checked', this.checked);
+	  });
+
+	  $('input[type=checkbox]').on("click", filterViz);
+     });
+
+	 $('.type_option').on("click",function(e) {
+		 var type = e.currentTarget.classList[0];
+		 if (type=="all") return;
+		 var $box = $('input[type=checkbox][value='+type+']');
+		 $box.attr("checked",!$box.attr("checked"));
+		 filterViz();
+	 })
+}
+
+/**
+ * Method to set the filters to the topics and links of the visualization.
+ */
+function drawFilters() {
 	  // node size sliders
 	  var vals = jQuery.unique(similarityMap.nodes.map(function(node) { return node.value;}));
 	  var minSize = d3.min(similarityMap.nodes, function (node) { return node.value;})
@@ -1038,21 +1437,7 @@ function populateVisualization(selected_data) {
 		  $('input:checkbox:not(:checked)').attr("checked","true");
 		  showAllNodesAndEdges();
 	  }
-
-	  $('.checkall').click(function () {
-		 $(this).parents('fieldset:eq(0)').find(':checkbox').attr('checked', this.checked);
-	  });
-
-	  $('input[type=checkbox]').on("click", filterViz);
-     });
-
-	 $('.type_option').on("click",function(e) {
-		 var type = e.currentTarget.classList[0];
-		 if (type=="all") return;
-		 var $box = $('input[type=checkbox][value='+type+']');
-		 $box.attr("checked",!$box.attr("checked"));
-		 filterViz();
-	 })
+	$("#reset_filters").hide();
 }
 
 function filterViz() {
@@ -1154,6 +1539,9 @@ function resetFilters() {
  * Executes once the DOM is fully loaded
  */
 $(document).ready(function() {
+	// Load the data files in a worker
+	dataLoader = new DataLoader("scripts/DataWorker.js");
+
 	// Select handler for the dataset selector
 	$("#data_selector").click(function() {
 		$("#dataset-popup").show();
@@ -1169,6 +1557,9 @@ $(document).ready(function() {
 		populateVisualization(selection);
 	  }});
 
+	// List the projects of the registry in the dataset selector
+	loadProjects();
+
 	// Select handler for the about box
 	$("#about").click(function() {
 		$("#dataset-popup").show();
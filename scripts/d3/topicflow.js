@@ -46,6 +46,26 @@ d3.topicflow = function() {
     return topicflow;
   };
 
+  // Place the nodes and links where the pipeline placed them for a viewport
+  // of layout.size, see layout_topics in run.py, scaled to the size.
+  topicflow.load = function(layout) {
+    var kx = (size[0] - nodeWidth) / (layout.size[0] - layout.node_width),
+        ky = size[1] / layout.size[1];
+    computeNodeLinks();
+    nodes.forEach(function(node, i) {
+      node.x = layout.x[i] * kx;
+      node.dx = nodeWidth;
+      node.y = layout.y[i] * ky;
+      node.dy = layout.dy[i] * ky;
+    });
+    links.forEach(function(link, i) {
+      link.dy = layout.link_dy[i] * ky;
+      link.sy = layout.link_sy[i] * ky;
+      link.ty = layout.link_ty[i] * ky;
+    });
+    return topicflow;
+  };
+
   topicflow.relayout = function() {
     computeLinkDepths();
     return topicflow;
@@ -94,10 +114,11 @@ d3.topicflow = function() {
     });
   }
 
-  // Compute the value (size) of each node by summing the associated links.
+  // The value (size) of each node is the weight of its topic in its bin.
+  // Projects added before topics were weighted have random values.
   function computeNodeValues() {
     nodes.forEach(function(node) {
-		node.value = Math.random();
+		if (node.value === undefined) node.value = Math.random();
     });
   }
 
@@ -107,33 +128,22 @@ d3.topicflow = function() {
 		link.value *= 1;
     });
   }
-  // Iteratively assign the breadth (x-position) for each node.
-  // Nodes are assigned the maximum breadth of incoming neighbors plus one;
-  // nodes with no incoming links are assigned breadth zero, while
-  // nodes with no outgoing links are assigned the maximum breadth.
+  // Assign the breadth (x-position) for each node, by the start time of its bin.
+  // Every node is visited once, instead of once per path to it along the links.
   function computeNodeBreadths() {
-    var remainingNodes = nodes,
-        nextNodes,
-		x = 0,
+    var x = 0,
 		end = bins[bins.length-1].start.split(/[/ :]/),
 		start = bins[0].start.split(/[/ :]/),
 		min = Date.UTC(start[2],start[0],start[1], start[3], start[4]),
 		max = Date.UTC(end[2],end[0],end[1], end[3], end[4]);
 
-    while (remainingNodes.length) {
-      nextNodes = [];
-      remainingNodes.forEach(function(node) {
+    nodes.forEach(function(node) {
 		  var bin = parseInt(node.name.split("_")[0]);
 		  var timestamp = bins[bin].start.split(/[/ :]/);
 		  x = Date.UTC(timestamp[2],timestamp[0],timestamp[1], timestamp[3], timestamp[4])
         node.x = (x-min);
         node.dx = nodeWidth;
-        node.sourceLinks.forEach(function(link) {
-          nextNodes.push(link.target);
-        });
-      });
-      remainingNodes = nextNodes;
-    }
+    });
 
     //
     //moveSinksRight(x);
@@ -166,13 +166,13 @@ var tooltip=function(){
 
 
 /*** Live search box for topics. I WROTE IT MAHSELF ***/
+var searchCount = 0; // number of searches, the results of a replaced search are skipped
+
 var liveSearch = function() {	
 	// TODO: should we clear the selected topic data immediately?
 	
 	var term = $('input#topic_searchbox').val();
 	
-	var terms = term.split(' '); // if we decide multiple search terms are allowed.
-	
 	// Scroll to top of box
 	$('html, #topic_list').animate({
 	    scrollTop:0
@@ -188,6 +188,7 @@ var liveSearch = function() {
 	clearTopicData();
 	clearTweetData();
 	
+	var search = ++searchCount;
 	if (term=="") {
 		populateTopics();
 		
@@ -199,54 +200,90 @@ var liveSearch = function() {
 		// show "x" button
 		$(".search_clear").show();
 		
-		var filtered = [];
-		$.each(topics,function(key, topic) {
-			var add = true;
-			var topWords = Object.keys(topic.getTopWords()).join(',').toLowerCase();
-			terms.forEach(function(term) {
-				if (topWords.indexOf(term) == -1) {
-					add = false;
-				}
-			});
-			
-			// only add if node is visible
-			if ($("g #" + topic.id)[0].style.display == "none") add = false;
-			
-			if (add) {
-				filtered.push(topic);
-				$("g #" + topic.id + "> rect").attr("class","");
-			}
-			else {
-				$("g #" + topic.id + "> rect").attr("class","greyed"); // grey out node
-				$("path.t"+topic.id+":not(.greyed)").each(function(key, path) {
-					path.addClass("greyed");
-				});
-			}
+		// search the index of the project for whole words if it has one,
+		// scan the top words of the topics otherwise
+		var request = searchIndex && searchTerms(term).length > 0 ? searchIndex.search(term) : $.Deferred().reject();
+		request.done(function(results) {
+			if (search != searchCount) return;
+			showSearchTopics(results.topics);
+			showTweetsForSearch(term, results.docs);
+		}).fail(function() {
+			if (search != searchCount) return;
+			showSearchTopics(scanTopics(term));
 		});
-		
-		filtered.sort(function(a,b) {
-			var aScore = 0;
-			$.each(a.top_words,function(word, value) {
-				if (word.indexOf(term) != -1) {
-					aScore += value;
-				}
-			});
-			var bScore = 0;
-			$.each(b.top_words,function(word, value) {
-				if (word.indexOf(term) != -1) {
-					bScore += value;
-				}
-			});
-			
-			return bScore - aScore;
+	}
+};
+
+/**
+ * Scan the top words of every topic for the words of a search.
+ * @param term  the search
+ * @returns the scores of the topics with every word of the search by topic id
+ */
+var scanTopics = function(term) {
+	var terms = term.split(' '); // if we decide multiple search terms are allowed.
+	var scores = new Object();
+	$.each(topics,function(key, topic) {
+		var add = true;
+		var topWords = Object.keys(topic.getTopWords()).join(',').toLowerCase();
+		terms.forEach(function(term) {
+			if (topWords.indexOf(term) == -1) {
+				add = false;
+			}
 		});
+		if (!add) return;
 		
-		var count = 0;
-		filtered.forEach(function(topic) {
-			addTopic(topic);
-			count = count + 1;
+		scores[topic.id] = 0;
+		$.each(topic.top_words,function(word, value) {
+			if (word.indexOf(term) != -1) {
+				scores[topic.id] += value;
+			}
 		});
-		
-		$("#topics_title").text("Topics (" + count + ")");
-	}
-};
\ No newline at end of file
+	});
+	return scores;
+};
+
+/**
+ * List the topics found by a search and grey out the others.
+ * @param scores  the scores of the topics found by topic id
+ */
+var showSearchTopics = function(scores) {
+	var filtered = [];
+	var found = new Object(); // the nodes of the topics found
+	$.each(topics,function(key, topic) {
+		// only the topics drawn by the visualization, see mapTopics
+		var name = topicNodes[topic.id];
+		if (name === undefined || !scores.hasOwnProperty(topic.id)) return;
+
+		// only add if node is visible
+		var node = $("g #" + name)[0];
+		if (!node || node.style.display == "none") return;
+
+		filtered.push(topic);
+		found[name] = true;
+	});
+
+	// a node of a quarter or a year is found if one of its topics is
+	$.each(similarityMap.nodes,function(key, node) {
+		if (found[node.name]) {
+			$("g #" + node.name + "> rect").attr("class","");
+		}
+		else {
+			$("g #" + node.name + "> rect").attr("class","greyed"); // grey out node
+			$("path.t"+node.name+":not(.greyed)").each(function(key, path) {
+				path.addClass("greyed");
+			});
+		}
+	});
+	
+	filtered.sort(function(a,b) {
+		return scores[b.id] - scores[a.id];
+	});
+	
+	var count = 0;
+	filtered.forEach(function(topic) {
+		addTopic(topic);
+		count = count + 1;
+	});
+	
+	$("#topics_title").text("Topics (" + count + ")");
+};
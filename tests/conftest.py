@@ -0,0 +1,99 @@
+"""
+Fixtures of the tests: small synthetic corpora, see benchmark.make_corpus,
+and a TopicFlow directory the projects of a test are written into.
+"""
+import io
+import os
+import sys
+import json
+import functools
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run
+import benchmark
+
+
+@pytest.fixture
+def path_tf(tmp_path, monkeypatch):
+    """
+    A TopicFlow directory, with the data folder "python run.py" writes the
+    projects into, for run.py to write into.
+    """
+    path_tf = str(tmp_path / 'tf')
+    os.makedirs(os.path.join(path_tf, 'data'))
+    monkeypatch.setattr(run, 'path_tf', path_tf, raising=False)
+    # the globals build_project sets
+    for name in ('path_doc', 'path_meta', 'path_dtm', 'path_ttm', 'path_topic_tf'):
+        monkeypatch.setattr(run, name, None, raising=False)
+    return path_tf
+
+
+@pytest.fixture
+def server(path_tf):
+    """
+    A TopicFlowServer serving the TopicFlow directory on a free port, with
+    its access log kept in server.access_log.
+    """
+    handler = functools.partial(run.TopicFlowRequestHandler, directory=path_tf)
+    httpd = run.TopicFlowServer(('127.0.0.1', 0), handler, io.StringIO())
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    thread.join()
+    httpd.server_close()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    A year of 48 documents, 4 per month, which a test can change.
+    """
+    return benchmark.make_corpus(str(tmp_path / 'corpus'), 48, n_topics=4, n_terms=30)
+
+
+def build(name, corpus, pool=None, **options):
+    """
+    Build a project from a corpus the way "python run.py -a" does.
+
+    Args:
+        name    -- name of the project
+        corpus  -- the paths of the corpus, see benchmark.make_corpus
+        pool    -- the process pool of the workers of "-j", optional
+        options -- the options of the manifest, see run.new_manifest
+
+    Returns:
+        the manifest of the project
+    """
+    manifest = run.new_manifest(name, corpus['path_doc'], corpus['path_meta'], '.reply.body.txt', corpus['path_dtm'],
+                                corpus['path_ttm'], corpus['path_topic_tf'], **options)
+    run.build_project(name, manifest, pool)
+    return manifest
+
+
+def read_json(path_file):
+    """
+    Read a JSON file the way the viewer does, rejecting NaN and Infinity.
+    """
+    def reject(constant):
+        raise ValueError(constant + ' is not valid JSON')
+    with open(path_file, encoding='utf-8') as file:
+        return json.load(file, parse_constant=reject)
+
+
+def read_project(path_project):
+    """
+    Returns:
+        a dictionary that maps the path of every file of a project to its content
+    """
+    files = {}
+    for path_folder, _, names in os.walk(path_project):
+        for name in names:
+            path_file = os.path.join(path_folder, name)
+            with open(path_file, 'rb') as file:
+                files[os.path.relpath(path_file, path_project)] = file.read()
+    return files
@@ -0,0 +1,83 @@
+import os
+import json
+import zipfile
+import tarfile
+
+import pytest
+
+import run
+
+
+@pytest.fixture(params=['zip', 'tar.gz', 'tar'])
+def archive_path(request, tmp_path):
+    """
+    An archive of two bins of documents in a single folder, "2012.parsed/".
+    """
+    files = [('2012.parsed/2012_Feb/2012_Feb_0.txt', b'February'),
+             ('2012.parsed/2012_Jan/2012_Jan_1.txt', b'January 1'),
+             ('2012.parsed/2012_Jan/2012_Jan_0.txt', b'January 0'),
+             ('2012.parsed/2012_Jan/notes.md', b'# notes')]
+    path_file = str(tmp_path / ('2012.parsed.' + request.param))
+    if request.param == 'zip':
+        with zipfile.ZipFile(path_file, 'w') as archive:
+            for name, data in files:
+                archive.writestr(name, data)
+    else:
+        for name, data in files:
+            os.makedirs(os.path.dirname(str(tmp_path / 'x' / name)), exist_ok=True)
+            with open(str(tmp_path / 'x' / name), 'wb') as file:
+                file.write(data)
+        with tarfile.open(path_file, 'w:gz' if request.param == 'tar.gz' else 'w') as archive:
+            for name, data in files:
+                archive.add(str(tmp_path / 'x' / name), name)
+    yield path_file
+    run.close_archives()
+
+
+def test_archive_members(archive_path):
+    archive = run.open_archive(archive_path)
+    # the folder holding every member is left out
+    assert sorted(archive.listdir('')) == [('2012_Feb', True), ('2012_Jan', True)]
+    assert [name for name, size, mtime in archive.scan('2012_Jan', '.txt')] == ['2012_Jan_1.txt', '2012_Jan_0.txt']
+    assert archive.scan('2012_Feb')[0][1] == len(b'February')
+    assert archive.read_files('2012_Jan', ['2012_Jan_0.txt', '2012_Jan_1.txt', 'missing.txt']) == \
+        {'2012_Jan_0.txt': b'January 0', '2012_Jan_1.txt': b'January 1'}
+    # reading a folder stored before the last one read
+    assert archive.read('2012_Feb', '2012_Feb_0.txt') == b'February'
+    with pytest.raises(FileNotFoundError):
+        archive.read('2012_Feb', 'missing.txt')
+    with pytest.raises(FileNotFoundError):
+        archive.listdir('2012_Mar')
+
+
+def test_find_archive(archive_path):
+    archive, folder = run.find_archive(os.path.join(archive_path, '2012_Jan'))
+    assert folder == '2012_Jan'
+    assert run.list_entries(os.path.join(archive_path, '2012_Jan'))[0] == ('2012_Jan_1.txt', False)
+    assert run.open_archive(archive_path) is archive
+    run.close_archives()
+    assert run.open_archive(archive_path) is not archive
+
+
+def test_transform_doc_archives(path_tf, corpus, tmp_path):
+    run.transform_doc('D', corpus['path_doc'], corpus['path_meta'], '.reply.body.txt')
+    path_doc = str(tmp_path / 'doc.tar.gz')
+    path_meta = str(tmp_path / 'meta.zip')
+    with tarfile.open(path_doc, 'w:gz') as archive:
+        archive.add(corpus['path_doc'], 'doc')
+    with zipfile.ZipFile(path_meta, 'w') as archive:
+        for path_folder, _, names in os.walk(corpus['path_meta']):
+            for name in names:
+                path = os.path.join(path_folder, name)
+                archive.write(path, os.path.relpath(path, os.path.dirname(corpus['path_meta'])))
+    run.transform_doc('A', path_doc, path_meta, '.reply.body.txt')
+    run.close_archives()
+
+    # the documents of a bin are listed in the order the folder lists them
+    for bin_ix in range(12):
+        docs = {}
+        for project_name in ('D', 'A'):
+            with open(os.path.join(path_tf, 'data', project_name, 'docs', str(bin_ix) + '.json'), encoding='utf-8') as file:
+                docs[project_name] = sorted((doc['author'], doc['tweet_date'], doc['text']) for doc in json.load(file).values())
+        assert len(docs['A']) == 4
+        assert docs['A'] == docs['D']
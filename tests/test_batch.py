@@ -0,0 +1,82 @@
+import os
+import sys
+import shutil
+import subprocess
+
+import pytest
+
+import run
+import benchmark
+from conftest import read_json
+
+# a batch file with comments and blank lines, and a project whose matrixes
+# don't match its bins
+BATCH = '''
+# nightly build
+{"projects": [
+  {"name": "First Year", "path_doc": "first/doc", "path_meta": "first/meta", "doc_extension": ".reply.body.txt",
+   "path_dtm": "first/dtm", "path_ttm": "first/ttm", "path_topic_tf": "first/topic_flow.csv"},
+
+  // the Document_Topic_Matrixes of this project are missing
+  {"name": "Broken", "path_doc": "first/doc", "path_meta": "first/meta", "doc_extension": ".reply.body.txt",
+   "path_dtm": "empty", "path_ttm": "first/ttm"},
+
+    # computed similarities
+  {"name": "Second", "path_doc": "second/doc", "path_meta": "second/meta", "doc_extension": ".reply.body.txt",
+   "path_dtm": "second/dtm", "path_ttm": "second/ttm", "top_words": 5}
+]}
+'''
+
+
+@pytest.fixture
+def path_batch(tmp_path):
+    path_batch = tmp_path / 'batch'
+    benchmark.make_corpus(str(path_batch / 'first'), 24, n_topics=3, n_terms=20)
+    benchmark.make_corpus(str(path_batch / 'second'), 24, year=2013, n_topics=3, n_terms=20, seed=1)
+    os.makedirs(str(path_batch / 'empty'))
+    (path_batch / 'nightly.json').write_text(BATCH)
+    return str(path_batch / 'nightly.json')
+
+
+def test_read_batch(path_batch):
+    projects = run.read_batch(path_batch)
+    path_base = os.path.dirname(path_batch)
+    assert [project['name'] for project in projects] == ['First_Year', 'Broken', 'Second']
+    assert projects[0]['path_doc'] == os.path.join(path_base, 'first/doc')
+    assert 'path_topic_tf' not in projects[2] and projects[2]['top_words'] == 5
+
+
+@pytest.mark.parametrize('text', ['{"projects": [{"name": "A"}]}', '{"project": []}', '[]',
+                                  '{"projects": [{"name": "A", "path_doc": "x", "path_meta": "x", "doc_extension": ".txt", '
+                                  '"path_dtm": "x", "path_ttm": "x"}]}',
+                                  '{"projects": []\n/* not a comment */}'])
+def test_read_batch_errors(tmp_path, text):
+    path_file = tmp_path / 'batch.json'
+    path_file.write_text(text)
+    with pytest.raises(ValueError):
+        run.read_batch(str(path_file))
+
+
+def test_batch_failed_project(tmp_path, path_batch):
+    # python run.py -b builds into the directory of run.py
+    path_tf = tmp_path / 'tf'
+    os.makedirs(str(path_tf / 'data'))
+    shutil.copy(run.__file__, str(path_tf / 'run.py'))
+    command = [sys.executable, str(path_tf / 'run.py'), '-b', path_batch]
+    process = subprocess.run(command, cwd=str(tmp_path), capture_output=True, text=True, timeout=300)
+    assert process.returncode == 1
+    assert 'Building Broken failed.' in process.stdout and '2 of 3 projects built' in process.stdout
+    assert process.stderr.strip().endswith('Failed projects: Broken')
+
+    # the projects after the failed one are still built and registered
+    registry = read_json(str(path_tf / 'data' / 'projects.json'))
+    assert [project['id'] for project in registry['projects']] == ['First_Year', 'Second']
+    # though the failed project wrote some of its files
+    assert os.path.exists(str(path_tf / 'data' / 'Broken' / 'Doc.js'))
+    manifest = read_json(str(path_tf / 'data' / 'Second' / 'manifest.json'))
+    assert manifest['args']['top_words'] == 5 and manifest['args']['similarity'] is not None
+    assert read_json(str(path_tf / 'data' / 'First_Year' / 'manifest.json'))['args']['similarity'] is None
+
+    # built again, the projects are updated
+    process = subprocess.run(command, cwd=str(tmp_path), capture_output=True, text=True, timeout=300)
+    assert process.returncode == 1 and '2 of 3 projects built' in process.stdout
@@ -0,0 +1,132 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+from conftest import build
+
+
+def test_bin_sort_key():
+    names = ['2013_Jan', '2012_Dec', '2012_Feb', '2012_Jan']
+    assert sorted(names, key=run.bin_sort_key) == ['2012_Jan', '2012_Feb', '2012_Dec', '2013_Jan']
+    assert sorted(['2013_01', '2012_10', '2012_2'], key=run.bin_sort_key) == ['2012_2', '2012_10', '2013_01']
+    assert sorted(['2012_W10', '2012_W05'], key=run.bin_sort_key) == ['2012_W05', '2012_W10']
+
+
+def test_match_bin():
+    # the entry named after the bin wins, then the one named after its last part
+    assert run.match_bin('2012_Jan', ['Jan.csv', '2012_Jan.csv'], 'dtm') == '2012_Jan.csv'
+    assert run.match_bin('2012_Jan', ['Feb.csv', 'Jan.csv'], 'dtm') == 'Jan.csv'
+    assert run.match_bin('2012_Jan', ['2012_Feb', 'k10_Jan'], 'meta') == 'k10_Jan'
+    with pytest.raises(FileNotFoundError):
+        run.match_bin('2012_Mar', ['Jan.csv', 'Feb.csv'], 'dtm')
+    with pytest.raises(ValueError):
+        run.match_bin('2012_Jan', ['a_Jan.csv', 'b_Jan.csv'], 'dtm')
+
+
+def test_find_bins(corpus):
+    # a file and a hidden folder next to the bins are skipped
+    open(os.path.join(corpus['path_doc'], '.DS_Store'), 'w').close()
+    os.makedirs(os.path.join(corpus['path_doc'], '.cache'))
+    bins = run.find_bins(corpus['path_doc'], corpus['path_meta'], corpus['path_dtm'], corpus['path_ttm'])
+    assert [x['name'] for x in bins][:3] == ['2012_Jan', '2012_Feb', '2012_Mar']
+    assert len(bins) == 12
+    assert bins[0]['doc'] == os.path.join(corpus['path_doc'], '2012_Jan')
+    assert bins[0]['meta'] == os.path.join(corpus['path_meta'], '2012_Jan')
+    assert bins[0]['dtm'] == os.path.join(corpus['path_dtm'], 'Jan.csv')
+    assert bins[0]['ttm'] == os.path.join(corpus['path_ttm'], 'Jan.csv')
+    assert bins[0]['label'] == 'Jan'
+    # only the documents are needed
+    assert run.find_bins(corpus['path_doc'])[11]['dtm'] is None
+
+
+def test_find_bins_shared_entry(corpus):
+    # two bins of two years match the same matrix
+    os.makedirs(os.path.join(corpus['path_doc'], '2013_Jan'))
+    with pytest.raises(ValueError):
+        run.find_bins(corpus['path_doc'], path_dtm=corpus['path_dtm'])
+
+
+def test_doc_topic_probs():
+    df_topic_doc = pd.DataFrame([[0.1, 0.9], [0.8, 0.2], [0.5, 0.5]], index=['b', 'a', 'c'])
+    # "c" isn't in Doc.js
+    doc_ids, probs = run.doc_topic_probs(df_topic_doc, {'id': [7, 8], 'txt': ['a', 'b']})
+    assert doc_ids == [7, 8]
+    assert probs.tolist() == [[0.8, 0.2], [0.1, 0.9]]
+
+
+def test_rank_bin():
+    probs = np.array([[0.2, 0.8], [0.6, 0.4], [0.2, 0.8]])
+    ranks = run.rank_bin(3, [10, 11, 12], probs, top_docs=2)
+    assert ranks['topic_prob'] == ['3_0', '3_1']
+    # documents of the same probability keep the order of their ids
+    assert ranks['topic_docs']['3_0'] == {'ids': [11, 10], 'probs': [0.6, 0.2]}
+    assert ranks['topic_docs']['3_1'] == {'ids': [10, 12], 'probs': [0.8, 0.8]}
+    assert ranks['doc_topics'] == {'doc_ids': [10, 11, 12], 'topics': [1, 0, 0, 1, 1, 0],
+                                   'probs': [0.8, 0.2, 0.6, 0.4, 0.8, 0.2]}
+    # None ranks every document
+    assert len(run.rank_bin(3, [10, 11, 12], probs, top_docs=None)['topic_docs']['3_0']['ids']) == 3
+
+
+def test_transform_bin_dates():
+    df_meta = pd.DataFrame({'id': ['2012_Jan_0', '2012_Jan_1', '2012_Jan_2'],
+                            'date': ['2012-01-20 10:00:00', 'Mon, 2 Jan 2012 08:05:00 +0100', 'not a date']})
+    df_topic_doc = pd.DataFrame([[0.5, 0.5]], index=['2012_Jan_0'])
+    df_topic_word = pd.DataFrame([[0.9, 0.1], [0.2, 0.8]], columns=['a', 'b'])
+    bin_dict = run.transform_bin(0, df_meta, df_topic_doc, df_topic_word, {'id': [1], 'txt': ['2012_Jan_0']})
+    assert (bin_dict['start_time'], bin_dict['end_time']) == ('1/2/2012 8:5', '1/20/2012 10:0')
+    # no date can be parsed
+    bin_dict = run.transform_bin(0, df_meta.iloc[2:], df_topic_doc, df_topic_word, {'id': [], 'txt': []})
+    assert (bin_dict['start_time'], bin_dict['end_time']) == ('', '')
+
+
+def test_bin_without_dates(path_tf, corpus):
+    path_csv = os.path.join(corpus['path_meta'], '2012_Mar', '2012_Mar.csv')
+    df_meta = pd.read_csv(path_csv)
+    df_meta['date'] = 'not a date'
+    df_meta.to_csv(path_csv, index=False)
+
+    skipped = []
+    bins = run.find_bins(corpus['path_doc'], corpus['path_meta'], corpus['path_dtm'], corpus['path_ttm'], skipped)
+    assert skipped == ['2012_Mar']
+    assert [x['name'] for x in bins][1:3] == ['2012_Feb', '2012_Apr']
+
+    # the project is built without the bin
+    build('T', corpus)
+    entries = run.read_index('T')['bins']
+    assert len(entries) == 11
+    assert entries[2]['start_time'].startswith('4/')
+    assert len(run.read_similarity('T')['nodes']) == 11 * 4
+
+
+def test_transform_bin_json_reads_probs_once(corpus, monkeypatch):
+    calls = []
+    doc_topic_probs = run.doc_topic_probs
+    monkeypatch.setattr(run, 'doc_topic_probs', lambda *args: calls.append(args) or doc_topic_probs(*args))
+    bin_paths = run.find_bins(corpus['path_doc'], corpus['path_meta'], corpus['path_dtm'], corpus['path_ttm'])[0]
+    tweet_ids = {'id': [1, 2, 3, 4], 'txt': ['2012_Jan_' + str(x) for x in range(4)]}
+    bin_json, ranks_json, summary = run.transform_bin_json(0, bin_paths, tweet_ids)
+    assert len(calls) == 1
+    # the bin and its ranks hold the same probabilities
+    bin_dict, ranks = json.loads(bin_json), json.loads(ranks_json)
+    for doc_id, topics in bin_dict['topic_model']['doc_topic'].items():
+        row = ranks['doc_topics']['doc_ids'].index(int(doc_id))
+        assert sorted(topics.values(), reverse=True) == ranks['doc_topics']['probs'][row * 4:(row + 1) * 4]
+
+
+def test_rank_bin_compact():
+    probs = np.array([[0.12345, 0.87655], [0.6, 0.4], [0.995, 0.005]])
+    ranks = run.rank_bin(3, [10, 11, 12], probs, compact={'precision': 2, 'min_prob': 0.01})
+    assert (ranks['format'], ranks['scale']) == ('compact', 100)
+    # the documents of a topic stop at the first one below min_prob
+    assert ranks['topic_docs']['3_0'] == {'ids': [12, 11, 10], 'probs': [100, 60, 12]}
+    assert ranks['topic_docs']['3_1'] == {'ids': [10, 11], 'probs': [88, 40]}
+    assert ranks['doc_topics'] == {'doc_ids': [10, 11, 12], 'offsets': [0, 2, 4, 5], 'topics': [1, 0, 0, 1, 0],
+                                   'probs': [88, 12, 60, 40, 100]}
+    # every decimal is kept without precision
+    ranks = run.rank_bin(3, [10, 11, 12], probs, compact={'precision': None, 'min_prob': 0.01})
+    assert ranks['scale'] == 1
+    assert ranks['doc_topics']['probs'] == [0.87655, 0.12345, 0.6, 0.4, 0.995]
@@ -0,0 +1,100 @@
+import os
+import http.client
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+
+
+@pytest.fixture
+def path_cache(tmp_path, monkeypatch):
+    path_cache = str(tmp_path / 'cache')
+    monkeypatch.setattr(run, 'path_cache', path_cache)
+    return path_cache
+
+
+def counting_read(calls):
+    def read(path_file):
+        calls.append(path_file)
+        return pd.read_csv(path_file)
+    return read
+
+
+def test_frame_to_arrays():
+    # a matrix, with floats that float32 would change
+    df = pd.DataFrame([[0.1, 1 / 3], [np.nan, 2.5]], index=['a', 'b'], columns=['x', 'y'])
+    arrays = run.frame_to_arrays(df)
+    assert arrays['values'].dtype == np.float64
+    pd.testing.assert_frame_equal(run.arrays_to_frame(arrays), df)
+
+    # metadata, with missing strings and a named index
+    df = pd.DataFrame({'id': [3, 4, 5], 'text': ['a', None, 'c'], 'score': [0.5, 0.25, np.nan]})
+    pd.testing.assert_frame_equal(run.arrays_to_frame(run.frame_to_arrays(df)), df)
+    df = df.set_index('text')
+    pd.testing.assert_frame_equal(run.arrays_to_frame(run.frame_to_arrays(df)), df)
+
+    # other objects aren't laid out
+    assert run.frame_to_arrays(pd.DataFrame({'a': [[1], [2]]})) is None
+    assert run.frame_to_arrays(pd.DataFrame([[1.0]], columns=[0])) is None
+
+
+def test_read_cached(tmp_path, path_cache):
+    path_csv = str(tmp_path / 'meta.csv')
+    df = pd.DataFrame({'id': ['d0', 'd1'], 'date': ['2012-01-20', None], 'prob': [0.123456789, 0.7]})
+    df.to_csv(path_csv, index=False)
+    calls = []
+    parsed = run.read_cached(path_csv, counting_read(calls), 'meta')
+    cached = run.read_cached(path_csv, counting_read(calls), 'meta')
+    assert len(calls) == 1 and len(os.listdir(path_cache)) == 1
+    pd.testing.assert_frame_equal(cached, parsed)
+    # files parsed in another way are cached apart
+    run.read_cached(path_csv, counting_read(calls), 'matrix')
+    assert len(calls) == 2
+
+
+def test_read_cached_changed_file(tmp_path, path_cache):
+    path_csv = str(tmp_path / 'meta.csv')
+    pd.DataFrame({'prob': [0.1, 0.2]}).to_csv(path_csv, index=False)
+    calls = []
+    run.read_cached(path_csv, counting_read(calls), 'meta')
+
+    # another size
+    pd.DataFrame({'prob': [0.1, 0.2, 0.3]}).to_csv(path_csv, index=False)
+    assert run.read_cached(path_csv, counting_read(calls), 'meta')['prob'].tolist() == [0.1, 0.2, 0.3]
+    assert len(calls) == 2
+
+    # the same size, another modification time
+    pd.DataFrame({'prob': [0.4, 0.5, 0.6]}).to_csv(path_csv, index=False)
+    stat = os.stat(path_csv)
+    os.utime(path_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert run.read_cached(path_csv, counting_read(calls), 'meta')['prob'].tolist() == [0.4, 0.5, 0.6]
+    assert len(calls) == 3
+    assert run.read_cached(path_csv, counting_read(calls), 'meta')['prob'].tolist() == [0.4, 0.5, 0.6]
+    assert len(calls) == 3
+
+
+def test_read_cached_broken_entry(tmp_path, path_cache):
+    path_csv = str(tmp_path / 'meta.csv')
+    pd.DataFrame({'prob': [0.1]}).to_csv(path_csv, index=False)
+    calls = []
+    run.read_cached(path_csv, counting_read(calls), 'meta')
+    for name in os.listdir(path_cache):
+        with open(os.path.join(path_cache, name), 'wb') as file:
+            file.write(b'not a zip file')
+    assert run.read_cached(path_csv, counting_read(calls), 'meta')['prob'].tolist() == [0.1]
+    assert len(calls) == 2
+
+
+def test_cache_not_served(path_tf, server):
+    os.makedirs(os.path.join(path_tf, 'cache'))
+    with open(os.path.join(path_tf, 'cache', 'entry.npz'), 'wb') as file:
+        file.write(b'entry')
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+    for path in ('/cache/entry.npz', '/cache/', '/data/../cache/entry.npz', '/./cache/entry.npz'):
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 404
+    connection.close()
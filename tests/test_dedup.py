@@ -0,0 +1,40 @@
+import os
+import json
+import collections
+
+import run
+
+FOOTER = 'Full-Disclosure - We believe in it.\nCharter: http://lists.grok.org.uk/full-disclosure-charter.html\n'
+
+
+def test_dedup_blocks_across_bins():
+    table, seen = {}, set()
+    first = run.dedup_blocks(['Hello,\n\n', FOOTER], collections.Counter(), table, seen)
+    # the first document with the footer keeps it, the next bins share it
+    assert first == 'Hello,\n\n' + FOOTER
+    assert run.dedup_blocks(['Bye.\n\n', FOOTER], collections.Counter(), table, seen) == ['Bye.\n\n', 0]
+    assert table == {FOOTER: 0}
+
+
+def test_transform_doc_dedup(path_tf, corpus):
+    # every document of the corpus ends with the footer
+    for path_folder, _, names in os.walk(corpus['path_doc']):
+        for name in names:
+            with open(os.path.join(path_folder, name), 'a', encoding='latin1') as file:
+                file.write('\n' + FOOTER)
+    run.transform_doc('T', corpus['path_doc'], corpus['path_meta'], '.reply.body.txt', dedup=True)
+    run.transform_doc('U', corpus['path_doc'], corpus['path_meta'], '.reply.body.txt')
+
+    blocks = run.read_blocks('T')
+    assert len(blocks) == 1
+    for bin_ix in range(12):
+        with open(os.path.join(path_tf, 'data', 'T', 'docs', str(bin_ix) + '.json'), encoding='utf-8') as file:
+            docs = json.load(file)
+        with open(os.path.join(path_tf, 'data', 'U', 'docs', str(bin_ix) + '.json'), encoding='utf-8') as file:
+            full = json.load(file)
+        # the viewer joins the blocks of the documents into their full text
+        for doc_id, doc in docs.items():
+            text = doc['text']
+            if not isinstance(text, str):
+                text = ''.join(part if isinstance(part, str) else blocks[part] for part in text)
+            assert text == full[doc_id]['text']
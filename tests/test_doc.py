@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+
+import run
+from conftest import read_json
+
+# documents with the characters the baseline transformation removes, in the
+# places where deleting them in another order would give another text
+TEXTS = [b'say "hi" to http://example.com\\path\n',
+         b'htt"p://a and http:\\//b and http:\n//c, caf\xe9',
+         b'windows\r\nline\rmac\r\r\nend\n\n\nsecond block\r\n\r\nthird "block"',
+         b'ht\n\ntp://d\n \t\n"http:/"/e\\\\ \xff\r',
+         b'',
+         b'\n\n\n']
+
+
+def baseline_text(path_file):
+    """
+    The text of a document as the baseline transform_doc read it.
+    """
+    with open(path_file, 'r', encoding='latin1') as textfile:
+        return textfile.read().replace('"','').replace('http://','').replace('\\','').replace('\n','')
+
+
+def test_index_metadata_blank_author():
+    df_meta = pd.DataFrame({'id': ['2012_Jan_0', '2012_Jan_1'],
+                            'author': ['alice', None],
+                            'date': ['2012-01-02 03:04:00', '2012-01-05 10:30:00']})
+    meta_index = run.index_metadata([df_meta])[0]
+    assert meta_index['2012_Jan_0'] == ('alice', '1/2/2012 3:4')
+    assert meta_index['2012_Jan_1'] == ('', '1/5/2012 10:30')
+
+
+def test_transform_doc_blank_author(path_tf, corpus):
+    # a blank author cell is read as NaN by pandas
+    path_csv = os.path.join(corpus['path_meta'], '2012_Jan', '2012_Jan.csv')
+    df_meta = pd.read_csv(path_csv)
+    df_meta.loc[0, 'author'] = None
+    df_meta.to_csv(path_csv, index=False)
+
+    run.transform_doc('T', corpus['path_doc'], corpus['path_meta'], '.reply.body.txt')
+
+    docs = read_json(os.path.join(path_tf, 'data', 'T', 'docs', '0.json'))
+    assert len(docs) == 4
+    assert sorted(doc['author'] for doc in docs.values())[0] == ''
+
+
+def test_format_dates():
+    dates = pd.Series(['2012-01-02 03:04:00', '2012-12-31 23:59:00'])
+    assert run.format_dates(dates).tolist() == ['1/2/2012 3:4', '12/31/2012 23:59']
+
+
+def test_format_dates_mixed_formats():
+    # the dates that don't match the format of the column are parsed one by one
+    dates = pd.Series(['2012-01-02 03:04:00', 'Mon, 5 Mar 2012 10:30:00 +0000', 'not a date', None],
+                      index=[10, 11, 12, 13])
+    formatted = run.format_dates(dates)
+    assert formatted.tolist()[:2] == ['1/2/2012 3:4', '3/5/2012 10:30']
+    assert formatted[2:].isnull().all()
+
+
+def test_index_metadata():
+    df_meta = pd.DataFrame({'id': ['2012_Jan_0', '2012_Jan_1', '2012_Jan_0', '2012_Jan_2'],
+                            'author': ['alice', 'bob', 'carol', 'dave'],
+                            'date': ['2012-01-02 03:04:00', '2012-01-05 10:30:00', '2012-01-06 00:00:00', 'not a date']})
+    meta_index = run.index_metadata([df_meta, df_meta.iloc[:0]])
+    # the first entry of an id wins, and documents without a date are left out
+    assert meta_index[0] == {'2012_Jan_0': ('alice', '1/2/2012 3:4'), '2012_Jan_1': ('bob', '1/5/2012 10:30')}
+    assert meta_index[1] == {}
+
+
+def test_clean_text(tmp_path):
+    for i, data in enumerate(TEXTS):
+        path_file = tmp_path / (str(i) + '.txt')
+        path_file.write_bytes(data)
+        assert run.clean_text(data) == baseline_text(str(path_file))
+        # the cleaned blocks joined are the cleaned document
+        assert ''.join(run.split_blocks(data)) == run.clean_text(data)
+    assert run.split_blocks(TEXTS[2])[1:] == ['second block', 'third block']
+
+
+def test_read_bin_docs_threads(corpus):
+    bin_paths = run.find_bins(corpus['path_doc'], corpus['path_meta'])[0]
+    names = sorted(os.listdir(bin_paths['doc']))
+    for name, data in zip(names, TEXTS):
+        with open(os.path.join(bin_paths['doc'], name), 'wb') as file:
+            file.write(data)
+    expected = [baseline_text(os.path.join(bin_paths['doc'], name)) for name in names]
+
+    docs, skipped = run.read_bin_docs(bin_paths, '.reply.body.txt', names, threads=3)
+    assert [doc[3] for doc in docs] == expected
+    assert run.read_bin_docs(bin_paths, '.reply.body.txt', names, threads=1) == (docs, skipped)
+    docs, _ = run.read_bin_docs(bin_paths, '.reply.body.txt', names, threads=3, blocks=True)
+    assert [''.join(doc[3]) for doc in docs] == expected
@@ -0,0 +1,57 @@
+import numpy as np
+
+import run
+
+# a graph of three bins, and the layout scripts/d3/topicflow.js computes for
+# it with layout(0) for the viewport of the viewer
+STARTS = ['1/3/2012 0:0', '2/1/2012 8:30', '3/5/2012 0:0']
+NODES = [{'name': '0_0', 'value': 3}, {'name': '0_1', 'value': 5}, {'name': '0_2', 'value': 1},
+         {'name': '1_0', 'value': 2}, {'name': '1_1', 'value': 2}, {'name': '1_2', 'value': 4},
+         {'name': '2_0', 'value': 6}, {'name': '2_1', 'value': 1}]
+LINKS = [{'source': 0, 'target': 4, 'value': 50}, {'source': 0, 'target': 5, 'value': 20},
+         {'source': 1, 'target': 5, 'value': 80}, {'source': 1, 'target': 3, 'value': 30},
+         {'source': 2, 'target': 3, 'value': 40}, {'source': 3, 'target': 6, 'value': 70},
+         {'source': 4, 'target': 6, 'value': 25}, {'source': 5, 'target': 7, 'value': 60},
+         {'source': 5, 'target': 6, 'value': 10}]
+JS_LAYOUT = {'x': [0, 0, 0, 244.42271505376343, 244.42271505376343, 244.42271505376343, 554, 554],
+             'y': [387.77777777777777, 0, 624.4444444444445, 312.22222222222223, 473.33333333333337, 0, 0, 463.33333333333337],
+             'dy': [226.66666666666669, 377.77777777777777, 75.55555555555556, 151.11111111111111, 151.11111111111111,
+                    302.22222222222223, 453.33333333333337, 75.55555555555556],
+             'link_dy': [107.93650793650794, 43.17460317460317, 172.69841269841268, 64.76190476190476, 86.34920634920634,
+                         151.11111111111111, 53.96825396825397, 129.52380952380952, 21.587301587301585],
+             'link_sy': [43.17460317460317, 0, 0, 172.69841269841268, 0, 0, 0, 21.587301587301585, 0],
+             'link_ty': [0, 172.69841269841268, 0, 0, 64.76190476190476, 21.587301587301585, 172.6984126984127, 0, 0]}
+
+
+def test_layout_topics():
+    layout = run.layout_topics(NODES, LINKS, STARTS)
+    assert (layout['size'], layout['node_width'], layout['node_padding']) == ([569, 700], 15, 10)
+    for key, values in JS_LAYOUT.items():
+        np.testing.assert_allclose(layout[key], values, atol=5e-4, err_msg=key)
+
+
+def test_layout_topics_overflow():
+    # the topics of the last bin are at least one unit apart, which pushes the
+    # lightest ones out of the viewport and back up. topicflow.js gives the
+    # same positions for a viewport of 100 x 5, topics 4 wide and 0.1 apart
+    nodes = [{'name': '0_0', 'value': 1}, {'name': '1_0', 'value': 0.5}] + \
+            [{'name': '2_' + str(i), 'value': value} for i, value in enumerate([0.01, 0.02, 0.01, 0.01, 0.03, 0.01, 0.01, 0.01])]
+    links = [{'source': 0, 'target': 3, 'value': 5}, {'source': 0, 'target': 2, 'value': 1},
+             {'source': 1, 'target': 9, 'value': 2}, {'source': 1, 'target': 6, 'value': 2}]
+    layout = run.layout_topics(nodes, links, ['1/1/2013 0:0', '1/1/2013 0:0', '4/1/2013 0:0'],
+                               size=(100, 5), node_width=4, node_padding=0.1)
+    assert layout['x'] == [0, 0] + [96] * 8
+    np.testing.assert_allclose(layout['y'], [0, 3.3666666666666663, 2, 1, 3, 4, 0, 4.702, 4.834666666666667, 4.967333333333333], atol=5e-4)
+    np.testing.assert_allclose(layout['dy'], [3.266666666666667, 1.6333333333333335] + [0.03266666666666667, 0.06533333333333334,
+                               0.03266666666666667, 0.03266666666666667, 0.098] + [0.03266666666666667] * 3, atol=5e-4)
+    # without topics linked on both sides, links are scaled to fit every
+    # topic they link, where topicflow.js doesn't scale them. The links of a
+    # topic are stacked by the position of the other topic
+    assert layout['link_dy'] == [0.065, 0.013, 0.026, 0.026]
+    assert (layout['link_sy'], layout['link_ty']) == ([0, 0.065, 0.026, 0], [0, 0, 0, 0])
+
+
+def test_stack_links():
+    offsets = run.stack_links(np.array([2, 0, 2, 0, 2]), np.array([5.0, 1.0, 3.0, 1.0, 3.0]), np.array([1.0, 2.0, 4.0, 8.0, 16.0]))
+    assert offsets.tolist() == [20, 0, 0, 2, 4]
+    assert run.stack_links(np.array([], dtype=np.int64), np.array([]), np.array([])).tolist() == []
@@ -0,0 +1,58 @@
+import os
+import json
+
+import benchmark
+import run
+from conftest import build, read_json
+
+
+def read_levels(project_name):
+    prefix = 'function populate_levels_' + project_name + '(){\nvar levels_data = '
+    posfix = ';\nreadLevelsJSON(levels_data);\n}'
+    with open(os.path.join(run.path_tf, 'data', project_name, 'Levels.js'), encoding='utf-8') as file:
+        return json.loads(file.read()[len(prefix):-len(posfix)])
+
+
+def test_follow_topics():
+    # 0 and 2, and 2 and 4, are each other's most similar topics. 3 is the
+    # most similar topic of 1, but 1 is more similar to 2
+    links = [{'source': 0, 'target': 2, 'value': 0.9}, {'source': 1, 'target': 2, 'value': 0.5},
+             {'source': 1, 'target': 3, 'value': 0.4}, {'source': 2, 'target': 4, 'value': 0.3}]
+    assert run.follow_topics(5, links) == [-1, -1, 0, -1, 2]
+
+
+def test_transform_levels(path_tf, tmp_path):
+    corpus = benchmark.make_corpus(str(tmp_path / 'corpus'), 96, n_topics=4, n_terms=30, years=2)
+    build('T', corpus, levels=True)
+    sim = run.read_similarity('T')
+    nodes = {node['name']: node for node in sim['nodes']}
+    levels = read_levels('T')
+    assert [level['name'] for level in levels['levels']] == ['quarter', 'year']
+
+    for level, n_periods in zip(levels['levels'], (8, 2)):
+        assert len(level['periods']) == n_periods
+        assert level['periods'][1]['bins'] == ([3, 5] if level['name'] == 'quarter' else [12, 23])
+        # every topic of the bins is in one topic of the level, which weighs as much as its topics
+        topics = [name for node in level['nodes'] for name in node['topics']]
+        assert sorted(topics) == sorted(nodes)
+        assert len(level['nodes']) < len(nodes)
+        for node in level['nodes']:
+            assert abs(node['value'] - sum(nodes[name]['value'] for name in node['topics'])) < 1e-3
+            period = int(node['name'][1:].split('_')[0])
+            first, last = level['periods'][period]['bins']
+            assert all(first <= int(name.split('_')[0]) <= last for name in node['topics'])
+        # links only join the topics of adjacent periods
+        for link in level['links']:
+            source, target = level['nodes'][link['source']], level['nodes'][link['target']]
+            assert int(target['name'][1:].split('_')[0]) - int(source['name'][1:].split('_')[0]) == 1
+        assert len(level['layout']['x']) == len(level['nodes'])
+
+    # the window of a year holds the topics of its quarters
+    quarters = levels['levels'][0]
+    window = read_json(os.path.join(path_tf, 'data', 'T', levels['levels'][1]['periods'][1]['window']))
+    assert [period['label'] for period in window['periods']] == ['2013 Q1', '2013 Q2', '2013 Q3', '2013 Q4']
+    assert [node['name'] for node in window['nodes']] == [node['name'] for node in quarters['nodes']
+                                                          if int(node['name'][1:].split('_')[0]) >= 4]
+    # and the window of a quarter the topics of its bins
+    window = read_json(os.path.join(path_tf, 'data', 'T', quarters['periods'][0]['window']))
+    assert sorted(node['name'] for node in window['nodes']) == sorted(name for name in nodes if int(name.split('_')[0]) < 3)
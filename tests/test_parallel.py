@@ -0,0 +1,48 @@
+import os
+import shutil
+import concurrent.futures
+
+import run
+from conftest import build, read_project
+
+
+class CountingPool(concurrent.futures.ThreadPoolExecutor):
+    """
+    A pool that counts the bins submitted to it.
+    """
+    def __init__(self, workers):
+        super().__init__(workers)
+        self.submitted = 0
+
+    def submit(self, func, *args):
+        self.submitted += 1
+        return super().submit(func, *args)
+
+
+def test_map_bins_window():
+    with CountingPool(2) as pool:
+        results = run.map_bins(pool, pow, range(20), [2] * 20)
+        assert pool.submitted == 0
+        # the window of 2 workers holds 4 bins
+        assert next(results) == 0
+        assert pool.submitted == 4
+        assert next(results) == 1
+        assert pool.submitted == 5
+        assert list(results) == [x ** 2 for x in range(2, 20)]
+        assert pool.submitted == 20
+
+
+def test_workers_build_same_files(path_tf, corpus):
+    path_project = os.path.join(path_tf, 'data', 'T')
+    build('T', corpus, dedup=True, sqlite=True, levels=True)
+    serial = read_project(path_project)
+    shutil.rmtree(path_project)
+
+    # what "-j 4" does
+    with concurrent.futures.ProcessPoolExecutor(4) as pool:
+        build('T', corpus, pool, dedup=True, sqlite=True, levels=True)
+    parallel = read_project(path_project)
+
+    assert sorted(serial) == sorted(parallel)
+    for name in serial:
+        assert serial[name] == parallel[name], name
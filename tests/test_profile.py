@@ -0,0 +1,21 @@
+import run
+
+
+def test_stage_memory(monkeypatch):
+    monkeypatch.setattr(run, 'profiler', run.Profiler())
+    with run.profiled('allocate'):
+        data = bytearray(64 * 2**20)
+        data[::4096] = b'1' * len(data[::4096])
+        run.report(documents=1)
+    del data
+    with run.profiled('idle'):
+        pass
+
+    allocate, idle = run.profiler.stages
+    assert allocate['counts'] == {'documents': 1}
+    if allocate['rss_mb'] is not None:
+        assert allocate['rss_growth_mb'] >= 60
+        # the memory of a stage doesn't carry over to the next one
+        assert idle['rss_growth_mb'] < 1
+        assert idle['rss_mb'] < allocate['rss_mb']
+    assert idle['process_peak_rss_mb'] >= allocate['process_peak_rss_mb']
@@ -0,0 +1,71 @@
+import os
+import json
+
+import numpy as np
+
+import run
+from conftest import build, read_json
+
+# shards of terms with searchShard in scripts/SearchIndex.js, with 13 and
+# 1024 shards. The last term overflows 32 bits
+SHARDS = {'exploit': (9, 395), 'buffer': (3, 64), 'overflow': (8, 2), 'xss': (11, 216),
+          'sql0day': (10, 58), 'cve20121234': (7, 499), 'zzzzzzzzzzzzzzzzzzzz': (8, 128)}
+
+
+def test_search_shard():
+    for term, shards in SHARDS.items():
+        assert (run.search_shard(term, 13), run.search_shard(term, 1024)) == shards
+        assert run.search_shard(term, 1) == 0
+
+
+def test_tokenize():
+    # the terms searchTerms finds in a query, with their repeats
+    assert run.tokenize('Buffer-Overflow in CVE-2012-1234: a "x" SQL0day, sql0day') == \
+        ['buffer', 'overflow', 'in', 'cve', '2012', '1234', 'sql0day', 'sql0day']
+
+
+def search(path_search, query):
+    """
+    Rank the documents of a query the way SearchIndex.search does.
+
+    Returns:
+        the [tweet id, score] pairs of the documents, from the best match
+    """
+    info = read_json(os.path.join(path_search, 'index.json'))
+    docs = {}
+    for term in dict.fromkeys(run.tokenize(query)):
+        entry = read_json(os.path.join(path_search, str(run.search_shard(term, info['shards'])) + '.json')).get(term, {})
+        for doc, weight in zip(entry.get('docs', []), entry.get('weights', [])):
+            docs[doc] = docs.get(doc, 0) + weight
+    return sorted(docs.items(), key=lambda doc: (-doc[1], doc[0]))
+
+
+def test_transform_search(path_tf, corpus):
+    # the January documents, the filler words are in every document
+    texts = ['heartbleed heartbleed shellshock', 'heartbleed shellshock ' + 'list footer ' * 10,
+             'shellshock only', 'heartbleed']
+    path_bin = os.path.join(corpus['path_doc'], '2012_Jan')
+    for name, text in zip(sorted(os.listdir(path_bin)), texts):
+        with open(os.path.join(path_bin, name), 'w', encoding='latin1') as file:
+            file.write(text)
+    build('T', corpus)
+    path_search = os.path.join(path_tf, 'data', 'T', 'search')
+    with open(os.path.join(path_tf, 'data', 'T', 'docs', '0.json'), encoding='utf-8') as file:
+        ids = {doc['text']: doc['tweet_id'] for doc in json.load(file).values()}
+    ids = [ids[text] for text in texts]
+
+    # the weight of a term with BM25, k1 = 1.2 and b = 0.75
+    lengths = []
+    for bin_ix in range(12):
+        with open(os.path.join(path_tf, 'data', 'T', 'docs', str(bin_ix) + '.json'), encoding='utf-8') as file:
+            lengths.extend(len(run.tokenize(doc['text'])) for doc in json.load(file).values())
+    avg_length = sum(lengths) / len(lengths)
+    idf = np.log(1 + (48 - 3 + 0.5) / (3 + 0.5))
+    assert search(path_search, 'heartbleed')[0] == \
+        (ids[0], round(idf * 2 * 2.2 / (2 + 1.2 * (0.25 + 0.75 * 3 / avg_length)), 3))
+
+    # more occurrences, then shorter documents, rank first
+    assert [doc for doc, score in search(path_search, 'heartbleed')] == [ids[0], ids[3], ids[1]]
+    assert [doc for doc, score in search(path_search, 'shellshock')] == [ids[2], ids[0], ids[1]]
+    # the documents with every term of a query before the others
+    assert [doc for doc, score in search(path_search, 'Shellshock, HEARTBLEED')] == [ids[0], ids[1], ids[3], ids[2]]
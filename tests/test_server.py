@@ -0,0 +1,177 @@
+import os
+import re
+import sys
+import gzip
+import json
+import signal
+import subprocess
+import http.client
+
+import pytest
+
+import run
+from conftest import build
+
+
+def request(server, path, method='GET', **headers):
+    """
+    Send a request to a server.
+
+    Returns:
+        a tuple of the status, the headers and the body of the answer
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    try:
+        connection.request(method, path, headers={name.replace('_', '-'): value for name, value in headers.items()})
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def site(path_tf):
+    """
+    A data file of the TopicFlow directory with its precompressed variants,
+    and a file next to the directory.
+    """
+    path_file = os.path.join(path_tf, 'data', 'Doc.js')
+    with open(path_file, 'wb') as file:
+        file.write(b'var tweet_data = {};\n' * 100)
+    assert run.compress_file(path_file) == (2 if run.brotli is not None else 1)
+    if run.brotli is None:
+        # the server sends the variants compress_file writes with brotli
+        with open(path_file + '.br', 'wb') as file:
+            file.write(b'brotli')
+    with open(os.path.join(os.path.dirname(path_tf), 'secret.txt'), 'w') as file:
+        file.write('secret')
+    return path_file
+
+
+def test_compress_file(tmp_path):
+    path_file = str(tmp_path / 'Bins.js')
+    with open(path_file, 'wb') as file:
+        file.write(b'var bins = [];\n' * 1000)
+    written = run.compress_file(path_file)
+    with gzip.open(path_file + '.gz') as file:
+        assert file.read() == b'var bins = [];\n' * 1000
+    if run.brotli is not None:
+        assert written == 2
+        with open(path_file + '.br', 'rb') as file:
+            assert run.brotli.decompress(file.read()) == b'var bins = [];\n' * 1000
+    else:
+        assert written == 1 and not os.path.exists(path_file + '.br')
+    # the variants are up to date
+    assert run.compress_file(path_file) == 0
+    stat = os.stat(path_file)
+    os.utime(path_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert run.compress_file(path_file) == written
+
+
+def test_precompressed_variant(server, site):
+    with open(site, 'rb') as file:
+        content = file.read()
+    status, headers, body = request(server, '/data/Doc.js', Accept_Encoding='gzip, deflate, br')
+    assert (status, headers['Content-Encoding'], headers['Vary']) == (200, 'br', 'Accept-Encoding')
+    with open(site + '.br', 'rb') as file:
+        assert body == file.read()
+    status, headers, body = request(server, '/data/Doc.js', Accept_Encoding='gzip;q=1.0')
+    assert headers['Content-Encoding'] == 'gzip' and gzip.decompress(body) == content
+    assert headers['Content-Type'] in ('application/javascript', 'text/javascript')
+    status, headers, body = request(server, '/data/Doc.js')
+    assert 'Content-Encoding' not in headers and body == content
+    assert int(headers['Content-Length']) == len(content)
+
+
+def test_not_modified(server, site):
+    status, headers, _ = request(server, '/data/Doc.js', Accept_Encoding='gzip')
+    etag, last_modified = headers['ETag'], headers['Last-Modified']
+    assert headers['Cache-Control'] == 'no-cache'
+    assert request(server, '/data/Doc.js', Accept_Encoding='gzip', If_None_Match=etag)[0] == 304
+    assert request(server, '/data/Doc.js', Accept_Encoding='gzip', If_None_Match='W/' + etag)[0] == 304
+    assert request(server, '/data/Doc.js', If_Modified_Since=last_modified)[0] == 304
+    # the ETag of a variant is not the ETag of the file
+    status, headers, body = request(server, '/data/Doc.js', If_None_Match=etag)
+    assert status == 200 and headers['ETag'] != etag
+    # nor the ETag of the file once it changed
+    stat = os.stat(site)
+    os.utime(site, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert request(server, '/data/Doc.js', If_None_Match=headers['ETag'])[0] == 200
+
+
+def test_range(server, site):
+    with open(site, 'rb') as file:
+        content = file.read()
+    status, headers, body = request(server, '/data/Doc.js', Range='bytes=10-29')
+    assert (status, body, headers['Content-Range']) == (206, content[10:30], 'bytes 10-29/' + str(len(content)))
+    assert request(server, '/data/Doc.js', Range='bytes=-5')[2] == content[-5:]
+    assert request(server, '/data/Doc.js', Range='bytes=2090-')[2] == content[2090:]
+    status, headers, _ = request(server, '/data/Doc.js', Range='bytes=5000-')
+    assert (status, headers['Content-Range']) == (416, 'bytes */' + str(len(content)))
+    # several ranges, and the range of another version, send the whole file
+    for headers in ({'Range': 'bytes=0-1,5-6'}, {'Range': 'bytes=0-1', 'If-Range': '"other"'}):
+        status, _, body = request(server, '/data/Doc.js', **headers)
+        assert (status, body) == (200, content)
+    etag = request(server, '/data/Doc.js')[1]['ETag']
+    status, _, body = request(server, '/data/Doc.js', Range='bytes=0-1', If_Range=etag)
+    assert (status, body) == (206, content[:2])
+
+
+def test_path_traversal(server, site):
+    for path in ('/../secret.txt', '/data/../../secret.txt', '/%2e%2e/secret.txt', '/data/..%2f..%2fsecret.txt'):
+        status, _, body = request(server, path)
+        assert status == 404 and b'secret' not in body
+    for path in ('/api/../data/Doc.js', '/api/%2e%2e/docs', '/api/.%2fdata/docs'):
+        status, _, body = request(server, path)
+        assert status == 404 and b'tweet_data' not in body
+
+
+def test_api(server, corpus):
+    build('T', corpus, sqlite=True)
+    status, headers, body = request(server, '/api/T/docs?offset=40&limit=5')
+    answer = json.loads(body)
+    assert (status, headers['Content-Type']) == (200, 'application/json')
+    assert (answer['total'], answer['offset'], answer['limit']) == (48, 40, 5)
+    assert [doc['tweet_id'] for doc in answer['items']] == [41, 42, 43, 44, 45]
+
+    status, headers, body = request(server, '/api/T/topics/0_0/docs?limit=2', Accept_Encoding='gzip')
+    assert headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(body))['items']) == 2
+    assert request(server, '/api/T/topics/0_0/docs?limit=2', Accept_Encoding='gzip', If_None_Match=headers['ETag'])[0] == 304
+
+    for query in ('limit=0', 'limit=' + str(run.API_MAX_PAGE + 1), 'offset=-1', 'offset=x', 'ids=1,a'):
+        status, headers, body = request(server, '/api/T/docs?' + query)
+        assert status == 400 and 'error' in json.loads(body) and 'ETag' not in headers
+    assert request(server, '/api/T/docs/999')[0] == 404
+    assert request(server, '/api/U/docs')[0] == 404
+
+
+def test_access_log(server, site):
+    request(server, '/data/Doc.js', Range='bytes=0-9')
+    request(server, '/data/missing.js')
+    # a request is logged once it's answered
+    assert server.wait_for_requests(10)
+    lines = server.access_log.getvalue().splitlines()
+    assert re.fullmatch(r'127\.0\.0\.1 - - \[[^]]+\] "GET /data/Doc\.js HTTP/1\.1" 206 10 \d+\.\dms', lines[0])
+    assert re.fullmatch(r'127\.0\.0\.1 - - \[[^]]+\] "GET /data/missing\.js HTTP/1\.1" 404 \d+ \d+\.\dms', lines[1])
+
+
+def test_serve(path_tf, site, tmp_path):
+    path_log = str(tmp_path / 'access.log')
+    script = 'import sys, run\nwith open(sys.argv[2], "a") as log:\n    run.serve(sys.argv[1], 0, "127.0.0.1", log)\n'
+    process = subprocess.Popen([sys.executable, '-u', '-c', script, path_tf, path_log], cwd=os.path.dirname(run.__file__),
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(re.match(r'serving at port (\d+)', process.stdout.readline()).group(1))
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.request('GET', '/data/Doc.js')
+        assert connection.getresponse().read().startswith(b'var tweet_data')
+        connection.close()
+        # SIGTERM stops the server once the requests are answered
+        process.send_signal(signal.SIGTERM)
+        output, _ = process.communicate(timeout=20)
+    finally:
+        process.kill()
+    assert process.returncode == 0 and 'Stopping the server' in output
+    with open(path_log) as file:
+        assert '"GET /data/Doc.js HTTP/1.1" 200' in file.read()
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+from conftest import build
+
+# two bins of 4 topics over the terms a, b, c and d. The cosine similarity
+# of topic i of the first and topic j of the second is SIMILARITY[i][j]
+TTM_JAN = pd.DataFrame([[1, 0, 0, 0], [0, 3, 4, 0], [0, 0, 0, 2], [1, 1, 1, 1]], columns=['a', 'b', 'c', 'd'], dtype=float)
+# the second bin doesn't have the term a in the same place, and has a term e
+TTM_FEB = pd.DataFrame([[0, 4, 3, 0, 0], [0, 0, 0, 1, 0], [0, 0, 1, 1, 0], [0, 0, 0, 0, 5]],
+                       columns=['e', 'c', 'b', 'd', 'a'], dtype=float)
+SIMILARITY = [[0, 0, 0, 1],
+              [1, 0, 0.6 / np.sqrt(2), 0],
+              [0, 1, 1 / np.sqrt(2), 0],
+              [0.7, 0.5, 1 / np.sqrt(2), 0.5]]
+
+
+def test_topic_similarity():
+    np.testing.assert_allclose(run.topic_similarity(TTM_JAN, TTM_FEB), SIMILARITY, atol=1e-12)
+    # the same term distribution, and topics without a common term
+    similarity = run.topic_similarity(TTM_JAN, TTM_FEB, 'jensen-shannon')
+    assert similarity[1, 0] == pytest.approx(1)
+    assert similarity[0, 1] == pytest.approx(0)
+    # the term of topic 2 of the first bin is one of the two terms of topic 2 of
+    # the second: the mean distribution is (3/4, 1/4), 1 - JSD = 1 - (H(3/4, 1/4) - 1/2)
+    assert similarity[2, 2] == pytest.approx(1.5 + 0.75 * np.log2(0.75) + 0.25 * np.log2(0.25))
+    with pytest.raises(ValueError):
+        run.topic_similarity(TTM_JAN, TTM_FEB, 'euclidean')
+
+
+def test_select_links():
+    similarity = np.array(SIMILARITY)
+    links = run.select_links(similarity, top_links=2, min_similarity=0.45)
+    assert [link[:2] for link in links] == [(0, 3), (1, 0), (2, 1), (2, 2), (3, 2), (3, 0)]
+    np.testing.assert_allclose([link[2] for link in links], [1, 1, 1, 1 / np.sqrt(2), 1 / np.sqrt(2), 0.7])
+    # topics of the same similarity keep their order
+    assert [link[:2] for link in run.select_links(similarity, top_links=3)][9:] == [(3, 2), (3, 0), (3, 1)]
+    assert len(run.select_links(similarity)) == 16
+    assert run.select_links(similarity, min_similarity=1) == [(0, 3, 1.0), (1, 0, 1.0), (2, 1, 1.0)]
+
+
+def test_transform_topic_similarity(path_tf, corpus):
+    TTM_JAN.to_csv(os.path.join(corpus['path_ttm'], 'Jan.csv'))
+    TTM_FEB.to_csv(os.path.join(corpus['path_ttm'], 'Feb.csv'))
+    build('T', corpus, similarity={'measure': 'cosine', 'top_links': 2, 'min_similarity': 0.45})
+    links = [link for link in run.read_similarity('T')['links'] if link['source'] < 4]
+    # the topics of the second bin are nodes 4 to 7, the similarities are percentages
+    assert [(link['source'], link['target'], link['value']) for link in links] == \
+        [(0, 7, 100.0), (1, 4, 100.0), (2, 5, 100.0), (2, 6, 70.7107), (3, 6, 70.7107), (3, 4, 70.0)]
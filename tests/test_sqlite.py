@@ -0,0 +1,77 @@
+import os
+import sqlite3
+
+import run
+from conftest import build, read_json
+
+
+def test_build_without_sqlite_removes_database(path_tf, corpus):
+    path_db = os.path.join(path_tf, 'data', 'T', 'project.db')
+    build('T', corpus, sqlite=True)
+    assert os.path.isfile(path_db)
+    assert 'api' in run.project_entry('T')
+
+    # adding the project again without --sqlite
+    build('T', corpus)
+    assert not os.path.isfile(path_db)
+    assert 'api' not in run.project_entry('T')
+
+
+def test_api_paging(path_tf, corpus):
+    build('T', corpus, sqlite=True)
+    path_db = os.path.join(path_tf, 'data', 'T', 'project.db')
+
+    status, answer = run.api_response(path_db, ['docs'], {'offset': ['40'], 'limit': ['10']})
+    assert status == 200
+    assert (answer['total'], answer['offset'], answer['limit']) == (48, 40, 10)
+    assert [doc['tweet_id'] for doc in answer['items']] == list(range(41, 49))
+
+    # the pages of a list follow each other
+    status, answer = run.api_response(path_db, ['topics', '0_0', 'docs'], {})
+    assert answer['total'] == len(answer['items']) == 4
+    pages = [run.api_response(path_db, ['topics', '0_0', 'docs'], {'offset': [str(offset)], 'limit': ['3']})[1]['items']
+             for offset in (0, 3)]
+    assert pages[0] + pages[1] == answer['items']
+    assert [doc['prob'] for doc in answer['items']] == sorted((doc['prob'] for doc in answer['items']), reverse=True)
+
+    status, answer = run.api_response(path_db, ['docs'], {'ids': ['8,4,15,99']})
+    assert answer['total'] == 3
+    assert [doc['tweet_id'] for doc in answer['items']] == [4, 8, 15]
+
+    assert run.api_response(path_db, ['bins'], {})[1]['total'] == 12
+    assert run.api_response(path_db, ['docs'], {'limit': [str(run.API_MAX_PAGE + 1)]})[0] == 400
+    assert run.api_response(path_db, ['docs'], {'offset': ['-1']})[0] == 400
+    assert run.api_response(path_db, ['docs'], {'offset': ['a']})[0] == 400
+    assert run.api_response(path_db, ['docs', '99'], {})[0] == 404
+    assert run.api_response(path_db, ['topics'], {})[0] == 404
+
+
+def test_bins_table(path_tf, corpus):
+    build('T', corpus, sqlite=True)
+    connection = sqlite3.connect(os.path.join(path_tf, 'data', 'T', 'project.db'))
+    try:
+        # the times of the bins are the strings of Index.js, "m/d/yyyy h:m"
+        types = {row[1]: row[2] for row in connection.execute('PRAGMA table_info(bins)')}
+        assert (types['start_time'], types['end_time']) == ('TEXT', 'TEXT')
+        rows = connection.execute('SELECT start_time, typeof(start_time), typeof(end_time) FROM bins ORDER BY bin_id').fetchall()
+    finally:
+        connection.close()
+    entries = run.read_index('T')['bins']
+    assert [row[0] for row in rows] == [entry['start_time'] for entry in entries]
+    assert {row[1:] for row in rows} == {('text', 'text')}
+
+
+def test_api_compact_ranks(path_tf, corpus):
+    build('T', corpus, sqlite=True, compact={'precision': 2, 'min_prob': 0.05})
+    path_db = os.path.join(path_tf, 'data', 'T', 'project.db')
+    ranks = read_json(os.path.join(path_tf, 'data', 'T', 'ranks', '0.json'))
+    dt = ranks['doc_topics']
+    assert ranks['scale'] == 100
+
+    # the topics of a document are the ones the compact format keeps
+    for row, doc_id in enumerate(dt['doc_ids']):
+        items = run.api_response(path_db, ['docs', str(doc_id), 'topics'], {})[1]['items']
+        start, end = dt['offsets'][row], dt['offsets'][row + 1]
+        assert [item['topic'] for item in items] == [ranks['topic_prob'][x] for x in dt['topics'][start:end]]
+        assert [item['prob'] for item in items] == [x / 100 for x in dt['probs'][start:end]]
+        assert all(item['prob'] >= 0.05 for item in items)
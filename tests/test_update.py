@@ -0,0 +1,32 @@
+import os
+
+import pandas as pd
+
+import run
+from conftest import build, read_project
+
+
+def test_update_matches_new_build(path_tf, corpus):
+    path_project = os.path.join(path_tf, 'data', 'T')
+    build('T', corpus, dedup=True, sqlite=True, levels=True)
+
+    # a document of March and the topic model of June change
+    with open(os.path.join(corpus['path_doc'], '2012_Mar', '2012_Mar_0.reply.body.txt'), 'a', encoding='latin1') as file:
+        file.write('\nA new line.\n')
+    path_dtm = os.path.join(corpus['path_dtm'], 'Jun.csv')
+    df_topic_doc = pd.read_csv(path_dtm, index_col=0)
+    df_topic_doc.iloc[0] = df_topic_doc.iloc[0].values[::-1]
+    df_topic_doc.to_csv(path_dtm)
+
+    # what "python run.py -u T" does
+    manifest = run.read_manifest('T')
+    run.build_project('T', manifest)
+    updated = read_project(path_project)
+
+    run.del_project('T')
+    build('T', corpus, dedup=True, sqlite=True, levels=True)
+    built = read_project(path_project)
+
+    assert sorted(updated) == sorted(built)
+    for name in built:
+        assert updated[name] == built[name], name